@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Product, ProductDish, ProductShoppingList, ShoppingList, User, Unit, UserDish, UserProduct, Dish, BugReport
+from .models import Product, ProductDish, ProductShoppingList, ShoppingList, User, Unit, UserDish, UserProduct, Dish, BugReport, Job
 
 admin.site.register(Product)
 admin.site.register(ProductDish)
@@ -10,4 +10,5 @@ admin.site.register(Unit)
 admin.site.register(UserDish)
 admin.site.register(UserProduct)
 admin.site.register(Dish)
-admin.site.register(BugReport)
\ No newline at end of file
+admin.site.register(BugReport)
+admin.site.register(Job)
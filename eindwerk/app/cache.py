@@ -0,0 +1,204 @@
+# Python imports
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+# Django imports
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+# The hit and miss counters of the tiers, kept in the shared cache so they add up all processes.
+STATS_KEY = "cache:stats:{}:{}"
+TIERS = ("l1", "l2")
+
+# The local caches and counters of the process, per shared cache: the threads of a process share them,
+# like the LocMemCache does (Django makes a cache object per thread).
+_local_caches = {}
+_stats = {}
+_lock = threading.Lock()
+
+_missing = object()
+
+
+class LocalCache:
+    """A bounded LRU cache in the memory of the process, every entry expires after its timeout.
+
+    The values are pickled, like in the LocMemCache, so changing a value that was read from it
+    doesn't change the cached value.
+    """
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return _missing
+            expires, pickled = entry
+            if expires <= time.monotonic():
+                del self.entries[key]
+                return _missing
+            self.entries.move_to_end(key)
+        return pickle.loads(pickled)
+
+    def set(self, key, value, timeout):
+        if timeout <= 0:
+            self.delete(key)
+            return
+        pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self.lock:
+            self.entries[key] = (time.monotonic() + timeout, pickled)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class BufferedCounters:
+    """Counts in the process and adds the counts to counters in the shared cache in batches.
+
+    Writing a counter for every count would cost a round trip to the shared cache each time,
+    the counters are written once every flush_every counts instead (and by flush()).
+    """
+
+    def __init__(self, flush_every):
+        self.flush_every = flush_every
+        self.counts = {}
+        self.pending = 0
+        self.lock = threading.Lock()
+
+    def count(self, key, shared):
+        with self.lock:
+            self.counts[key] = self.counts.get(key, 0) + 1
+            self.pending += 1
+            flush = self.pending >= self.flush_every
+        if flush:
+            self.flush(shared)
+
+    def flush(self, shared):
+        with self.lock:
+            counts, self.counts = self.counts, {}
+            self.pending = 0
+        for key, count in counts.items():
+            try:
+                shared.incr(key, count)
+            except ValueError:
+                shared.add(key, 0, timeout=None)
+                shared.incr(key, count)
+
+
+class TieredCache(BaseCache):
+    """A cache in the memory of the process (L1) in front of a shared cache (L2).
+
+    LOCATION is the alias of the shared cache in CACHES, OPTIONS:
+        - MAX_ENTRIES: the entries the L1 keeps, the least recently used ones go first.
+        - L1_TIMEOUT: seconds an entry stays in the L1, at most its own timeout.
+        - STATS_FLUSH_EVERY: lookups between two writes of the hit/miss counters.
+
+    An L1 entry is not removed when another process changes or deletes the key, only when it
+    expires. Only put entries in it that never change under their key: make the key versioned
+    (see cache_services.user_key() and fragment_services) and move to a new version instead.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get("OPTIONS", {})
+        self.shared_alias = location
+        self.local_timeout = int(options.get("L1_TIMEOUT", 300))
+        with _lock:
+            self.local = _local_caches.setdefault(location, LocalCache(self._max_entries))
+            self.stats = _stats.setdefault(location, BufferedCounters(int(options.get("STATS_FLUSH_EVERY", 100))))
+
+    @property
+    def shared(self):
+        return caches[self.shared_alias]
+
+    def count(self, tier, result):
+        self.stats.count(STATS_KEY.format(tier, result), self.shared)
+
+    def local_timeout_for(self, timeout):
+        if timeout is DEFAULT_TIMEOUT or timeout is None:
+            return self.local_timeout
+        return min(timeout, self.local_timeout)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self.shared.add(key, value, timeout, version)
+        if added:
+            self.local.set(self.make_and_validate_key(key, version), value, self.local_timeout_for(timeout))
+        return added
+
+    def get_local(self, key, version=None):
+        """Return the value in the L1 of the process, or _missing."""
+
+        value = self.local.get(self.make_and_validate_key(key, version))
+        self.count("l1", "misses" if value is _missing else "hits")
+        return value
+
+    def get(self, key, default=None, version=None):
+        value = self.get_local(key, version)
+        if value is not _missing:
+            return value
+        value = self.shared.get(key, _missing, version)
+        if value is _missing:
+            self.count("l2", "misses")
+            return default
+        self.count("l2", "hits")
+        self.local.set(self.make_and_validate_key(key, version), value, self.local_timeout)
+        return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.shared.set(key, value, timeout, version)
+        self.local.set(self.make_and_validate_key(key, version), value, self.local_timeout_for(timeout))
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.shared.touch(key, timeout, version)
+
+    def delete(self, key, version=None):
+        self.local.delete(self.make_and_validate_key(key, version))
+        return self.shared.delete(key, version)
+
+    def get_many(self, keys, version=None):
+        found = {}
+        missing = []
+        for key in keys:
+            value = self.get_local(key, version)
+            if value is _missing:
+                missing.append(key)
+            else:
+                found[key] = value
+        if missing:
+            shared = self.shared.get_many(missing, version)
+            for key in missing:
+                self.count("l2", "hits" if key in shared else "misses")
+            for key, value in shared.items():
+                self.local.set(self.make_and_validate_key(key, version), value, self.local_timeout)
+            found.update(shared)
+        return found
+
+    def incr(self, key, delta=1, version=None):
+        # Changes the value under the key, so it can't stay in the L1 of the process.
+        self.local.delete(self.make_and_validate_key(key, version))
+        return self.shared.incr(key, delta, version)
+
+    def has_key(self, key, version=None):
+        if self.local.get(self.make_and_validate_key(key, version)) is not _missing:
+            return True
+        return self.shared.has_key(key, version)
+
+    def clear(self):
+        self.local.clear()
+        self.shared.clear()
@@ -1,28 +1,253 @@
+import asyncio
+import base64
+import binascii
+import datetime
+import inspect
+import json
+from urllib.parse import urlencode
+
+from django.contrib.auth.mixins import LoginRequiredMixin
 from django.core.exceptions import PermissionDenied
-from .models import UserDish, Dish, UserProduct
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Exists, OuterRef, Q
+from django.http import Http404, HttpResponse
+from django.shortcuts import render
+from django.utils.functional import empty
+from .models import Dish, ProductDish, UserProduct
 
 
 class UserDishAccessMixin:
     """This mixins checks if the dish/products in dish are from the user.
-    If not manipulation of the objects is declined."""
+    If not manipulation of the objects is declined.
+    The owner is read from the user column of the (related) dish, so fetching the object and
+    checking the owner is done in one query."""
 
     def get_object(self, queryset=None):
-        obj = super().get_object(queryset=queryset)
-        user = self.request.user
-        if isinstance(obj, Dish):
-            if not UserDish.objects.filter(user=user, dish=obj).exists():
-                raise PermissionDenied
-        else:
-            if not UserDish.objects.filter(user=user, dish=obj.dish).exists():
-                raise PermissionDenied
+        obj = super().get_object(queryset=self.get_owner_queryset(queryset))
+        self.check_owner(obj)
+        return obj
+
+    async def aget_object(self, queryset=None):
+        obj = await super().aget_object(queryset=self.get_owner_queryset(queryset))
+        self.check_owner(obj)
         return obj
 
+    def get_owner_queryset(self, queryset):
+        if queryset is None:
+            queryset = self.get_queryset()
+        if queryset.model is ProductDish:
+            queryset = queryset.select_related("dish")
+        return queryset
+
+    def check_owner(self, obj):
+        dish = obj if isinstance(obj, Dish) else obj.dish
+        if dish.user_id != self.request.user.pk:
+            raise PermissionDenied
+
 
 class UserProductAccessMixin:
+    """This mixin checks if the product is linked to the user, in the query that fetches the product."""
 
     def get_object(self, queryset=None):
-        obj = super().get_object(queryset=queryset)
-        user = self.request.user
-        if not UserProduct.objects.filter(user=user, product=obj).exists():
+        if queryset is None:
+            queryset = self.get_queryset()
+        used = UserProduct.objects.filter(product=OuterRef("pk"), user=self.request.user)
+        obj = super().get_object(queryset=queryset.annotate(used_by_user=Exists(used)))
+        if not obj.used_by_user:
             raise PermissionDenied
         return obj
+
+
+class HtmxFormMixin:
+    """Answer the htmx requests of a create, update or delete view with fragments instead of pages.
+
+    htmx_template_name is the form as a fragment, for GET and for an invalid POST. After a
+    successful write htmx_success_template_name is rendered with get_htmx_success_context(),
+    instead of a redirect to a page that runs all its queries again. Elements in it with
+    hx-swap-oob update other parts of the page, like counters. Without a success template the
+    response is empty, which removes the target (a deleted row). Requests without htmx get the
+    full pages and the redirect, so the views keep working without JavaScript.
+    """
+
+    htmx_template_name = None
+    htmx_success_template_name = None
+
+    def get_template_names(self):
+        if self.request.htmx and self.htmx_template_name:
+            return [self.htmx_template_name]
+        return super().get_template_names()
+
+    def form_valid(self, form):
+        response = super().form_valid(form)
+        if not self.request.htmx:
+            return response
+        if self.htmx_success_template_name is None:
+            return HttpResponse()
+        return render(self.request, self.htmx_success_template_name, self.get_htmx_success_context())
+
+    def get_htmx_success_context(self):
+        return {"object": self.object}
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    """DjangoJSONEncoder cuts datetimes to milliseconds, a cursor needs the exact value."""
+
+    def default(self, o):
+        if isinstance(o, (datetime.datetime, datetime.time)):
+            return o.isoformat()
+        return super().default(o)
+
+
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values, cls=CursorEncoder).encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (binascii.Error, ValueError):
+        raise Http404("Ongeldige pagina.")
+
+
+class KeysetPaginationMixin:
+    """This mixin paginates a ListView with a cursor instead of page numbers.
+
+    The rows are ordered by the Meta.ordering of the model with the pk as tie breaker.
+    The cursor holds the ordering values of the last row of the page, the next page is
+    everything after it: WHERE (name > 'Soep') OR (name = 'Soep' AND id > 12). With an index
+    on the ordering this costs the same for the first and the hundredth page.
+
+    htmx requests get partial_template_name: only the rows and the element that loads the
+    next page when it is scrolled into view. Other requests get the full page.
+    """
+
+    page_size = 25
+    cursor_param = "after"
+    partial_template_name = None
+    keyset_result = None
+
+    def get_keyset_ordering(self):
+        ordering = [field for field in self.model._meta.ordering if isinstance(field, str)]
+        descending = bool(ordering) and ordering[0].startswith("-")
+        return ordering + ["-pk" if descending else "pk"]
+
+    def get_template_names(self):
+        if self.request.htmx and self.partial_template_name:
+            return [self.partial_template_name]
+        return super().get_template_names()
+
+    def paginate_keyset(self, queryset):
+        """Return the rows of the requested page and the cursor of the next page (or None)."""
+        return self.keyset_page(list(self.keyset_queryset(queryset)))
+
+    async def apaginate_keyset(self, queryset):
+        """paginate_keyset() with the async ORM."""
+        return self.keyset_page(await alist(self.keyset_queryset(queryset)))
+
+    def keyset_queryset(self, queryset):
+        """The rows of the requested page and one more, to know whether there is a next page."""
+        ordering = self.get_keyset_ordering()
+        queryset = queryset.order_by(*ordering)
+
+        cursor = self.request.GET.get(self.cursor_param)
+        if cursor:
+            values = decode_cursor(cursor)
+            if not isinstance(values, list) or len(values) != len(ordering):
+                raise Http404("Ongeldige pagina.")
+            queryset = queryset.filter(self.keyset_filter(ordering, values))
+        return queryset[: self.page_size + 1]
+
+    def keyset_page(self, rows):
+        ordering = self.get_keyset_ordering()
+        next_cursor = None
+        if len(rows) > self.page_size:
+            rows = rows[: self.page_size]
+            next_cursor = encode_cursor(
+                [getattr(rows[-1], field.lstrip("-")) for field in ordering]
+            )
+        return rows, next_cursor
+
+    @staticmethod
+    def keyset_filter(ordering, values):
+        """Build the filter for the rows that come after the given ordering values."""
+        condition = Q()
+        equal = Q()
+        for field, value in zip(ordering, values):
+            name = field.lstrip("-")
+            lookup = "lt" if field.startswith("-") else "gt"
+            condition |= equal & Q(**{f"{name}__{lookup}": value})
+            equal &= Q(**{name: value})
+        return condition
+
+    def get_context_data(self, *, object_list=None, **kwargs):
+        # An async get() has already read the page.
+        rows, next_cursor = self.keyset_result or self.paginate_keyset(
+            self.object_list if object_list is None else object_list
+        )
+        context = super().get_context_data(object_list=rows, **kwargs)
+        context["next_cursor"] = next_cursor
+        context["next_page_url"] = (
+            "?" + urlencode({self.cursor_param: next_cursor}) if next_cursor else None
+        )
+        return context
+
+
+async def alist(queryset):
+    """Evaluate a queryset with the async ORM, like list(queryset)."""
+    return [obj async for obj in queryset]
+
+
+class AsyncLoginRequiredMixin(LoginRequiredMixin):
+    """LoginRequiredMixin for views with async handlers.
+
+    request.user is a lazy object that queries the session and the user the first time it is
+    used, which is not allowed on the event loop. The user is loaded with request.auser() first,
+    unless a middleware already loaded it (ServerTimingMiddleware does, in a thread).
+    """
+
+    async def dispatch(self, request, *args, **kwargs):
+        if getattr(request.user, "_wrapped", None) is empty:
+            request.user = await request.auser()
+        response = super().dispatch(request, *args, **kwargs)
+        if inspect.isawaitable(response):
+            response = await response
+        return response
+
+
+class AsyncKeysetListMixin(KeysetPaginationMixin):
+    """A keyset paginated ListView with an async get(): the page is read with the async ORM.
+
+    Only the queries are async. The context and the templates are the same as those of the sync
+    view, Django renders the TemplateResponse in a thread, so the fragment cache still works there.
+    """
+
+    async def get(self, request, *args, **kwargs):
+        self.object_list = self.get_queryset()
+        self.keyset_result = await self.apaginate_keyset(self.object_list)
+        return self.render_to_response(self.get_context_data())
+
+
+class AsyncDetailMixin:
+    """A DetailView with an async get(): the object is read with queryset.aget().
+
+    aget_related() returns extra context that only needs the url kwargs, not the object.
+    Django 5.0 runs the async ORM calls of a request one after another on the connection of
+    the request, so its queries don't overlap with the one of the object. While they wait for
+    the database the event loop serves other requests.
+    """
+
+    async def get(self, request, *args, **kwargs):
+        self.object, related = await asyncio.gather(self.aget_object(), self.aget_related())
+        context = self.get_context_data(object=self.object, **related)
+        return self.render_to_response(context)
+
+    async def aget_object(self, queryset=None):
+        if queryset is None:
+            queryset = self.get_queryset()
+        try:
+            return await queryset.aget(pk=self.kwargs.get(self.pk_url_kwarg))
+        except queryset.model.DoesNotExist:
+            raise Http404(f"Geen {queryset.model._meta.verbose_name} gevonden.")
+
+    async def aget_related(self):
+        return {}
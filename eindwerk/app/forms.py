@@ -1,4 +1,6 @@
 from django import forms
+from django.core.exceptions import ValidationError
+from django.urls import reverse
 from .models import (
     ShoppingList,
     Product,
@@ -26,6 +28,25 @@ class CapitalizeField(forms.CharField):
         return value
 
 
+class UnitChoiceField(forms.ModelChoiceField):
+    """Custom formfield to choose a unit. When a dict of units is given (see BaseProductDishFormSet),
+    the unit is looked up in it instead of doing a query for every form."""
+
+    units = None
+
+    def to_python(self, value):
+        if self.units is None or value in self.empty_values:
+            return super().to_python(value)
+        try:
+            return self.units[str(value)]
+        except KeyError:
+            raise ValidationError(
+                self.error_messages["invalid_choice"],
+                code="invalid_choice",
+                params={"value": value},
+            )
+
+
 class ProductForm(forms.ModelForm):
     """Form for creating an individual product. Products have a name and can be marked as favorites."""
 
@@ -69,6 +90,7 @@ class ProductDishForm(forms.ModelForm):
     class Meta:
         model = ProductDish
         fields = ["product_name", "quantity", "unit", "product_is_favorite"]
+        field_classes = {"unit": UnitChoiceField}
         labels = {
             "product_name": "Product naam",
             "product_is_favorite": "Favoriet",
@@ -93,12 +115,27 @@ class ProductDishForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         super(ProductDishForm, self).__init__(*args, **kwargs)
         self.fields["product_name"].widget.attrs.update(
-            {"class": "form-control", "placeholder": "Product naam"}
+            {
+                "class": "form-control",
+                "placeholder": "Product naam",
+                # Suggest existing products while typing, see ProductAutocompleteView.
+                "autocomplete": "off",
+                "list": "product-suggestions",
+                "hx-get": reverse("product_autocomplete"),
+                "hx-trigger": "input changed delay:250ms",
+                "hx-target": "#product-suggestions",
+            }
         )
         self.fields["product_is_favorite"].widget.attrs.update(
             {"class": "form-check-input"}
         )
 
+    def _get_validation_exclusions(self):
+        # The unit is already validated by UnitChoiceField, the model doesn't have to query it again.
+        exclude = super()._get_validation_exclusions()
+        exclude.add("unit")
+        return exclude
+
 
 class DishForm(forms.ModelForm):
     """Form for creating a dish, a dish has a name, recipe and can be marked as favorite."""
@@ -152,10 +189,15 @@ class ShoppingListForm(forms.ModelForm):
 class UnitForm(forms.ModelForm):
     class Meta:
         model = Unit
-        fields = ["name", "abbreviation"]
+        fields = ["name", "abbreviation", "dimension", "factor"]
         labels = {
             "name": "Maateenheid",
             "abbreviation": "Afkorting",
+            "dimension": "Soort",
+            "factor": "Omrekenfactor",
+        }
+        help_texts = {
+            "factor": "Aantal g, ml of stuks in 1 eenheid. Leeg laten als de eenheid niet omgerekend kan worden.",
         }
         widgets = {
             "name": forms.TextInput(
@@ -170,8 +212,28 @@ class UnitForm(forms.ModelForm):
                     "placeholder": "Afkorting",
                 }
             ),
+            "dimension": forms.Select(
+                attrs={
+                    "class": "form-select",
+                }
+            ),
+            "factor": forms.NumberInput(
+                attrs={
+                    "class": "form-control",
+                    "placeholder": "Omrekenfactor",
+                }
+            ),
         }
 
+    def clean(self):
+        cleaned_data = super().clean()
+        factor = cleaned_data.get("factor")
+        if bool(cleaned_data.get("dimension")) != (factor is not None):
+            raise ValidationError("Vul zowel de soort als de omrekenfactor in, of laat beide leeg.")
+        if factor is not None and factor <= 0:
+            self.add_error("factor", "De omrekenfactor moet groter zijn dan 0.")
+        return cleaned_data
+
 
 class MenuForm(forms.ModelForm):
     class Meta:
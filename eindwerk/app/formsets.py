@@ -1,13 +1,35 @@
 # Django imports
-from django.forms import inlineformset_factory, modelformset_factory
+from django.forms import BaseInlineFormSet, inlineformset_factory, modelformset_factory
+from django.utils.functional import cached_property
 
 # Project imports
-from .models import Dish, ProductDish, DishMenu
+from .models import Dish, ProductDish, DishMenu, Unit
 from .forms import ProductDishForm, DishMenuForm
 
+
+class BaseProductDishFormSet(BaseInlineFormSet):
+    """All forms of a submitted formset share one unit lookup.
+    This way validating the formset takes one unit query instead of one per ingredient."""
+
+    @cached_property
+    def units(self):
+        return {str(unit.pk): unit for unit in Unit.objects.all()}
+
+    def _construct_form(self, i, **kwargs):
+        form = super()._construct_form(i, **kwargs)
+        if self.is_bound:
+            form.fields["unit"].units = self.units
+        return form
+
+
 # Formset for creating multiple products while creating a Dish.
 ProductDishFormSet = inlineformset_factory(
-    Dish, ProductDish, form=ProductDishForm, extra=1, can_delete=False
+    Dish,
+    ProductDish,
+    form=ProductDishForm,
+    formset=BaseProductDishFormSet,
+    extra=1,
+    can_delete=False,
 )
 
 # Formset for creating a menu with multiple dishes.
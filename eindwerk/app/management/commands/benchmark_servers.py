@@ -0,0 +1,49 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ...services.benchmark_services import run_server_benchmark
+
+
+class Command(BaseCommand):
+    """Compare the throughput of the WSGI and the ASGI application on the read-heavy pages.
+
+    Both applications are run in this process against the configured database, with simulated
+    clients that take --client-delay seconds to read every response. WSGI gets --threads threads,
+    ASGI serves --clients requests at once on one event loop. A user with --size dishes is
+    created for the run and deleted afterwards.
+
+    Usage: python manage.py benchmark_servers --size 1000 --requests 500 --clients 100
+    """
+
+    help = "Compare the requests per second of eindwerk.wsgi and eindwerk.asgi."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--size", type=int, default=100, help="Number of dishes of the user.")
+        parser.add_argument("--requests", type=int, default=200, help="Requests per application.")
+        parser.add_argument("--threads", type=int, default=8, help="Threads of the WSGI application.")
+        parser.add_argument("--clients", type=int, default=64, help="Requests in flight for the ASGI application.")
+        parser.add_argument(
+            "--client-delay", type=float, default=0.05, help="Seconds a client takes to read a response."
+        )
+        parser.add_argument("--output", help="Write the results as JSON to this file.")
+
+    def handle(self, *args, **options):
+        results = run_server_benchmark(
+            options["size"], options["requests"], options["threads"], options["clients"], options["client_delay"]
+        )
+
+        self.stdout.write(f"{'server':<8} {'requests':>9} {'seconds':>8} {'req/s':>8}  statuses")
+        for name, row in results.items():
+            self.stdout.write(
+                f"{name:<8} {row['requests']:>9} {row['seconds']:>8.2f} {row['requests_per_second']:>8.1f}  "
+                + ", ".join(map(str, row["statuses"]))
+            )
+
+        if options["output"]:
+            with open(options["output"], "w") as file:
+                json.dump(results, file, indent=2)
+
+        failed = [name for name, row in results.items() if row["statuses"] != [200]]
+        if failed:
+            raise CommandError(f"Not every request succeeded: {', '.join(failed)}.")
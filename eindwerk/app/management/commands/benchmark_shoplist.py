@@ -0,0 +1,73 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from ...models import Dish, DishMenu, MenuList, Product, ProductDish, Unit, User
+from ...services.shoplist_services import create_shoppinglist_from_menu
+
+
+class Command(BaseCommand):
+    """Benchmark the shopping list generation for menus of growing size.
+
+    All data is created inside a transaction that is rolled back afterwards,
+    so the command can safely be run against a development database.
+
+    Usage: python manage.py benchmark_shoplist --sizes 5 50 500
+    """
+
+    help = "Measure query count and wall time of shopping list generation per menu size."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", nargs="+", type=int, default=[5, 50, 500])
+        parser.add_argument("--ingredients", type=int, default=8, help="Ingredients per dish.")
+        parser.add_argument("--products", type=int, default=100, help="Size of the product pool.")
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'dishes':>8} {'queries':>8} {'items':>8} {'ms':>10}")
+        for size in options["sizes"]:
+            with transaction.atomic():
+                menu, user = self.seed(size, options["ingredients"], options["products"])
+
+                with CaptureQueriesContext(connection) as queries:
+                    start = time.perf_counter()
+                    shoppinglist = create_shoppinglist_from_menu(menu, user)
+                    elapsed = (time.perf_counter() - start) * 1000
+                items = shoppinglist.productshoppinglist_set.count()
+
+                self.stdout.write(f"{size:>8} {len(queries):>8} {items:>8} {elapsed:>10.2f}")
+                transaction.set_rollback(True)
+
+    def seed(self, size, ingredients, products):
+        """Create a user with a menu of `size` dishes that share a pool of products."""
+
+        user = User.objects.create(username="benchmark_shoplist")
+        units = Unit.objects.bulk_create(
+            [
+                Unit(name="Gram", abbreviation="g", dimension=Unit.MASS, factor=1),
+                Unit(name="Kilogram", abbreviation="kg", dimension=Unit.MASS, factor=1000),
+                Unit(name="Stuk", abbreviation="st", dimension=Unit.COUNT, factor=1),
+            ]
+        )
+        product_pool = Product.objects.bulk_create(
+            [Product(name=f"Benchmark product {i}") for i in range(products)]
+        )
+        dishes = Dish.objects.bulk_create(
+            [Dish(name=f"Benchmark dish {i}", recipe="") for i in range(size)]
+        )
+        ProductDish.objects.bulk_create(
+            [
+                ProductDish(
+                    dish=dish,
+                    product=product_pool[(i * ingredients + j) % products],
+                    unit=units[j % len(units)],
+                    quantity=j + 1,
+                )
+                for i, dish in enumerate(dishes)
+                for j in range(ingredients)
+            ]
+        )
+        menu = MenuList.objects.create(name="Benchmark menu")
+        DishMenu.objects.bulk_create([DishMenu(menu=menu, dish=dish) for dish in dishes])
+        return menu, user
@@ -0,0 +1,62 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ...services.benchmark_services import (
+    BASELINE_PATH,
+    SIZES,
+    baseline_from,
+    check_results,
+    load_baseline,
+    run_benchmark,
+)
+
+
+class Command(BaseCommand):
+    """Benchmark every route of app/urls.py for users with a growing number of dishes.
+
+    Per route and size the number of queries, the time in the database, the time spent rendering
+    templates and the total time are measured. All data is created inside a transaction that is
+    rolled back afterwards, so the command can safely be run against a development database.
+    The command fails when the number of queries of a route grows with the data or is higher
+    than in the stored baseline (app/benchmarks/baseline.json).
+
+    Usage: python manage.py benchmark_urls --sizes 10 100 1000 10000 --output results.json
+    """
+
+    help = "Measure query count and latency of every route per data size."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", nargs="+", type=int, default=SIZES, help="Numbers of dishes.")
+        parser.add_argument("--repeat", type=int, default=3, help="Runs per route, the median time is kept.")
+        parser.add_argument("--output", help="Write the results as JSON to this file.")
+        parser.add_argument("--baseline", default=str(BASELINE_PATH), help="The stored query counts.")
+        parser.add_argument(
+            "--update-baseline", action="store_true", help="Store the query counts of this run as the baseline."
+        )
+
+    def handle(self, *args, **options):
+        results = run_benchmark(options["sizes"], options["repeat"])
+
+        self.stdout.write(f"{'route':<32} {'dishes':>7} {'queries':>8} {'sql ms':>9} {'tpl ms':>9} {'total ms':>9}")
+        for name, by_size in results["routes"].items():
+            for size, row in by_size.items():
+                self.stdout.write(
+                    f"{name:<32} {size:>7} {row['queries']:>8} {row['sql_ms']:>9.2f} "
+                    f"{row['template_ms']:>9.2f} {row['total_ms']:>9.2f}"
+                )
+
+        if options["output"]:
+            with open(options["output"], "w") as file:
+                json.dump(results, file, indent=2)
+
+        if options["update_baseline"]:
+            with open(options["baseline"], "w") as file:
+                json.dump(baseline_from(results), file, indent=2)
+                file.write("\n")
+            self.stdout.write(f"The baseline is written to {options['baseline']}.")
+            return
+
+        problems = check_results(results, load_baseline(options["baseline"]))
+        if problems:
+            raise CommandError("\n".join(problems))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from ...services.cache_services import cache_stats, reset_cache_stats
+
+
+class Command(BaseCommand):
+    """Show the hits and misses per tier of the tiered cache: the L1 of the processes and the shared L2.
+
+    Every process writes its counters to the shared cache once every STATS_FLUSH_EVERY lookups,
+    so with a shared cache (file or db) they add up all workers, up to the last batch of each.
+
+    Usage: python manage.py cache_stats [--reset]
+    """
+
+    help = "Show the hit/miss counters of the cache tiers."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--reset", action="store_true", help="Set the counters back to zero.")
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'tier':<6} {'hits':>8} {'misses':>8} {'hit rate':>9}")
+        for tier, stats in cache_stats().items():
+            hit_rate = "-" if stats["hit_rate"] is None else f"{stats['hit_rate']}%"
+            self.stdout.write(f"{tier:<6} {stats['hits']:>8} {stats['misses']:>8} {hit_rate:>9}")
+        if options["reset"]:
+            reset_cache_stats()
+            self.stdout.write("The counters are reset.")
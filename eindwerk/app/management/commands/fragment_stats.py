@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from ...services.fragment_services import fragment_stats, reset_fragment_stats
+
+
+class Command(BaseCommand):
+    """Show the hits and misses of the fragment cache, per fragment.
+
+    The counters are kept in the cache, so with a shared cache (file or db) they add up all workers.
+
+    Usage: python manage.py fragment_stats [--reset]
+    """
+
+    help = "Show the hit/miss counters of the fragment cache."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--reset", action="store_true", help="Set the counters back to zero.")
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'fragment':<20} {'hits':>8} {'misses':>8} {'hit rate':>9}")
+        for name, stats in fragment_stats().items():
+            hit_rate = "-" if stats["hit_rate"] is None else f"{stats['hit_rate']}%"
+            self.stdout.write(f"{name:<20} {stats['hits']:>8} {stats['misses']:>8} {hit_rate:>9}")
+        if options["reset"]:
+            reset_fragment_stats()
+            self.stdout.write("The counters are reset.")
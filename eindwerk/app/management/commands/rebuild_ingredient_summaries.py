@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from ...services.dish_services import rebuild_ingredient_summaries
+from ...services.job_services import enqueue
+
+
+class Command(BaseCommand):
+    """Rebuild Dish.ingredient_summary for every dish, used to backfill existing rows.
+
+    With --background it is queued as a job for the workers (python manage.py run_worker).
+
+    Usage: python manage.py rebuild_ingredient_summaries --batch-size 500
+    """
+
+    help = "Rebuild the precomputed ingredient summary of all dishes."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--background", action="store_true", help="Queue a job instead of running it here.")
+
+    def handle(self, *args, **options):
+        if options["background"]:
+            job = enqueue("rebuild_ingredient_summaries", batch_size=options["batch_size"])
+            self.stdout.write(self.style.SUCCESS(f"Queued job {job.pk} ({job.get_status_display()})."))
+            return
+        count = rebuild_ingredient_summaries(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt the ingredient summary of {count} dishes."))
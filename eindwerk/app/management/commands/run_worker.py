@@ -0,0 +1,82 @@
+import multiprocessing
+import signal
+import threading
+
+import django
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from ...services.job_services import work, worker_name
+
+
+def run_threads(threads, poll_interval, burst, stop=None):
+    """Run `threads` workers in this process until stop is set (SIGTERM/SIGINT) or, with burst, the queue is empty."""
+
+    if not apps.ready:
+        # A process started with "spawn" (macOS, Windows) imports Django again.
+        django.setup()
+    stop = stop or threading.Event()
+    if threading.current_thread() is threading.main_thread():
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, lambda *args: stop.set())
+
+    counts = [0] * threads
+
+    def run(number):
+        counts[number] = work(worker_name(number), stop, poll_interval, burst)
+
+    pool = [threading.Thread(target=run, args=(number,), name=f"worker-{number}") for number in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    return sum(counts)
+
+
+class Command(BaseCommand):
+    """Run the background jobs of the queue (the Job table), see app/services/job_services.py.
+
+    Every process runs --threads workers that each claim one job at a time. Start this command
+    on as many machines as needed: the jobs are claimed with row locks, a job runs once.
+    SIGTERM or Ctrl+C lets the running jobs finish and then stops.
+    Set JOBS_RUN_INLINE=0 for the web server when workers run, else the requests run the jobs themselves.
+
+    Usage: python manage.py run_worker --processes 2 --threads 4
+    """
+
+    help = "Run the queued background jobs."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--processes", type=int, default=1, help="Worker processes.")
+        parser.add_argument("--threads", type=int, default=2, help="Worker threads per process.")
+        parser.add_argument("--poll-interval", type=float, default=1.0, help="Seconds between looks at an empty queue.")
+        parser.add_argument("--burst", action="store_true", help="Stop when the queue is empty.")
+
+    def handle(self, *args, **options):
+        threads, poll_interval, burst = options["threads"], options["poll_interval"], options["burst"]
+        self.stdout.write(f"Starting {options['processes']} process(es) with {threads} worker thread(s).")
+
+        if options["processes"] == 1:
+            count = run_threads(threads, poll_interval, burst)
+            self.stdout.write(self.style.SUCCESS(f"Stopped after {count} jobs."))
+            return
+
+        # The processes open their own database connections.
+        connections.close_all()
+        processes = [
+            multiprocessing.Process(target=run_threads, args=(threads, poll_interval, burst))
+            for _ in range(options["processes"])
+        ]
+        for process in processes:
+            process.start()
+
+        def stop_processes(*args):
+            for process in processes:
+                process.terminate()
+
+        signal.signal(signal.SIGTERM, stop_processes)
+        signal.signal(signal.SIGINT, stop_processes)
+        for process in processes:
+            process.join()
+        self.stdout.write(self.style.SUCCESS("Stopped."))
@@ -0,0 +1,58 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from ...services.seed_services import DataSeeder
+
+
+class Command(BaseCommand):
+    """Fill the database with generated users, dishes, menus and shopping lists for load testing.
+
+    The same --seed and scale always give the same data. Use another --prefix to add a second
+    set of users next to an existing one, the products are shared and reused.
+
+    Usage: python manage.py seed_data --users 10000 --dishes 50 --ingredients 8 --seed 42
+    """
+
+    help = "Generate a large, deterministic data set for load testing."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seed", type=int, default=0, help="Seed of the random generator.")
+        parser.add_argument("--users", type=int, default=100)
+        parser.add_argument("--dishes", type=int, default=50, help="Dishes per user.")
+        parser.add_argument("--ingredients", type=int, default=8, help="Ingredients per dish.")
+        parser.add_argument("--products", type=int, default=2000, help="Size of the shared product pool.")
+        parser.add_argument(
+            "--skew", type=float, default=1.0, help="How much more popular the first products are, 0 is uniform."
+        )
+        parser.add_argument("--menus", type=int, default=5, help="Menus per user.")
+        parser.add_argument("--dishes-per-menu", type=int, default=7)
+        parser.add_argument("--shoppinglists", type=int, default=2, help="Shopping lists per user.")
+        parser.add_argument("--batch-size", type=int, default=1000, help="Rows per insert.")
+        parser.add_argument("--prefix", default="seed", help="Start of the user, dish and menu names.")
+
+    def handle(self, *args, **options):
+        seeder = DataSeeder(
+            seed=options["seed"],
+            users=options["users"],
+            dishes=options["dishes"],
+            ingredients=options["ingredients"],
+            products=options["products"],
+            skew=options["skew"],
+            menus=options["menus"],
+            dishes_per_menu=options["dishes_per_menu"],
+            shoppinglists=options["shoppinglists"],
+            batch_size=options["batch_size"],
+            prefix=options["prefix"],
+        )
+        start = time.perf_counter()
+
+        def progress(users):
+            self.stdout.write(f"{users} of {options['users']} users ({time.perf_counter() - start:.1f} s)")
+
+        counts = seeder.run(progress)
+        for model, count in sorted(counts.items()):
+            self.stdout.write(f"{model:<22} {count:>10}")
+        total = sum(counts.values())
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(f"Inserted {total} rows in {elapsed:.1f} s ({total / elapsed:.0f} rows/s)."))
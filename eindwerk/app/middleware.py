@@ -0,0 +1,170 @@
+# Python imports
+import json
+import logging
+import random
+import time
+
+# Django imports
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+# Project imports
+from .services.nplusone_services import detect_repeated_queries
+from .services.timing_services import current_timer, request_timing
+
+logger = logging.getLogger("app.timing")
+nplusone_logger = logging.getLogger("app.nplusone")
+
+
+class HybridMiddleware:
+    """Base for middleware that works with sync and async requests.
+
+    Under ASGI every sync-only middleware makes Django run the rest of the request in a thread,
+    which takes away what the async views win. A hybrid middleware is called with a coroutine
+    function as get_response under ASGI and then handles the request in __acall__.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return self.handle(request)
+
+    def handle(self, request):
+        raise NotImplementedError
+
+    async def __acall__(self, request):
+        raise NotImplementedError
+
+
+class AsyncWhiteNoiseMiddleware(HybridMiddleware, WhiteNoiseMiddleware):
+    """WhiteNoiseMiddleware that doesn't force the requests of the app into a thread under ASGI.
+
+    Finding a static file is a dict lookup (a stat with autorefresh in development), only the
+    static files themselves are served in a thread.
+    """
+
+    def __init__(self, get_response):
+        WhiteNoiseMiddleware.__init__(self, get_response)
+        HybridMiddleware.__init__(self, get_response)
+
+    def handle(self, request):
+        return WhiteNoiseMiddleware.__call__(self, request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve)(static_file, request)
+        return await self.get_response(request)
+
+
+class ServerTimingMiddleware(HybridMiddleware):
+    """Measure where the time of a request goes and send it along in a Server-Timing header.
+
+    The header has these metrics, in milliseconds, that add up to the total:
+        - db: all queries of the request, the number of queries is in the description.
+        - auth: loading the session and the user, without its queries.
+        - tpl: rendering the templates, without the queries run while rendering.
+        - view: everything else, mostly the Python code of the view and the middleware.
+        - total: the whole request, from this middleware on.
+    The browser shows them in the network tab of the developer tools.
+
+    A share of the requests (settings.SERVER_TIMING_SAMPLE_RATE) is also logged as a JSON record,
+    with the name of the url and whether it was an htmx request. The overhead is a function call
+    per query and per template, so the middleware can stay on in production.
+    """
+
+    def handle(self, request):
+        start = time.perf_counter()
+        with request_timing() as timer:
+            response = self.get_response(request)
+        return self.add_timing(request, response, timer, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        start = time.perf_counter()
+        with request_timing() as timer:
+            response = await self.get_response(request)
+        return self.add_timing(request, response, timer, time.perf_counter() - start)
+
+    def add_timing(self, request, response, timer, total):
+        durations = {
+            "db": timer.queries.duration,
+            "auth": timer.durations.get("auth", 0.0),
+            "tpl": timer.durations.get("tpl", 0.0),
+        }
+        durations["view"] = max(total - sum(durations.values()), 0.0)
+        durations["total"] = total
+        metrics = [
+            f'{name};dur={duration * 1000:.1f}' + (f';desc="{timer.queries.count} queries"' if name == "db" else "")
+            for name, duration in durations.items()
+        ]
+        if response.has_header("Server-Timing"):
+            metrics.insert(0, response["Server-Timing"])
+        response["Server-Timing"] = ", ".join(metrics)
+
+        if settings.SERVER_TIMING_SAMPLE_RATE and random.random() < settings.SERVER_TIMING_SAMPLE_RATE:
+            self.log(request, response, timer, durations)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # The user is loaded lazily, load it now to measure the session and authentication separately.
+        # Under ASGI Django calls this sync method in a thread, where the user may be loaded.
+        timer = current_timer()
+        if timer is not None and hasattr(request, "user"):
+            with timer.phase("auth"):
+                request.user.is_authenticated
+
+    def log(self, request, response, timer, durations):
+        match = request.resolver_match
+        record = {
+            "url_name": match.url_name if match else None,
+            "method": request.method,
+            "status": response.status_code,
+            "htmx": bool(getattr(request, "htmx", False)),
+            "queries": timer.queries.count,
+            **{f"{name}_ms": round(duration * 1000, 2) for name, duration in durations.items()},
+        }
+        logger.info(json.dumps(record))
+
+
+class NPlusOneMiddleware(HybridMiddleware):
+    """Log the SQL statements that run settings.NPLUSONE_THRESHOLD times or more in one request.
+
+    Repeats are almost always a query per row of a list (N+1), the warning shows the statement
+    with the template line and the Python line that ran it. Off when the threshold is 0, the
+    stack is inspected for repeated statements, so it is meant for development and staging.
+    """
+
+    def handle(self, request):
+        if not settings.NPLUSONE_THRESHOLD:
+            return self.get_response(request)
+        with detect_repeated_queries(settings.NPLUSONE_THRESHOLD) as detector:
+            response = self.get_response(request)
+        return self.report(request, response, detector)
+
+    async def __acall__(self, request):
+        if not settings.NPLUSONE_THRESHOLD:
+            return await self.get_response(request)
+        with detect_repeated_queries(settings.NPLUSONE_THRESHOLD) as detector:
+            response = await self.get_response(request)
+        return self.report(request, response, detector)
+
+    def report(self, request, response, detector):
+        if detector.repeated():
+            match = request.resolver_match
+            nplusone_logger.warning(
+                "Repeated queries in %s:\n%s", match.url_name if match else request.path, detector.report()
+            )
+        return response
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.4 on 2026-10-18 12:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dish',
+            name='ingredient_summary',
+            field=models.JSONField(blank=True, default=list, editable=False),
+        ),
+    ]
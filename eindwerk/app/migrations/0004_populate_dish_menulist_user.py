@@ -0,0 +1,37 @@
+# Generated by Django 5.0.4 on 2026-10-18 12:36
+
+from django.db import migrations
+from django.db.models import OuterRef, Subquery
+
+
+def populate_user(apps, schema_editor):
+    """Copy the owner of every dish and menu from the UserDish/UserMenu join tables."""
+    Dish = apps.get_model("app", "Dish")
+    UserDish = apps.get_model("app", "UserDish")
+    MenuList = apps.get_model("app", "MenuList")
+    UserMenu = apps.get_model("app", "UserMenu")
+
+    Dish.objects.update(
+        user_id=Subquery(
+            UserDish.objects.filter(dish_id=OuterRef("pk")).values("user_id")[:1]
+        )
+    )
+    # A menu can have more than one UserMenu row, the oldest one is the owner.
+    MenuList.objects.update(
+        user_id=Subquery(
+            UserMenu.objects.filter(menu_id=OuterRef("pk"))
+            .order_by("pk")
+            .values("user_id")[:1]
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app", "0003_dish_menulist_user"),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_user, migrations.RunPython.noop),
+    ]
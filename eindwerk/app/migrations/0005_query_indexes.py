@@ -0,0 +1,38 @@
+# Generated by Django 5.0.4 on 2026-10-18 12:38
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0004_populate_dish_menulist_user'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='dish',
+            index=models.Index(fields=['user', 'name'], name='app_dish_user_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dishmenu',
+            index=models.Index(fields=['menu', 'dish'], name='app_dishmenu_menu_dish_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(django.db.models.functions.text.Lower('name'), name='app_product_lower_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productdish',
+            index=models.Index(fields=['dish', 'product'], name='app_productdish_dish_prod_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productshoppinglist',
+            index=models.Index(fields=['shoppinglist', 'product_dish'], name='app_psl_list_productdish_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shoppinglist',
+            index=models.Index(fields=['user', '-date'], name='app_shoplist_user_date_idx'),
+        ),
+    ]
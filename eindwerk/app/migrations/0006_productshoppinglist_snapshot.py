@@ -0,0 +1,57 @@
+# Generated by Django 5.0.4 on 2026-10-18 12:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0005_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='productshoppinglist',
+            options={'ordering': ['sort_key']},
+        ),
+        migrations.RemoveIndex(
+            model_name='productshoppinglist',
+            name='app_psl_list_productdish_idx',
+        ),
+        migrations.AddField(
+            model_name='productshoppinglist',
+            name='product',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='app.product'),
+        ),
+        migrations.AddField(
+            model_name='productshoppinglist',
+            name='product_name',
+            field=models.CharField(default='', max_length=50),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='productshoppinglist',
+            name='sort_key',
+            field=models.CharField(default='', editable=False, max_length=50),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='productshoppinglist',
+            name='unit',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='app.unit'),
+        ),
+        migrations.AddField(
+            model_name='productshoppinglist',
+            name='unit_abbreviation',
+            field=models.CharField(blank=True, max_length=15),
+        ),
+        migrations.AlterField(
+            model_name='productshoppinglist',
+            name='product_dish',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='app.productdish'),
+        ),
+        migrations.AddIndex(
+            model_name='productshoppinglist',
+            index=models.Index(fields=['shoppinglist', 'sort_key'], name='app_psl_list_sort_key_idx'),
+        ),
+    ]
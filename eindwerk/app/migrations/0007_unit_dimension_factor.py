@@ -0,0 +1,23 @@
+# Generated by Django 5.0.4 on 2026-10-18 12:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0006_productshoppinglist_snapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='unit',
+            name='dimension',
+            field=models.CharField(blank=True, choices=[('mass', 'Gewicht'), ('volume', 'Volume'), ('count', 'Aantal')], max_length=10),
+        ),
+        migrations.AddField(
+            model_name='unit',
+            name='factor',
+            field=models.DecimalField(blank=True, decimal_places=4, max_digits=12, null=True),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.0.4 on 2026-10-18 12:40
+
+from decimal import Decimal
+
+from django.db import migrations
+
+# Conversion data for the units from db_scripts.sql, looked up by lowercased abbreviation or name.
+KNOWN_UNITS = {
+    ("g", "gram"): ("mass", Decimal("1")),
+    ("kg", "kilogram"): ("mass", Decimal("1000")),
+    ("ml", "milliliter"): ("volume", Decimal("1")),
+    ("cl", "centiliter"): ("volume", Decimal("10")),
+    ("dl", "deciliter"): ("volume", Decimal("100")),
+    ("l", "liter"): ("volume", Decimal("1000")),
+    ("el", "eetlepel"): ("volume", Decimal("15")),
+    ("tl", "theelepel"): ("volume", Decimal("5")),
+    ("st", "stuk"): ("count", Decimal("1")),
+}
+
+
+def populate_dimension_factor(apps, schema_editor):
+    Unit = apps.get_model("app", "Unit")
+    for unit in Unit.objects.all():
+        for keys, (dimension, factor) in KNOWN_UNITS.items():
+            if unit.abbreviation.lower() in keys or unit.name.lower() in keys:
+                unit.dimension = dimension
+                unit.factor = factor
+                unit.save(update_fields=["dimension", "factor"])
+                break
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app", "0007_unit_dimension_factor"),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_dimension_factor, migrations.RunPython.noop),
+    ]
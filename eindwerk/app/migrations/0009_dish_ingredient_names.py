@@ -0,0 +1,32 @@
+# Generated by Django 5.0.4 on 2026-10-18 12:45
+
+from django.db import migrations, models
+
+
+def fill_ingredient_names(apps, schema_editor):
+    """Copy the product names out of the existing ingredient summaries."""
+    Dish = apps.get_model("app", "Dish")
+    batch = []
+    for dish in Dish.objects.only("ingredient_summary").iterator(chunk_size=1000):
+        dish.ingredient_names = " ".join(item["name"] for item in dish.ingredient_summary)
+        batch.append(dish)
+        if len(batch) == 1000:
+            Dish.objects.bulk_update(batch, ["ingredient_names"])
+            batch = []
+    Dish.objects.bulk_update(batch, ["ingredient_names"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0008_populate_unit_dimension_factor'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dish',
+            name='ingredient_names',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(fill_ingredient_names, migrations.RunPython.noop),
+    ]
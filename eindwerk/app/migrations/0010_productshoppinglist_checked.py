@@ -0,0 +1,18 @@
+# Generated by Django 5.0.4 on 2026-10-18 13:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0009_dish_ingredient_names'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productshoppinglist',
+            name='checked',
+            field=models.BooleanField(default=False),
+        ),
+    ]
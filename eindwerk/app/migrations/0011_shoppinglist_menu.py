@@ -0,0 +1,29 @@
+# Generated by Django 5.0.4 on 2026-10-18 13:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0010_productshoppinglist_checked'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productshoppinglist',
+            name='dimension',
+            field=models.CharField(blank=True, max_length=10),
+        ),
+        migrations.AddField(
+            model_name='productshoppinglist',
+            name='manual',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='shoppinglist',
+            name='menu',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='app.menulist'),
+        ),
+    ]
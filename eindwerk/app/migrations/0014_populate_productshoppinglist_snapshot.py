@@ -0,0 +1,42 @@
+# Generated by Django 5.0.4 on 2026-10-18 14:30
+
+from django.db import migrations
+
+SNAPSHOT_FIELDS = ["product", "unit", "product_name", "unit_abbreviation", "sort_key"]
+
+
+def take_snapshots(apps, schema_editor):
+    """Copy the product name and unit of existing items from their ProductDish."""
+    ProductShoppingList = apps.get_model("app", "ProductShoppingList")
+    # Items that have a product name were copied already.
+    items = ProductShoppingList.objects.select_related(
+        "product_dish__product", "product_dish__unit"
+    ).filter(product_dish__isnull=False, product_name="")
+
+    batch = []
+    for item in items.iterator(chunk_size=1000):
+        product_dish = item.product_dish
+        item.product_id = product_dish.product_id
+        item.unit_id = product_dish.unit_id
+        item.product_name = product_dish.product.name
+        item.unit_abbreviation = product_dish.unit.abbreviation if product_dish.unit else ""
+        item.sort_key = item.product_name.lower()
+        batch.append(item)
+        if len(batch) == 1000:
+            ProductShoppingList.objects.bulk_update(batch, SNAPSHOT_FIELDS)
+            batch = []
+    ProductShoppingList.objects.bulk_update(batch, SNAPSHOT_FIELDS)
+
+
+# This ran in 0006, between the schema changes of app_productshoppinglist. On PostgreSQL the updated
+# foreign keys leave pending trigger events, and then the CREATE INDEX that followed in the same
+# transaction fails. Databases that did run it in 0006 have the product names already.
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app", "0013_job"),
+    ]
+
+    operations = [
+        migrations.RunPython(take_snapshots, migrations.RunPython.noop),
+    ]
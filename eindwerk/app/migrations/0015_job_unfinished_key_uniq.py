@@ -0,0 +1,17 @@
+# Generated by Django 5.0.4 on 2026-10-18 14:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0014_populate_productshoppinglist_snapshot'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='job',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ['queued', 'running'])), fields=('key',), name='app_job_unfinished_key_uniq'),
+        ),
+    ]
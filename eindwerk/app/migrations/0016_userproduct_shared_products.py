@@ -0,0 +1,23 @@
+# Generated by Django 5.0.4 on 2026-10-18 14:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0015_job_unfinished_key_uniq'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='userproduct',
+            name='product',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='app.product'),
+        ),
+        migrations.AddConstraint(
+            model_name='userproduct',
+            constraint=models.UniqueConstraint(fields=('user', 'product'), name='app_userproduct_user_product_uniq'),
+        ),
+    ]
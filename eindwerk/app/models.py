@@ -4,6 +4,39 @@ from django.contrib.auth.models import AbstractUser
 from django.db import models
 
 
+class UserOwnedQuerySet(models.QuerySet):
+    """QuerySet for models with a direct user column. for_user() is the single place where
+    ownership is checked, it filters on the indexed user column without extra joins."""
+
+    owner_field = "user"
+
+    def for_user(self, user):
+        return self.filter(**{self.owner_field: user})
+
+
+class DishQuerySet(UserOwnedQuerySet):
+    def for_list(self):
+        """Leave out the long text columns, lists only show the name and load the rest when opened."""
+        return self.defer("recipe", "ingredient_summary", "ingredient_names")
+
+
+class ProductQuerySet(UserOwnedQuerySet):
+    # Products are linked to their users through UserProduct.
+    owner_field = "userproduct__user"
+
+
+class ProductDishQuerySet(UserOwnedQuerySet):
+    owner_field = "dish__user"
+
+
+class DishMenuQuerySet(UserOwnedQuerySet):
+    owner_field = "menu__user"
+
+
+class ProductShoppingListQuerySet(UserOwnedQuerySet):
+    owner_field = "shoppinglist__user"
+
+
 class User(AbstractUser):
     """The user model inherits data from the auth0 user. Only name & email is used."""
 
@@ -18,11 +51,17 @@ class UserProduct(models.Model):
 
     # Foreign keys
     user = models.ForeignKey(User, on_delete=models.CASCADE)
-    product = models.OneToOneField("Product", on_delete=models.CASCADE)
+    # Product names are shared, so a product is linked to every user who uses it (once per user).
+    product = models.ForeignKey("Product", on_delete=models.CASCADE)
 
     def __str__(self) -> str:
         return f"{self.user} & {self.product}"
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "product"], name="app_userproduct_user_product_uniq"),
+        ]
+
 
 class UserDish(models.Model):
     """This model represents the relation of a user and a dish."""
@@ -42,23 +81,46 @@ class Product(models.Model):
     name = models.CharField(max_length=50, unique=True)
     is_favorite = models.BooleanField(default=False, blank=True)
 
+    objects = ProductQuerySet.as_manager()
+
     def __str__(self) -> str:
         return f"{self.name}"
 
+    class Meta:
+        indexes = [
+            # Case-insensitive lookups and sorting on the product name.
+            models.Index(Lower("name"), name="app_product_lower_name_idx"),
+        ]
+
 
 class Dish(models.Model):
     """This model represents a Dish. It has a dish name and a recipe.
-    is_favorite is added here too."""
+    is_favorite is added here too.
+    ingredient_summary is a precomputed copy of the products in the dish (name, quantity, unit),
+    so pages can show the ingredients without querying ProductDish for every dish.
+    ingredient_names holds the product names of that summary as plain text for the search index.
+    Both are kept up to date by the signals in signals.py.
+    user is the owner of the dish, use Dish.objects.for_user(user) to get the dishes of a user."""
 
     name = models.CharField(max_length=100, unique=True)
     recipe = models.TextField()
     is_favorite = models.BooleanField(default=False, blank=True)
+    ingredient_summary = models.JSONField(default=list, blank=True, editable=False)
+    ingredient_names = models.TextField(default="", blank=True, editable=False)
+    # Foreign key
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, editable=False)
+
+    objects = DishQuerySet.as_manager()
 
     def __str__(self) -> str:
         return f"{self.name}"
 
     class Meta:
         ordering = ["name"]
+        indexes = [
+            # The dishes of a user, in the default ordering.
+            models.Index(fields=["user", "name"], name="app_dish_user_name_idx"),
+        ]
 
 
 class ProductDish(models.Model):
@@ -75,32 +137,68 @@ class ProductDish(models.Model):
     dish = models.ForeignKey(Dish, on_delete=models.CASCADE)
     unit = models.ForeignKey("Unit", on_delete=models.DO_NOTHING, null=True, blank=True)
 
+    objects = ProductDishQuerySet.as_manager()
+
     def __str__(self) -> str:
         return f"{self.product}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Remember the product the row was loaded with, see signals.product_dish_followed()."""
+        instance = super().from_db(db, field_names, values)
+        instance.loaded_product_id = instance.__dict__.get("product_id")
+        return instance
+
     def get_quantity_display(self):
         return f"{self.quantity:.0f}" if self.quantity % 1 == 0 else f"{self.quantity:.2f}"
 
     class Meta:
         ordering = [Lower("product__name")]
+        indexes = [
+            models.Index(fields=["dish", "product"], name="app_productdish_dish_prod_idx"),
+        ]
 
 
 class Unit(models.Model):
-    """This model represents the unit. It is used to measure a certain amount."""
+    """This model represents the unit. It is used to measure a certain amount.
+    Units with a dimension and a factor can be converted into each other: the factor is the amount
+    of the base unit of the dimension (g, ml or piece) in one of this unit. Example: kg, mass, 1000.
+    Units without a dimension (like a pinch) are never converted."""
+
+    MASS = "mass"
+    VOLUME = "volume"
+    COUNT = "count"
+    DIMENSION_CHOICES = [
+        (MASS, "Gewicht"),
+        (VOLUME, "Volume"),
+        (COUNT, "Aantal"),
+    ]
 
     name = models.CharField(max_length=20)
     abbreviation = models.CharField(max_length=15)
+    dimension = models.CharField(max_length=10, choices=DIMENSION_CHOICES, blank=True)
+    factor = models.DecimalField(max_digits=12, decimal_places=4, null=True, blank=True)
+
+    def is_convertible(self):
+        return bool(self.dimension) and self.factor is not None
 
     def __str__(self) -> str:
         return f"{self.name}"
 
 
 class ShoppingList(models.Model):
-    """This model represents the shopping list. Here all this is to link all the user to the list."""
+    """This model represents the shopping list. Here all this is to link all the user to the list.
+    A list made from a menu can follow that menu: when the menu changes, the lines of the changed
+    products are updated, see shoplist_services.update_linked_shoppinglists()."""
 
     date = models.DateTimeField(auto_now_add=True)
+    # Hash of the menu content the list was made from, see shoplist_services.menu_content_hash().
+    content_hash = models.CharField(max_length=64, blank=True, editable=False)
     # Foreign key
     user = models.ForeignKey(User, on_delete=models.CASCADE)
+    menu = models.ForeignKey("MenuList", on_delete=models.SET_NULL, null=True, blank=True)
+
+    objects = UserOwnedQuerySet.as_manager()
 
     def __str__(self) -> str:
         local_time = timezone.localtime(self.date)  # Getting the local timezone.
@@ -109,25 +207,67 @@ class ShoppingList(models.Model):
     class Meta:
         """Most recent 1st."""
         ordering = ["-date"]
+        indexes = [
+            models.Index(fields=["user", "-date"], name="app_shoplist_user_date_idx"),
+            models.Index(fields=["user", "content_hash"], name="app_shoplist_user_hash_idx"),
+        ]
 
 
 class ProductShoppingList(models.Model):
     """This model represents the relation of a product with/in a shopping list.
-    A user will be able to add products to his shopping list this way."""
+    A user will be able to add products to his shopping list this way.
+    The product name and unit are copied (a snapshot) when the item is created, so the list is
+    rendered from this table alone and stays readable when the dish or product changes later.
+    The foreign keys to the source are optional and are set to NULL when the source is deleted."""
 
     quantity = models.DecimalField(max_digits=10, decimal_places=2)
+    product_name = models.CharField(max_length=50)
+    unit_abbreviation = models.CharField(max_length=15, blank=True)
+    # Lowercased product name, used to sort the list with an index.
+    sort_key = models.CharField(max_length=50, editable=False)
+    # Ticked off in the shop, see shoplist_services.set_checked().
+    checked = models.BooleanField(default=False)
+    # Dimension of a converted total. With the product and the unit it finds the line again
+    # when the menu of a linked list changes.
+    dimension = models.CharField(max_length=10, blank=True)
+    # The quantity was changed by hand, changes of the menu leave the line alone.
+    manual = models.BooleanField(default=False)
     # Foreign keys
-    product_dish = models.ForeignKey(ProductDish, on_delete=models.CASCADE)
     shoppinglist = models.ForeignKey(ShoppingList, on_delete=models.CASCADE)
+    product_dish = models.ForeignKey(
+        ProductDish, on_delete=models.SET_NULL, null=True, blank=True
+    )
+    product = models.ForeignKey(Product, on_delete=models.SET_NULL, null=True, blank=True)
+    unit = models.ForeignKey("Unit", on_delete=models.SET_NULL, null=True, blank=True)
+
+    objects = ProductShoppingListQuerySet.as_manager()
 
     def __str__(self) -> str:
-        return f"{self.product_dish.product.name}"
+        return f"{self.product_name}"
+
+    def save(self, *args, **kwargs):
+        if not self.product_name and self.product_dish_id:
+            self.take_snapshot(self.product_dish)
+        self.sort_key = self.product_name.lower()
+        super().save(*args, **kwargs)
+
+    def take_snapshot(self, product_dish):
+        """Copy the product and unit of a ProductDish into this item."""
+        self.product_dish = product_dish
+        self.product = product_dish.product
+        self.unit = product_dish.unit
+        self.product_name = product_dish.product.name
+        self.unit_abbreviation = product_dish.unit.abbreviation if product_dish.unit else ""
+        self.sort_key = self.product_name.lower()
 
     def get_quantity_display(self):
         return f"{self.quantity:.0f}" if self.quantity % 1 == 0 else f"{self.quantity:.2f}"
 
     class Meta:
-        ordering = [Lower('product_dish__product__name')]
+        ordering = ["sort_key"]
+        indexes = [
+            models.Index(fields=["shoppinglist", "sort_key"], name="app_psl_list_sort_key_idx"),
+        ]
 
 
 class UserMenu(models.Model):
@@ -146,19 +286,102 @@ class DishMenu(models.Model):
     menu = models.ForeignKey("MenuList", on_delete=models.CASCADE)
     dish = models.ForeignKey(Dish, on_delete=models.CASCADE)
 
+    objects = DishMenuQuerySet.as_manager()
+
     def __str__(self) -> str:
         return f"{self.menu} containing {self.dish}"
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["menu", "dish"], name="app_dishmenu_menu_dish_idx"),
+        ]
+
 
 class MenuList(models.Model):
-    """This model represents a menu. The menu contains an amount of dishes linked to the user."""
+    """This model represents a menu. The menu contains an amount of dishes linked to the user.
+    user is the owner of the menu, use MenuList.objects.for_user(user) to get the menus of a user."""
 
     name = models.CharField(max_length=50, unique=True)
+    # Foreign key
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, editable=False)
+
+    objects = UserOwnedQuerySet.as_manager()
 
     def __str__(self) -> str:
         return f"{self.name}"
 
 
+class Job(models.Model):
+    """This model represents a background job, work that is too heavy for a request.
+    Workers (python manage.py run_worker) claim queued jobs and run the task with the arguments,
+    see services/job_services.py. A job that fails is queued again until max_attempts is reached."""
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUS_CHOICES = [
+        (QUEUED, "In de wachtrij"),
+        (RUNNING, "Bezig"),
+        (DONE, "Klaar"),
+        (FAILED, "Mislukt"),
+    ]
+
+    task = models.CharField(max_length=100)
+    arguments = models.JSONField(default=dict)
+    # Hash of the task, arguments and user, an unfinished job with the same key is not queued twice.
+    key = models.CharField(max_length=64)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    # Percentage and a short text, reported by the task while it runs.
+    progress = models.PositiveSmallIntegerField(default=0)
+    message = models.CharField(max_length=200, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    created = models.DateTimeField(auto_now_add=True)
+    # Not claimed before this moment, a retry waits a bit longer after every failed attempt.
+    run_after = models.DateTimeField(default=timezone.now)
+    # The worker that runs the job and the last sign of life, a job of a worker that died is claimed again.
+    worker = models.CharField(max_length=100, blank=True)
+    heartbeat = models.DateTimeField(null=True, blank=True)
+    finished = models.DateTimeField(null=True, blank=True)
+    # Foreign key
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
+
+    objects = UserOwnedQuerySet.as_manager()
+
+    # Turned off by run_inline(), the progress of a job that runs in a request is never seen.
+    store_progress = True
+
+    def __str__(self) -> str:
+        return f"{self.task} #{self.pk} ({self.status})"
+
+    @property
+    def is_finished(self):
+        return self.status in (self.DONE, self.FAILED)
+
+    def report(self, progress, message=""):
+        """Store the progress of a running job, with a heartbeat (run_job() also sends those while it runs)."""
+        self.progress = progress
+        self.message = message
+        self.heartbeat = timezone.now()
+        if self.store_progress:
+            Job.objects.filter(pk=self.pk).update(progress=progress, message=message, heartbeat=self.heartbeat)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "run_after"], name="app_job_status_run_after_idx"),
+            models.Index(fields=["key", "status"], name="app_job_key_status_idx"),
+        ]
+        constraints = [
+            # One unfinished job per key, also when two requests queue it at the same moment.
+            models.UniqueConstraint(
+                fields=["key"], condition=models.Q(status__in=["queued", "running"]), name="app_job_unfinished_key_uniq"
+            ),
+        ]
+
+
 class BugReport(models.Model):
     """This is so that users can report bugs. Only the developer will be able to see this."""
 
@@ -0,0 +1,173 @@
+# Python imports
+from bisect import bisect_left
+
+# Django imports
+from django.core.cache import cache
+from django.db.models import Count
+
+# Project imports
+from ..models import Product, ProductDish
+from .feed_services import ChangeFeed, FeedFollower
+
+product_feed = ChangeFeed("feed:products")
+
+SUGGESTIONS = 10
+
+SNAPSHOT_KEY = "autocomplete:products:snapshot"
+USAGE_KEY = "autocomplete:usage:{}"
+
+# The usage of a user is counted again after this many seconds.
+USAGE_TIMEOUT = 5 * 60
+
+
+def sort_key(name):
+    """Key in the sorted array: the lowercase name for the prefix search, followed by the name itself.
+
+    "\\0" sorts before every other character, so "ei\\0Ei" comes before "eieren\\0Eieren" and
+    a lowercase prefix still matches with startswith.
+    """
+
+    return f"{name.lower()}\0{name}"
+
+
+def prefix_matches(keys, prefix, limit):
+    """Yield at most limit names from the sorted keys that start with the lowercase prefix."""
+
+    position = bisect_left(keys, prefix)
+    while limit and position < len(keys) and keys[position].startswith(prefix):
+        yield keys[position].split("\0", 1)[1]
+        position += 1
+        limit -= 1
+
+
+class ProductNameIndex(FeedFollower):
+    """In-memory prefix index over all product names, a sorted array searched with bisect.
+
+    A lookup is a binary search plus a short scan, so it stays well under a millisecond with a
+    million products. Saved and deleted products are published on the product feed, so every
+    worker applies the changes of the others. A new worker starts from the snapshot in the cache
+    and only builds the index from the database when there is none.
+    """
+
+    def __init__(self):
+        super().__init__(product_feed)
+
+    def reset(self):
+        with self.lock:
+            super().reset()
+            self.keys = []
+            self.names = {}  # product id -> name, needed to find the old name of a renamed product
+
+    def add(self, product_id, name):
+        old_name = self.names.get(product_id)
+        if old_name == name:
+            return
+        if old_name is not None:
+            self.remove(product_id)
+        key = sort_key(name)
+        self.keys.insert(bisect_left(self.keys, key), key)
+        self.names[product_id] = name
+
+    def remove(self, product_id):
+        name = self.names.pop(product_id, None)
+        if name is not None:
+            key = sort_key(name)
+            position = bisect_left(self.keys, key)
+            if position < len(self.keys) and self.keys[position] == key:
+                del self.keys[position]
+
+    def apply(self, change):
+        action, product_id, name = change
+        if action == "save":
+            self.add(product_id, name)
+        else:
+            self.remove(product_id)
+
+    def load(self):
+        """Start from the snapshot in the cache, or build the index from the database."""
+
+        snapshot = cache.get(SNAPSHOT_KEY)
+        if snapshot and snapshot[0] == self.version:
+            self.keys, self.names = list(snapshot[1]), dict(snapshot[2])
+        else:
+            self.names = dict(Product.objects.values_list("id", "name").iterator(chunk_size=10000))
+            self.keys = sorted(sort_key(name) for name in self.names.values())
+            # Too big for some cache backends, then every worker builds its own index.
+            cache.set(SNAPSHOT_KEY, (self.version, self.keys, self.names), timeout=None)
+
+    def lookup(self, prefix, limit=SUGGESTIONS):
+        with self.lock:
+            self.sync()
+            return list(prefix_matches(self.keys, prefix, limit))
+
+
+product_index = ProductNameIndex()
+
+
+def products_saved(products):
+    """Publish new or renamed products once the transaction is committed."""
+
+    for product in products:
+        product_feed.publish_on_commit(("save", product.pk, product.name))
+
+
+def products_bulk_saved():
+    """Publish products created in bulk (the seeder) as one reload instead of a change per product."""
+
+    product_feed.publish_reload_on_commit()
+
+
+def products_deleted(products):
+    # The change is built now, Django clears the pk after the delete.
+    for product in products:
+        product_feed.publish_on_commit(("delete", product.pk, None))
+
+
+def user_usage(user):
+    """Return how often the user used each of their products: the sorted keys and a {name: uses} dict.
+
+    Products of the user (UserProduct) that are not in a dish yet count as 0 uses.
+    The result is cached per user for USAGE_TIMEOUT seconds.
+    """
+
+    key = USAGE_KEY.format(user.pk)
+    usage = cache.get(key)
+    if usage is None:
+        uses = dict.fromkeys(Product.objects.for_user(user).values_list("name", flat=True), 0)
+        uses.update(
+            ProductDish.objects.for_user(user)
+            .values_list("product__name")
+            .annotate(uses=Count("id"))
+            .order_by()
+        )
+        usage = (sorted(sort_key(name) for name in uses), uses)
+        cache.set(key, usage, timeout=USAGE_TIMEOUT)
+    return usage
+
+
+def forget_usage(user_id):
+    cache.delete(USAGE_KEY.format(user_id))
+
+
+def suggest_product_names(user, query, limit=SUGGESTIONS):
+    """Suggest product names that start with the query, case insensitive.
+
+    The products the user uses most come first, then the other products in alphabetical order.
+    """
+
+    prefix = query.strip().lower()
+    if not prefix:
+        return []
+
+    keys, uses = user_usage(user)
+    own = sorted(
+        prefix_matches(keys, prefix, len(keys)),
+        key=lambda name: (-uses[name], name.lower()),
+    )[:limit]
+    suggestions = list(own)
+    for name in product_index.lookup(prefix, limit + len(own)):
+        if len(suggestions) == limit:
+            break
+        if name not in uses:
+            suggestions.append(name)
+    return suggestions
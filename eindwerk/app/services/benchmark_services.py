@@ -0,0 +1,363 @@
+# Python imports
+import asyncio
+import json
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from wsgiref.util import setup_testing_defaults
+
+# Django imports
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.urls import get_resolver, reverse
+
+# Project imports
+from ..models import DishMenu, Job, MenuList, ProductDish, ProductShoppingList, ShoppingList, User
+from .seed_services import DataSeeder
+from .timing_services import request_timing
+
+SIZES = [10, 100, 1000, 10000]
+INGREDIENTS = 6
+DISHES_PER_MENU = 7
+
+BASELINE_PATH = Path(__file__).resolve().parent.parent / "benchmarks" / "baseline.json"
+
+# The benchmark runs without the manifest of collectstatic and with its own empty cache.
+BENCHMARK_SETTINGS = {
+    "ALLOWED_HOSTS": ["testserver"],
+    "STORAGES": {
+        "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+        "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+    },
+    "CACHES": {
+        "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "benchmark"},
+        "tiered": {"BACKEND": "app.cache.TieredCache", "LOCATION": "default"},
+    },
+}
+
+# How every named route of app/urls.py is requested: the method, the url kwargs and the GET or POST data.
+# The values are names of seeded objects ("dish" is the pk of a dish of the benchmark user), see route_objects().
+ROUTES = {
+    "index": ("get", {}, {}),
+    "products": ("get", {}, {}),
+    "product_autocomplete": ("get", {}, {"q": "ben"}),
+    "dish_list": ("get", {}, {}),
+    "dish_search": ("get", {}, {"q": "gerecht"}),
+    "dish_cook": ("get", {}, {"product": "product"}),
+    "dish_create": ("get", {}, {}),
+    "dish_detail": ("get", {"pk": "dish"}, {}),
+    "dish_body": ("get", {"pk": "dish"}, {}),
+    "dish_update": ("get", {"pk": "dish"}, {}),
+    "dish_delete": ("get", {"pk": "dish"}, {}),
+    "product_dish_update": ("get", {"pk": "product_dish"}, {}),
+    "product_dish_delete": ("get", {"pk": "product_dish"}, {}),
+    "unit_list": ("get", {}, {}),
+    "unit_create": ("get", {}, {}),
+    "unit_update": ("get", {"pk": "unit"}, {}),
+    "unit_delete": ("get", {"pk": "unit"}, {}),
+    "menu_list": ("get", {}, {}),
+    "menu_create": ("get", {}, {}),
+    "menu_update": ("get", {"pk": "menu"}, {}),
+    "menu_delete": ("get", {"pk": "menu"}, {}),
+    "menu_detail": ("get", {"pk": "menu"}, {}),
+    "menu_picker": ("get", {}, {}),
+    "add_to_menu": ("post", {}, {"dish_id": "dish", "menu_id": "menu"}),
+    "remove_from_menu": ("post", {}, {"dish_id": "menu_dish", "menu_id": "menu"}),
+    "shoppinglist": ("get", {}, {}),
+    "shoppinglist_delete": ("get", {"pk": "shoppinglist"}, {}),
+    "create_shoppinglist_from_menu": ("post", {"menu_id": "unlisted_menu"}, {}),
+    "shoppinglist_detail": ("get", {"pk": "shoppinglist"}, {}),
+    "check_shoppinglist_items": ("post", {"pk": "shoppinglist"}, {"checked": "item"}),
+    "update_product_shoppinglist": ("get", {"pk": "item"}, {}),
+    "delete_product_shoppinglist": ("get", {"pk": "item"}, {}),
+    "job_detail": ("get", {"pk": "job"}, {}),
+    "bug_report_create": ("get", {}, {}),
+}
+
+# Routes that can't be requested yet, with the reason.
+EXCLUDED_ROUTES = {
+    "add_product_to_shoppinglist": "AddItemToShoppingListView has no template and is not linked yet.",
+}
+
+
+def named_routes():
+    """The names of all routes of the project that come from app/urls.py."""
+
+    return {pattern.name for pattern in get_resolver("app.urls").url_patterns if pattern.name}
+
+
+def seed_benchmark_user(size):
+    """Create a user with size dishes and a menu and a shopping list for every 10 dishes, see seed_services.
+
+    One more menu has no shopping list yet, so creating its list measures a new list and not the
+    reuse of a seeded one.
+    """
+
+    seeder = DataSeeder(
+        users=1,
+        dishes=size,
+        ingredients=INGREDIENTS,
+        products=max(size // 2, INGREDIENTS),
+        menus=max(size // 10, 1) + 1,
+        dishes_per_menu=DISHES_PER_MENU,
+        shoppinglists=max(size // 10, 1),
+        prefix=f"benchmark{size}",
+    )
+    seeder.run()
+    user = User.objects.get(username=seeder.username(0))
+    Job.objects.create(task="create_shoppinglist", key="benchmark", user=user, status=Job.RUNNING, progress=50)
+    return user
+
+
+def route_objects(user):
+    """The pks that ROUTES refers to, taken from the data of the user."""
+
+    menu = MenuList.objects.for_user(user).first()
+    product_dish = ProductDish.objects.for_user(user).first()
+    return {
+        "dish": product_dish.dish_id,
+        "product": product_dish.product_id,
+        "product_dish": product_dish.pk,
+        "unit": product_dish.unit_id,
+        "menu": menu.pk,
+        "unlisted_menu": MenuList.objects.for_user(user).order_by("pk").last().pk,
+        "menu_dish": DishMenu.objects.filter(menu=menu).values_list("dish_id", flat=True).first(),
+        "shoppinglist": ShoppingList.objects.for_user(user).first().pk,
+        "item": ProductShoppingList.objects.for_user(user).first().pk,
+        "job": Job.objects.for_user(user).first().pk,
+    }
+
+
+def measure(client, method, url, data):
+    """Request the url once, inside a savepoint that is rolled back, and return the measurements."""
+
+    with transaction.atomic(), request_timing() as timer:
+        start = time.perf_counter()
+        response = getattr(client, method)(url, data)
+        total = time.perf_counter() - start
+        transaction.set_rollback(True)
+    return {
+        "status": response.status_code,
+        "queries": timer.queries.count,
+        "sql_ms": round(timer.queries.duration * 1000, 2),
+        "template_ms": round(timer.durations.get("tpl", 0.0) * 1000, 2),
+        "total_ms": round(total * 1000, 2),
+    }
+
+
+def benchmark_size(size, repeat=3):
+    """Seed a user with size dishes and measure every route, return {route: measurements}.
+
+    A first request per route loads the in-memory indexes and fills the caches, it is not
+    recorded. The query count is the same for every run after it, the times are the median.
+    """
+
+    user = seed_benchmark_user(size)
+    objects = route_objects(user)
+    client = Client()
+    client.force_login(user)
+
+    results = {}
+    for name, (method, kwargs, data) in sorted(ROUTES.items()):
+        url = reverse(name, kwargs={key: objects[value] for key, value in kwargs.items()})
+        data = {key: objects.get(value, value) for key, value in data.items()}
+        runs = [measure(client, method, url, data) for _ in range(repeat + 1)][1:]
+        results[name] = {
+            "url": url,
+            "status": runs[0]["status"],
+            "queries": runs[0]["queries"],
+            **{
+                field: statistics.median(run[field] for run in runs)
+                for field in ("sql_ms", "template_ms", "total_ms")
+            },
+        }
+    return results
+
+
+def run_benchmark(sizes=SIZES, repeat=3):
+    """Measure every route for every size, the data is rolled back afterwards.
+
+    Returns {"sizes": [...], "routes": {route: {size: measurements}}}, ready for json.
+    """
+
+    routes = {}
+    with override_settings(**BENCHMARK_SETTINGS):
+        for size in sizes:
+            cache.clear()
+            with transaction.atomic():
+                for name, measurements in benchmark_size(size, repeat).items():
+                    routes.setdefault(name, {})[str(size)] = measurements
+                transaction.set_rollback(True)
+        cache.clear()
+    return {"sizes": list(sizes), "database": connection.vendor, "routes": routes}
+
+
+def check_results(results, baseline):
+    """Return the problems in the results: query counts that grow with the data or exceed the baseline.
+
+    baseline is a {route: maximum number of queries} dict, routes without a baseline are only
+    checked for growth.
+    """
+
+    problems = []
+    for name, by_size in results["routes"].items():
+        counts = [by_size[str(size)]["queries"] for size in results["sizes"]]
+        if max(counts) > counts[0]:
+            problems.append(f"{name}: the number of queries grows with the data ({counts}).")
+        if name in baseline and max(counts) > baseline[name]:
+            problems.append(f"{name}: {max(counts)} queries, the baseline is {baseline[name]}.")
+    return problems
+
+
+def load_baseline(path=BASELINE_PATH):
+    try:
+        return json.loads(Path(path).read_text())
+    except FileNotFoundError:
+        return {}
+
+
+def baseline_from(results):
+    """The most queries per route over all sizes, to store as the new baseline."""
+
+    return {
+        name: max(measurements["queries"] for measurements in by_size.values())
+        for name, by_size in sorted(results["routes"].items())
+    }
+
+
+# The read-heavy pages with async views, requested by run_server_benchmark().
+SERVER_ROUTES = {
+    "dish_list": {},
+    "dish_detail": {"pk": "dish"},
+    "menu_list": {},
+    "menu_detail": {"pk": "menu"},
+    "shoppinglist": {},
+    "shoppinglist_detail": {"pk": "shoppinglist"},
+    "unit_list": {},
+}
+
+
+def wsgi_throughput(application, urls, cookie, workers, client_delay):
+    """Serve the urls with a WSGI application on a pool of threads, like gunicorn with threads.
+
+    A worker thread stays busy until the client has read the response, a slow client is simulated
+    by holding the thread for client_delay seconds after the response. Returns the status codes.
+    """
+
+    def request(url):
+        statuses = []
+        environ = {"PATH_INFO": url, "HTTP_HOST": "testserver", "HTTP_COOKIE": cookie}
+        setup_testing_defaults(environ)
+        body = application(environ, lambda status, headers, exc_info=None: statuses.append(status))
+        try:
+            b"".join(body)
+            time.sleep(client_delay)
+        finally:
+            if hasattr(body, "close"):
+                body.close()
+        return int(statuses[0].split()[0])
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(request, urls))
+
+
+async def asgi_throughput(application, urls, cookie, clients, client_delay):
+    """Serve the urls with an ASGI application on one event loop, clients requests at a time.
+
+    A slow client only makes send() wait for client_delay seconds, meanwhile the loop serves the
+    other requests. Returns the status codes.
+    """
+
+    semaphore = asyncio.Semaphore(clients)
+
+    async def request(url):
+        statuses = []
+
+        async def receive():
+            if not statuses:
+                statuses.append(None)
+                return {"type": "http.request", "body": b"", "more_body": False}
+            # The client stays connected, the server cancels this when the response is sent.
+            await asyncio.Future()
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                statuses.append(message["status"])
+            elif not message.get("more_body"):
+                await asyncio.sleep(client_delay)
+
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": url,
+            "raw_path": url.encode(),
+            "query_string": b"",
+            "root_path": "",
+            "headers": [(b"host", b"testserver"), (b"cookie", cookie.encode())],
+            "client": ("127.0.0.1", 0),
+            "server": ("testserver", 80),
+        }
+        async with semaphore:
+            await application(scope, receive, send)
+        return statuses[1]
+
+    return await asyncio.gather(*(request(url) for url in urls))
+
+
+def run_server_benchmark(size=100, requests=200, threads=8, clients=64, client_delay=0.05):
+    """Compare the requests per second of eindwerk.wsgi and eindwerk.asgi on the async pages.
+
+    Both get the same requests, spread over SERVER_ROUTES, from clients that take client_delay
+    seconds to read a response. WSGI serves them with threads threads, ASGI with clients requests
+    in flight on one event loop: one process with many slow clients. The data is committed, the
+    servers read it from their own connections; the user and everything of it is deleted
+    afterwards, the shared products stay.
+
+    Returns {"wsgi": {...}, "asgi": {...}} with the requests per second and the status codes.
+    """
+
+    from eindwerk.asgi import application as asgi_application
+    from eindwerk.wsgi import application as wsgi_application
+
+    with override_settings(**BENCHMARK_SETTINGS):
+        cache.clear()
+        user = seed_benchmark_user(size)
+        client = Client()
+        try:
+            client.force_login(user)
+            cookie = f"{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}"
+            objects = route_objects(user)
+            routes = [
+                reverse(name, kwargs={key: objects[value] for key, value in kwargs.items()})
+                for name, kwargs in SERVER_ROUTES.items()
+            ]
+            urls = [routes[index % len(routes)] for index in range(requests)]
+
+            results = {}
+            for name, serve in (
+                ("wsgi", lambda: wsgi_throughput(wsgi_application, urls, cookie, threads, client_delay)),
+                ("asgi", lambda: asyncio.run(asgi_throughput(asgi_application, urls, cookie, clients, client_delay))),
+            ):
+                # Warm up the caches and the indexes, the same for both.
+                cache.clear()
+                wsgi_throughput(wsgi_application, routes, cookie, 1, 0)
+                start = time.perf_counter()
+                statuses = serve()
+                elapsed = time.perf_counter() - start
+                results[name] = {
+                    "requests": len(statuses),
+                    "seconds": round(elapsed, 2),
+                    "requests_per_second": round(len(statuses) / elapsed, 1),
+                    "statuses": sorted(set(statuses)),
+                }
+        finally:
+            client.logout()
+            user.delete()
+            cache.clear()
+    return results
@@ -0,0 +1,164 @@
+# Python imports
+import threading
+import time
+import uuid
+import weakref
+
+# Django imports
+from django.core.cache import cache, caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+
+# Project imports
+from ..cache import STATS_KEY, TIERS
+
+USER_VERSION_KEY = "user:version:{}"
+USER_KEY = "user:{}:{}:{}"
+LOCK_KEY = "lock:{}"
+STATS_KEYS = [STATS_KEY.format(tier, result) for tier in TIERS for result in ("hits", "misses")]
+
+# Seconds the lock of a computation lasts, when the process that took it died it is free again after that.
+LOCK_TIMEOUT = 30
+# Seconds to wait for another process that computes the value, then it is computed here as well.
+LOCK_WAIT = 5
+# Seconds between two looks at the shared cache while another process computes.
+LOCK_POLL = 0.05
+
+
+def tiered_cache():
+    """The cache with the L1 of the process in front of the shared cache, see app/cache.py."""
+
+    return caches["tiered"]
+
+
+def get_versions(keys):
+    """Return the current values of version keys, read from the shared cache in one round trip.
+
+    A version that is missing starts at the current time, so it can never match the version of
+    an entry that is still in a cache (also not in the L1 of another process).
+    """
+
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            versions[key] = cache.get_or_set(key, time.time_ns, timeout=None)
+    return [versions[key] for key in keys]
+
+
+def user_version(user_id):
+    return get_versions([USER_VERSION_KEY.format(user_id)])[0]
+
+
+def user_key(user_id, key, version=None):
+    """The key in the namespace of the user, it changes with every invalidate_user()."""
+
+    if version is None:
+        version = user_version(user_id)
+    return USER_KEY.format(user_id, version, key)
+
+
+def invalidate_user(user_id):
+    """Move the user to a new version: all the entries of the user are never read again and expire.
+
+    This is one write, however many entries the user has.
+    """
+
+    try:
+        cache.incr(USER_VERSION_KEY.format(user_id))
+    except ValueError:
+        # No version yet, so nothing is cached.
+        pass
+
+
+class Flight:
+    def __init__(self):
+        self.lock = threading.Lock()
+
+
+# The computations in progress in this process, per key. A flight is gone once no thread waits for it.
+_flights = weakref.WeakValueDictionary()
+_flights_lock = threading.Lock()
+
+
+def flight(key):
+    with _flights_lock:
+        current = _flights.get(key)
+        if current is None:
+            current = _flights[key] = Flight()
+        return current
+
+
+def get_or_compute(key, compute, timeout=DEFAULT_TIMEOUT):
+    """Return the value of a versioned key from the tiered cache, or compute and store it.
+
+    When many requests miss the same key at once (a popular entry expired, a new version), only
+    one of them computes the value, the others wait for it (single flight):
+        - in the process, the threads wait on a lock per key.
+        - between processes, the first one takes a lock in the shared cache with add(),
+          the others look for the value until the lock is released, for at most LOCK_WAIT seconds.
+    A process only releases its own lock. The file cache can't add() atomically, there two
+    processes may compute the same value.
+    compute() must not return None, that can't be told apart from a miss.
+    """
+
+    tiered = tiered_cache()
+    value = tiered.get(key)
+    if value is not None:
+        return value
+
+    # Keep the flight while this thread uses it, else it could be replaced by a new one.
+    current = flight(key)
+    with current.lock:
+        # Another thread may have computed it while this one waited.
+        value = tiered.get(key)
+        if value is not None:
+            return value
+
+        lock_key = LOCK_KEY.format(key)
+        token = uuid.uuid4().hex
+        locked = cache.add(lock_key, token, timeout=LOCK_TIMEOUT)
+        if not locked:
+            deadline = time.monotonic() + LOCK_WAIT
+            while time.monotonic() < deadline and cache.has_key(lock_key):
+                time.sleep(LOCK_POLL)
+            value = tiered.get(key)
+            if value is not None:
+                return value
+            # The other process failed (the lock is gone) or is too slow (then this one doesn't lock).
+            locked = cache.add(lock_key, token, timeout=LOCK_TIMEOUT)
+        try:
+            value = compute()
+            tiered.set(key, value, timeout)
+        finally:
+            # After LOCK_TIMEOUT the lock may belong to another process.
+            if locked and cache.get(lock_key) == token:
+                cache.delete(lock_key)
+    return value
+
+
+def cache_stats():
+    """Return {tier: {"hits": n, "misses": n, "hit_rate": percentage}} for the L1 and the L2.
+
+    The L2 is only asked for what the L1 misses. The counts of this process are written first,
+    the counts that other processes haven't written yet are not in it.
+    """
+
+    tiered = tiered_cache()
+    tiered.stats.flush(tiered.shared)
+    counters = tiered.shared.get_many(STATS_KEYS)
+    stats = {}
+    for tier in TIERS:
+        hits = counters.get(STATS_KEY.format(tier, "hits"), 0)
+        misses = counters.get(STATS_KEY.format(tier, "misses"), 0)
+        total = hits + misses
+        stats[tier] = {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / total * 100, 1) if total else None,
+        }
+    return stats
+
+
+def reset_cache_stats():
+    tiered = tiered_cache()
+    tiered.stats.flush(tiered.shared)
+    tiered.shared.delete_many(STATS_KEYS)
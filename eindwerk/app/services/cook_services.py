@@ -0,0 +1,223 @@
+# Python imports
+import heapq
+import time
+from collections import OrderedDict, defaultdict
+
+# Project imports
+from ..models import ProductDish
+from .feed_services import FeedFollower, dish_feed
+
+RESULTS = 25
+# The indexes a process keeps: at most MAX_USERS, the least recently used one goes first, and an index
+# that wasn't used for IDLE_TIMEOUT seconds is dropped. It is built again on the next question.
+MAX_USERS = 500
+IDLE_TIMEOUT = 3600
+
+
+def set_bits(bits):
+    """Yield the positions of the 1 bits of an int, lowest first."""
+
+    text = bin(bits)[:1:-1]
+    position = text.find("1")
+    while position != -1:
+        yield position
+        position = text.find("1", position + 1)
+
+
+class UserCookIndex:
+    """The dishes of one user, with per product a bitset of the dishes that use it.
+
+    Every dish gets a bit position; dishes_by_product[product_id] has the bits of all dishes
+    with that product. The dishes that can use at least one of the given products are found
+    with a few ORs, without looking at the other dishes. Positions of deleted dishes are reused.
+    """
+
+    def __init__(self):
+        self.used = time.monotonic()
+        self.positions = {}  # dish id -> bit position
+        self.dish_ids = []  # bit position -> dish id, None when free
+        self.free = []
+        self.dish_names = {}
+        self.dish_products = {}  # dish id -> frozenset of product ids
+        self.product_names = {}
+        self.dishes_by_product = defaultdict(int)
+
+    def add(self, dish_id, dish_name, products):
+        """Add or replace a dish, products is a {product_id: name} dict."""
+
+        self.remove(dish_id)
+        if self.free:
+            position = self.free.pop()
+            self.dish_ids[position] = dish_id
+        else:
+            position = len(self.dish_ids)
+            self.dish_ids.append(dish_id)
+        self.positions[dish_id] = position
+        self.dish_names[dish_id] = dish_name
+        self.dish_products[dish_id] = frozenset(products)
+        self.product_names.update(products)
+        bit = 1 << position
+        for product_id in products:
+            self.dishes_by_product[product_id] |= bit
+
+    def remove(self, dish_id):
+        position = self.positions.pop(dish_id, None)
+        if position is None:
+            return
+        mask = ~(1 << position)
+        for product_id in self.dish_products.pop(dish_id):
+            bits = self.dishes_by_product[product_id] & mask
+            if bits:
+                self.dishes_by_product[product_id] = bits
+            else:
+                del self.dishes_by_product[product_id]
+                self.product_names.pop(product_id, None)
+        del self.dish_names[dish_id]
+        self.dish_ids[position] = None
+        self.free.append(position)
+
+    def products(self):
+        """All products used in the dishes of the user as (id, name), sorted on name."""
+
+        return sorted(self.product_names.items(), key=lambda item: item[1].lower())
+
+    def rank(self, product_ids, limit=RESULTS):
+        """The dishes that use at least one of the products, fewest missing ingredients first.
+
+        Ties are broken by the share of the ingredients that is available and then by name.
+        """
+
+        have = frozenset(product_ids)
+        candidates = 0
+        for product_id in have:
+            candidates |= self.dishes_by_product.get(product_id, 0)
+
+        ranked = []
+        for position in set_bits(candidates):
+            dish_id = self.dish_ids[position]
+            needed = self.dish_products[dish_id]
+            covered = len(needed & have)
+            ranked.append(
+                (len(needed) - covered, -covered / len(needed), self.dish_names[dish_id].lower(), dish_id)
+            )
+
+        results = []
+        for missing, coverage, name, dish_id in heapq.nsmallest(limit, ranked):
+            needed = self.dish_products[dish_id]
+            results.append(
+                {
+                    "dish_id": dish_id,
+                    "name": self.dish_names[dish_id],
+                    "needed": len(needed),
+                    "covered": len(needed) - missing,
+                    "coverage": round(-coverage * 100),
+                    "missing": sorted(
+                        (self.product_names[product_id] for product_id in needed - have), key=str.lower
+                    ),
+                }
+            )
+        return results
+
+
+class CookIndex(FeedFollower):
+    """The UserCookIndex of every user that asked for it, kept up to date through the dish feed.
+
+    The index of a user is built on the first question with one query. Dishes announced on the
+    dish feed are read again before the next question, only for the users that have an index.
+    The indexes are bounded by MAX_USERS and IDLE_TIMEOUT.
+    """
+
+    def __init__(self):
+        super().__init__(dish_feed)
+
+    def reset(self):
+        with self.lock:
+            super().reset()
+            self.users = OrderedDict()  # user id -> UserCookIndex, least recently used first
+            self.dish_users = {}  # dish id -> user id, for the dishes in an index
+            self.stale = set()
+
+    def load(self):
+        self.users = OrderedDict()
+        self.dish_users = {}
+        self.stale = set()
+
+    def apply(self, dish_ids):
+        self.stale.update(dish_ids)
+
+    def fill(self, rows):
+        """Add the dishes of (dish_id, user_id, dish name, product_id, product name) rows."""
+
+        dishes = defaultdict(dict)
+        names = {}
+        for dish_id, user_id, dish_name, product_id, product_name in rows:
+            dishes[(user_id, dish_id)][product_id] = product_name
+            names[dish_id] = dish_name
+        for (user_id, dish_id), products in dishes.items():
+            self.users[user_id].add(dish_id, names[dish_id], products)
+            self.dish_users[dish_id] = user_id
+
+    def refresh(self):
+        """Read the changed dishes again, dishes without ingredients are left out."""
+
+        if not self.stale:
+            return
+        for dish_id in self.stale:
+            user_id = self.dish_users.pop(dish_id, None)
+            if user_id is not None:
+                self.users[user_id].remove(dish_id)
+        self.fill(
+            ProductDish.objects.filter(dish_id__in=self.stale, dish__user_id__in=list(self.users))
+            .values_list("dish_id", "dish__user_id", "dish__name", "product_id", "product__name")
+            .order_by()
+        )
+        self.stale = set()
+
+    def evict(self, now):
+        """Drop the least recently used indexes above MAX_USERS and the ones idle for IDLE_TIMEOUT."""
+
+        while self.users:
+            user_id, index = next(iter(self.users.items()))
+            if len(self.users) <= MAX_USERS and index.used > now - IDLE_TIMEOUT:
+                break
+            del self.users[user_id]
+            for dish_id in index.positions:
+                self.dish_users.pop(dish_id, None)
+
+    def for_user(self, user):
+        """Return the up-to-date index of the user, use it while holding the lock."""
+
+        now = time.monotonic()
+        self.sync()
+        # Before the refresh, so the changed dishes of dropped indexes aren't read.
+        self.evict(now)
+        self.refresh()
+        if user.pk not in self.users:
+            self.users[user.pk] = UserCookIndex()
+            self.fill(
+                ProductDish.objects.for_user(user)
+                .values_list("dish_id", "dish__user_id", "dish__name", "product_id", "product__name")
+                .order_by()
+            )
+        index = self.users[user.pk]
+        index.used = now
+        self.users.move_to_end(user.pk)
+        self.evict(now)
+        return index
+
+
+cook_index = CookIndex()
+
+
+def cook_products(user):
+    """The products the user can choose from: every product used in one of their dishes."""
+
+    with cook_index.lock:
+        return cook_index.for_user(user).products()
+
+
+def what_can_i_cook(user, product_ids, limit=RESULTS):
+    """Rank the dishes of the user by how many of their ingredients are in product_ids."""
+
+    with cook_index.lock:
+        return cook_index.for_user(user).rank(product_ids, limit)
@@ -0,0 +1,219 @@
+# Python imports
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Django imports
+from django.db import transaction
+from django.db.models.functions import Lower
+
+# Project imports
+from ..models import Dish, Product, ProductDish, UserDish, UserProduct
+from .autocomplete_services import forget_usage, products_saved
+from .feed_services import dishes_changed
+from .shoplist_services import dish_products_changed
+
+# While True the ProductDish signals skip their summary update and their shopping list update,
+# the caller does both once afterwards.
+_summary_updates_paused = ContextVar("summary_updates_paused", default=False)
+
+
+def build_ingredient_summary(product_dishes):
+    """Turn ProductDish objects (with product and unit selected) into the compact summary stored on Dish.
+
+    Every entry holds the ProductDish id (needed for the update/delete links), the product name,
+    the formatted quantity (or None) and the unit abbreviation (or an empty string).
+    """
+
+    return [
+        {
+            "id": product_dish.pk,
+            "name": product_dish.product.name,
+            "quantity": (
+                product_dish.get_quantity_display()
+                if product_dish.quantity is not None
+                else None
+            ),
+            "unit": product_dish.unit.abbreviation if product_dish.unit else "",
+        }
+        for product_dish in product_dishes
+    ]
+
+
+def ingredient_names(summary):
+    """The product names of a summary as one text, this is what the search index reads."""
+
+    return " ".join(item["name"] for item in summary)
+
+
+@contextmanager
+def paused_summary_updates():
+    """Skip the per-row summary updates of the signals, used by the bulk write paths."""
+
+    token = _summary_updates_paused.set(True)
+    try:
+        yield
+    finally:
+        _summary_updates_paused.reset(token)
+
+
+def summary_updates_paused():
+    return _summary_updates_paused.get()
+
+
+def update_ingredient_summary(dish_id):
+    """Rebuild the ingredient summary of a single dish with one select and one update."""
+
+    product_dishes = ProductDish.objects.filter(dish_id=dish_id).select_related(
+        "product", "unit"
+    )
+    summary = build_ingredient_summary(product_dishes)
+    Dish.objects.filter(pk=dish_id).update(
+        ingredient_summary=summary, ingredient_names=ingredient_names(summary)
+    )
+    dishes_changed([dish_id])
+
+
+def rebuild_ingredient_summaries(dishes=None, batch_size=500, progress=None):
+    """Rebuild the ingredient summary of many dishes (all dishes if none are given).
+
+    Dishes are handled in batches: per batch there is one select for the ingredients
+    and one bulk update, so the number of queries grows with the number of batches, not dishes.
+    progress(done, total) is called after every batch. Returns the number of dishes that were rebuilt.
+    """
+
+    if dishes is None:
+        dishes = Dish.objects.all()
+    dish_ids = list(dishes.order_by("pk").values_list("pk", flat=True))
+
+    for start in range(0, len(dish_ids), batch_size):
+        batch_ids = dish_ids[start:start + batch_size]
+        grouped = {dish_id: [] for dish_id in batch_ids}
+        product_dishes = (
+            ProductDish.objects.filter(dish_id__in=batch_ids)
+            .select_related("product", "unit")
+            .order_by(Lower("product__name"))
+        )
+        for product_dish in product_dishes:
+            grouped[product_dish.dish_id].append(product_dish)
+
+        updated = []
+        for dish_id, rows in grouped.items():
+            summary = build_ingredient_summary(rows)
+            updated.append(
+                Dish(pk=dish_id, ingredient_summary=summary, ingredient_names=ingredient_names(summary))
+            )
+        Dish.objects.bulk_update(updated, ["ingredient_summary", "ingredient_names"])
+        dishes_changed(batch_ids)
+        if progress is not None:
+            progress(start + len(batch_ids), len(dish_ids))
+
+    return len(dish_ids)
+
+
+def save_product_dish_formset(dish, formset, user):
+    """Save all rows of a valid ProductDishFormSet for a dish in one batch.
+
+    Instead of a get_or_create per row, every model is written in bulk:
+        - Products: one lookup for all names, one bulk insert for the missing ones.
+        - ProductDish: one bulk insert for new rows, one bulk update for changed rows
+          and one delete for rows marked with DELETE.
+        - UserProduct and UserDish: the user is linked to the dish and all its products.
+    After the commit the shopping lists that follow a menu with the dish update the changed products.
+    Everything happens in one transaction and the number of queries stays the same
+    no matter how many ingredients the dish has.
+    """
+
+    rows = []
+    deleted_ids = []
+    # Products whose line changes on the shopping lists that follow a menu with the dish.
+    changed_product_ids = set()
+    for form in formset:
+        data = form.cleaned_data
+        if data.get("DELETE"):
+            if form.instance.pk:
+                deleted_ids.append(form.instance.pk)
+                changed_product_ids.add(form.instance.product_id)
+            continue
+        if data.get("product_name") is None:
+            # Empty extra form.
+            continue
+        if form.instance.pk and not form.has_changed():
+            continue
+        rows.append(form)
+
+    with transaction.atomic(), paused_summary_updates():
+        if dish.user_id is None:
+            Dish.objects.filter(pk=dish.pk).update(user=user)
+            dish.user = user
+        UserDish.objects.get_or_create(user=user, dish=dish)
+
+        products = _get_or_create_products(
+            {
+                form.cleaned_data["product_name"]: form.cleaned_data.get("product_is_favorite") or False
+                for form in rows
+            }
+        )
+
+        new_product_dishes = []
+        changed_product_dishes = []
+        for form in rows:
+            product_dish = form.instance
+            if product_dish.pk:
+                changed_product_ids.add(product_dish.product_id)
+            product_dish.dish = dish
+            product_dish.product = products[form.cleaned_data["product_name"]]
+            changed_product_ids.add(product_dish.product_id)
+            product_dish.quantity = form.cleaned_data.get("quantity")
+            product_dish.unit = form.cleaned_data.get("unit")
+            if product_dish.pk:
+                changed_product_dishes.append(product_dish)
+            else:
+                new_product_dishes.append(product_dish)
+
+        if new_product_dishes:
+            ProductDish.objects.bulk_create(new_product_dishes)
+        if changed_product_dishes:
+            ProductDish.objects.bulk_update(
+                changed_product_dishes, ["product", "quantity", "unit"]
+            )
+        if deleted_ids:
+            ProductDish.objects.filter(dish=dish, pk__in=deleted_ids).delete()
+
+        if products:
+            # Products the user already uses keep their link.
+            UserProduct.objects.bulk_create(
+                [UserProduct(user=user, product=product) for product in products.values()],
+                ignore_conflicts=True,
+            )
+
+        update_ingredient_summary(dish.pk)
+        transaction.on_commit(lambda: forget_usage(user.pk))
+        if changed_product_ids:
+            transaction.on_commit(lambda: dish_products_changed(dish.pk, changed_product_ids))
+
+
+def _get_or_create_products(favorites_by_name):
+    """Return a {name: Product} dict for all names, creating the missing products in bulk.
+
+    Like get_or_create, is_favorite is only used for products that do not exist yet.
+    """
+
+    if not favorites_by_name:
+        return {}
+
+    products = {
+        product.name: product
+        for product in Product.objects.filter(name__in=favorites_by_name)
+    }
+    missing = [name for name in favorites_by_name if name not in products]
+    if missing:
+        # ignore_conflicts protects against another request creating the same product meanwhile.
+        Product.objects.bulk_create(
+            [Product(name=name, is_favorite=favorites_by_name[name]) for name in missing],
+            ignore_conflicts=True,
+        )
+        created = list(Product.objects.filter(name__in=missing))
+        products.update({product.name: product for product in created})
+        # bulk_create sends no signals, the autocomplete index is told here.
+        products_saved(created)
+    return products
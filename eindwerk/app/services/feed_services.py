@@ -0,0 +1,145 @@
+# Python imports
+import threading
+import time
+import weakref
+
+# Django imports
+from django.core.cache import cache
+from django.db import transaction
+
+# Changes are kept this long, a worker that is further behind has to load its index again.
+CHANGE_TIMEOUT = 60 * 60
+
+
+class ChangeFeed:
+    """A numbered list of changes in the cache, shared by all workers.
+
+    The in-memory indexes (search, autocomplete, cook) use it to follow the writes of the other
+    workers: every change gets the next version number, and a worker at version 10 reads the
+    changes 11 up to the current version. When a change expired or the cache was cleared,
+    read() returns None for the changes and the worker has to load its index again.
+    Followers in the same process get the change right away, a change of None means "load again".
+    """
+
+    def __init__(self, name):
+        self.version_key = f"{name}:version"
+        self.change_key = f"{name}:change:{{}}"
+        self.followers = weakref.WeakSet()
+
+    def version(self):
+        """The current version, 0 when nothing was published yet or the cache was cleared."""
+
+        return cache.get_or_set(self.version_key, 0, timeout=None)
+
+    def next_version(self):
+        try:
+            return cache.incr(self.version_key)
+        except ValueError:
+            cache.add(self.version_key, 0, timeout=None)
+            return cache.incr(self.version_key)
+
+    def publish(self, change):
+        version = self.next_version()
+        cache.set(self.change_key.format(version), change, timeout=CHANGE_TIMEOUT)
+        for follower in list(self.followers):
+            follower.receive(version, change)
+        return version
+
+    def publish_on_commit(self, change):
+        """Publish once the transaction is committed, so nobody reads the data before it exists."""
+
+        transaction.on_commit(lambda: self.publish(change))
+
+    def publish_reload(self):
+        """Move to the next version without storing a change, so every follower loads its index again.
+
+        For bulk writes (the seeder) that have too many changes to publish them one by one.
+        """
+
+        version = self.next_version()
+        for follower in list(self.followers):
+            follower.receive(version, None)
+        return version
+
+    def publish_reload_on_commit(self):
+        transaction.on_commit(self.publish_reload)
+
+    def read(self, since):
+        """Return the current version and the changes after since (None if they are not all there)."""
+
+        version = self.version()
+        if version < since:
+            return version, None
+        keys = [self.change_key.format(number) for number in range(since + 1, version + 1)]
+        found = cache.get_many(keys)
+        if len(found) < len(keys):
+            return version, None
+        return version, [found[key] for key in keys]
+
+
+class FeedFollower:
+    """Base class for an in-memory index that follows a ChangeFeed.
+
+    Subclasses implement load() (build the whole index) and apply(change). The index is loaded
+    on first use; after that sync() applies the changes of other workers, at most once per
+    sync_interval seconds. Changes from this process are applied as soon as they are published.
+    """
+
+    sync_interval = 1
+
+    def __init__(self, feed):
+        self.feed = feed
+        self.lock = threading.RLock()
+        self.reset()
+        feed.followers.add(self)
+
+    def reset(self):
+        """Forget the index, the next sync() loads it again."""
+
+        with self.lock:
+            self.version = 0
+            self.loaded = False
+            self.checked = 0
+
+    def load(self):
+        raise NotImplementedError
+
+    def apply(self, change):
+        raise NotImplementedError
+
+    def sync(self):
+        with self.lock:
+            now = time.monotonic()
+            if self.loaded and now - self.checked < self.sync_interval:
+                return
+            self.checked = now
+
+            if self.loaded:
+                version, changes = self.feed.read(self.version)
+                if changes is not None:
+                    for change in changes:
+                        self.apply(change)
+                    self.version = version
+                    return
+            # The version is read before loading, changes made meanwhile are applied again later.
+            self.version = self.feed.version()
+            self.load()
+            self.loaded = True
+
+    def receive(self, version, change):
+        with self.lock:
+            if change is None:
+                self.reset()
+            elif self.loaded:
+                self.apply(change)
+                if version == self.version + 1:
+                    self.version = version
+
+
+dish_feed = ChangeFeed("feed:dishes")
+
+
+def dishes_changed(dish_ids):
+    """Tell the in-memory indexes that dishes or their ingredients were written."""
+
+    dish_feed.publish_on_commit(list(dish_ids))
@@ -0,0 +1,163 @@
+# Django imports
+from django.core.cache import cache
+from django.db import transaction
+
+# Project imports
+from ..cache import BufferedCounters
+from .cache_services import USER_VERSION_KEY, get_or_compute, get_versions, user_key
+from .feed_services import dish_feed
+
+# A fragment that is not invalidated is rendered again after a day anyway.
+FRAGMENT_TIMEOUT = 24 * 60 * 60
+
+VERSION_KEY = "fragment:version:{}:{}"
+FRAGMENT_KEY = "fragment:{}:{}:{}:{}"
+STATS_KEY = "fragment:stats:{}:{}"
+
+# Counted in the process, written to the cache at the end of every request (or every 1000 counts).
+counters = BufferedCounters(flush_every=1000)
+
+# The fragments per version kind, used by fragment_stats().
+FRAGMENTS = {
+    "dish": ["dish-card", "dish-body", "dish-detail", "menu-dish"],
+    "menu": ["menu-card"],
+    "shoppinglist": ["shoppinglist-table"],
+}
+
+
+def get_version(kind, object_id):
+    """The current version of an object, every fragment that shows the object is stored under it.
+
+    A version that is missing (never set or removed by the cache) starts at the current time,
+    so it can never match the version of a fragment that is still in the cache.
+    """
+
+    return get_versions([VERSION_KEY.format(kind, object_id)])[0]
+
+
+def invalidate(kind, object_ids):
+    """Move the objects to a new version, the old fragments are never read again and expire."""
+
+    for object_id in set(object_ids):
+        try:
+            cache.incr(VERSION_KEY.format(kind, object_id))
+        except ValueError:
+            # No version yet, so nothing is cached.
+            pass
+
+
+def invalidate_on_commit(kind, object_ids):
+    """Invalidate after the commit, so a page rendered meanwhile can't cache the old data again."""
+
+    object_ids = list(object_ids)
+    transaction.on_commit(lambda: invalidate(kind, object_ids))
+
+
+def count(name, result):
+    counters.count(STATS_KEY.format(name, result), cache)
+
+
+def flush_counters():
+    counters.flush(cache)
+
+
+def request_versions(request):
+    """The versions read during the request, so every version is read once per request."""
+
+    if not hasattr(request, "fragment_versions"):
+        request.fragment_versions = {}
+    return request.fragment_versions
+
+
+def prefetch_versions(request, kind, object_ids):
+    """Read the versions of all the fragments of a page in one round trip, before they are rendered.
+
+    Without it every fragment reads its own version: with the db cache a list of 25 cards would
+    run 25 queries for them.
+    """
+
+    versions = request_versions(request)
+    keys = [VERSION_KEY.format(kind, object_id) for object_id in object_ids]
+    keys.append(USER_VERSION_KEY.format(request.user.pk))
+    keys = [key for key in keys if key not in versions]
+    versions.update(zip(keys, get_versions(keys)))
+
+
+def get_or_render(name, kind, object_id, user_id, render, versions=None):
+    """Return the cached fragment of the user, or render and store it.
+
+    name is the fragment (a dish card and the dish detail of the same dish are separate fragments),
+    kind and object_id the object whose version decides whether the fragment is still valid.
+    The fragment is kept in the namespace of the user, see cache_services.invalidate_user().
+    versions are the versions read before (see prefetch_versions()), the missing ones are read in
+    one round trip and added. The fragment itself mostly comes from the L1 of the process.
+    """
+
+    versions = {} if versions is None else versions
+    keys = [VERSION_KEY.format(kind, object_id), USER_VERSION_KEY.format(user_id)]
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        versions.update(zip(missing, get_versions(missing)))
+    version, namespace = (versions[key] for key in keys)
+    key = user_key(user_id, FRAGMENT_KEY.format(name, kind, object_id, version), namespace)
+    rendered = []
+
+    def render_once():
+        rendered.append(True)
+        return render()
+
+    content = get_or_compute(key, render_once, timeout=FRAGMENT_TIMEOUT)
+    count(name, "misses" if rendered else "hits")
+    return content
+
+
+def fragment_stats():
+    """Return {fragment: {"hits": n, "misses": n, "hit_rate": percentage}} for all fragments.
+
+    The counts of this process are written first, other processes write theirs after every request.
+    """
+
+    flush_counters()
+    names = [name for fragments in FRAGMENTS.values() for name in fragments]
+    counters = cache.get_many(
+        [STATS_KEY.format(name, result) for name in names for result in ("hits", "misses")]
+    )
+    stats = {}
+    for name in names:
+        hits = counters.get(STATS_KEY.format(name, "hits"), 0)
+        misses = counters.get(STATS_KEY.format(name, "misses"), 0)
+        total = hits + misses
+        stats[name] = {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / total * 100, 1) if total else None,
+        }
+    return stats
+
+
+def reset_fragment_stats():
+    flush_counters()
+    cache.delete_many(
+        [
+            STATS_KEY.format(name, result)
+            for fragments in FRAGMENTS.values()
+            for name in fragments
+            for result in ("hits", "misses")
+        ]
+    )
+
+
+class DishFragmentInvalidator:
+    """Follows the dish feed: a dish or its ingredients changed, so its fragments are stale.
+
+    The feed is published after the commit, and it also covers the writes that send no signals
+    (bulk saves of the formset, summaries rebuilt after a unit or product rename). A renamed unit
+    only reaches the dishes that use it; shopping lists keep their own copy of the abbreviation.
+    """
+
+    def receive(self, version, dish_ids):
+        invalidate("dish", dish_ids)
+
+
+dish_fragment_invalidator = DishFragmentInvalidator()
+dish_feed.followers.add(dish_fragment_invalidator)
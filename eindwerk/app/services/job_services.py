@@ -0,0 +1,260 @@
+# Python imports
+import hashlib
+import json
+import logging
+import os
+import socket
+import threading
+import traceback
+from datetime import timedelta
+
+# Django imports
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, close_old_connections, connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+# Project imports
+from ..models import Job
+
+logger = logging.getLogger("app.jobs")
+
+# Task name: (function, max_attempts), filled by the @task decorator in app/tasks.py.
+tasks = {}
+
+
+class JobError(Exception):
+    """Raised by a task for a failure that trying again won't fix, the job fails right away."""
+
+
+class UnknownTask(JobError):
+    """A job refers to a task that is not registered."""
+
+
+def task(name, max_attempts=3):
+    """Register a function as task, it is called as function(job, **arguments).
+
+    The function can report its progress with job.report(percentage, message) and returns the
+    result of the job: something JSON can store, a dict with "url" sends the user there when done.
+    """
+
+    def register(function):
+        tasks[name] = (function, max_attempts)
+        return function
+
+    return register
+
+
+def job_key(task_name, arguments, user=None):
+    data = json.dumps([task_name, arguments, user.pk if user else None], sort_keys=True, default=str)
+    return hashlib.sha256(data.encode()).hexdigest()
+
+
+def enqueue(task_name, user=None, **arguments):
+    """Queue a job for the task and return it.
+
+    When the same task with the same arguments is still queued or running for the user, that job
+    is returned instead, so a double click does the work once. With JOBS_RUN_INLINE the job is run
+    right away in this process, for installs without a worker.
+    """
+
+    if task_name not in tasks:
+        raise UnknownTask(task_name)
+    key = job_key(task_name, arguments, user)
+    fields = {"task": task_name, "arguments": arguments, "key": key, "user": user}
+    fields["max_attempts"] = tasks[task_name][1]
+    if settings.JOBS_RUN_INLINE:
+        # Created claimed by this process, that saves claiming it with another write.
+        fields |= {"status": Job.RUNNING, "worker": f"inline:{os.getpid()}", "attempts": 1}
+        fields["heartbeat"] = timezone.now()
+    while True:
+        try:
+            # The unique constraint on the key of unfinished jobs lets only one of two requests create it.
+            with transaction.atomic():
+                job = Job.objects.create(**fields)
+            break
+        except IntegrityError:
+            job = unfinished_job(key)
+            if job is not None:
+                return job
+            # The other job is finished by now, queue a new one.
+
+    if settings.JOBS_RUN_INLINE:
+        job = run_inline(job)
+    return job
+
+
+def unfinished_job(key):
+    """The queued or running job with the key, or None. The Job constraint allows only one."""
+
+    return Job.objects.filter(key=key, status__in=[Job.QUEUED, Job.RUNNING]).first()
+
+
+def run_inline(job):
+    """Run a job that enqueue() created claimed by this process and return it as it ended.
+
+    A failed attempt is tried again right away, no worker would pick it up. The progress is not
+    stored, nobody can look at it before the request that runs the job is done.
+    """
+
+    job.store_progress = False
+    while not run_job(job):
+        Job.objects.filter(pk=job.pk, status=Job.QUEUED).update(run_after=timezone.now())
+        claimed = claim_job(job.worker, pk=job.pk)
+        if claimed is None:
+            break
+        job = claimed
+        job.store_progress = False
+    return job
+
+
+def claimable(now=None):
+    """Jobs that a worker may start: queued ones that are due, and running ones of a worker that died."""
+
+    now = now or timezone.now()
+    stale = now - timedelta(seconds=settings.JOB_TIMEOUT)
+    return Job.objects.filter(
+        Q(status=Job.QUEUED, run_after__lte=now) | Q(status=Job.RUNNING, heartbeat__lt=stale)
+    )
+
+
+def claim_job(worker, pk=None):
+    """Claim the next due job (or job pk) for the worker and return it, or None when there is nothing to do.
+
+    With a database that supports it (PostgreSQL, MySQL 8) the job row is locked with
+    SELECT ... FOR UPDATE SKIP LOCKED: workers on several machines each get another job
+    without waiting for each other. SQLite has no row locks, there the job is claimed with an
+    UPDATE that only succeeds while the job is still claimable. SQLite runs one write at a time,
+    so only one worker gets it, the others try the next job.
+    """
+
+    now = timezone.now()
+    claim = {"status": Job.RUNNING, "worker": worker, "heartbeat": now, "attempts": F("attempts") + 1}
+
+    if pk is None and connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            pk = (
+                claimable(now)
+                .order_by("run_after", "pk")
+                .select_for_update(skip_locked=True)
+                .values_list("pk", flat=True)
+                .first()
+            )
+            if pk is None:
+                return None
+            Job.objects.filter(pk=pk).update(**claim)
+    elif pk is not None:
+        if not claimable(now).filter(pk=pk).update(**claim):
+            return None
+    else:
+        # Other workers may claim every candidate first, then look again.
+        while pk is None:
+            candidates = list(claimable(now).order_by("run_after", "pk").values_list("pk", flat=True)[:10])
+            if not candidates:
+                return None
+            for candidate in candidates:
+                if claimable(now).filter(pk=candidate).update(**claim):
+                    pk = candidate
+                    break
+    return Job.objects.select_related("user").get(pk=pk)
+
+
+class Heartbeat:
+    """Keeps a running job alive: a thread touches its heartbeat every JOB_TIMEOUT / 3 seconds.
+
+    So a task that takes longer than JOB_TIMEOUT isn't taken over by another worker while it still
+    runs, without reporting its progress. Only the worker that claimed the job touches it.
+    """
+
+    def __init__(self, job):
+        self.job = job
+        self.stop = threading.Event()
+        self.thread = threading.Thread(target=self.beat, name=f"heartbeat-{job.pk}", daemon=True)
+
+    def beat(self):
+        try:
+            while not self.stop.wait(settings.JOB_TIMEOUT / 3):
+                try:
+                    Job.objects.filter(pk=self.job.pk, status=Job.RUNNING, worker=self.job.worker).update(
+                        heartbeat=timezone.now()
+                    )
+                except DatabaseError:
+                    logger.exception("No heartbeat for job %s.", self.job.pk)
+        finally:
+            connection.close()
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop.set()
+        self.thread.join()
+
+
+def run_job(job):
+    """Run the task of a claimed job and store the result, or the error and a retry."""
+
+    try:
+        if job.task not in tasks:
+            raise UnknownTask(job.task)
+        if job.attempts > job.max_attempts:
+            # Claimed again after the worker of the last attempt died.
+            raise RuntimeError(f"Gave up after {job.max_attempts} attempts.")
+        function = tasks[job.task][0]
+        with Heartbeat(job):
+            result = function(job, **job.arguments)
+    except Exception as error:
+        retry = job.attempts < job.max_attempts and not isinstance(error, JobError)
+        logger.exception("Job %s failed (attempt %s of %s).", job.pk, job.attempts, job.max_attempts)
+        job.status = Job.QUEUED if retry else Job.FAILED
+        job.error = traceback.format_exc()
+        if retry:
+            job.run_after = timezone.now() + timedelta(seconds=settings.JOB_RETRY_DELAY * 2 ** (job.attempts - 1))
+        else:
+            job.finished = timezone.now()
+        job.save(update_fields=["status", "error", "run_after", "finished"])
+        return False
+
+    job.status = Job.DONE
+    job.result = result
+    job.progress = 100
+    job.finished = timezone.now()
+    job.save(update_fields=["status", "result", "progress", "finished"])
+    return True
+
+
+def worker_name(number=0):
+    return f"{socket.gethostname()}:{os.getpid()}:{number}"
+
+
+def work(worker, stop, poll_interval=1.0, burst=False):
+    """Run jobs until stop (a threading.Event) is set, or until the queue is empty with burst.
+
+    Returns the number of jobs that were run. Every job starts with fresh database connections,
+    like a request does.
+    """
+
+    count = 0
+    try:
+        while not stop.is_set():
+            close_old_connections()
+            try:
+                job = claim_job(worker)
+                if job is not None:
+                    logger.info("Worker %s runs job %s (%s).", worker, job.pk, job.task)
+                    run_job(job)
+                    count += 1
+                    continue
+            except DatabaseError:
+                # The database is busy or gone for a moment. A job that was claimed but not
+                # finished is claimed again after JOB_TIMEOUT.
+                logger.exception("Worker %s could not reach the queue.", worker)
+                stop.wait(poll_interval)
+                continue
+            if burst:
+                break
+            stop.wait(poll_interval)
+    finally:
+        connection.close()
+    return count
@@ -0,0 +1,186 @@
+# Python imports
+import sys
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Django imports
+from django.conf import settings
+from django.db.models import Model
+from django.db.models.fields.related_descriptors import (
+    ForwardManyToOneDescriptor,
+    ReverseOneToOneDescriptor,
+)
+from django.db.models.query import QuerySet
+from django.template.base import Node
+
+# Project imports
+from .timing_services import context_execute_wrapper
+
+_strict = ContextVar("strict_lazy_loading", default=False)
+# The Django methods that install_strict_lazy_loading() replaced, (owner, name, method), empty when not installed.
+_originals = []
+
+
+class LazyLoadError(Exception):
+    """A relation of an object from a list was loaded with an extra query, an N+1 in the making."""
+
+
+class RepeatedQueryDetector:
+    """Execute wrapper that groups identical SQL statements and remembers where repeats come from.
+
+    The SQL has placeholders for the parameters, so the queries of a loop (one per dish, with a
+    different id) are the same statement. From the second run of a statement on, the template
+    line and the Python line that ran it are kept; walking the stack is only paid for repeats.
+    """
+
+    def __init__(self, threshold=3):
+        self.threshold = threshold
+        self.counts = Counter()
+        self.locations = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        self.counts[sql] += 1
+        if self.counts[sql] == 2:
+            self.locations[sql] = query_location()
+        return execute(sql, params, many, context)
+
+    def repeated(self):
+        """The statements that ran at least threshold times: [(count, sql, location)], most first."""
+
+        return [
+            (count, sql, self.locations.get(sql, ""))
+            for sql, count in self.counts.most_common()
+            if count >= self.threshold
+        ]
+
+    def report(self):
+        return "\n".join(f"{count}x {sql}\n    at {location}" for count, sql, location in self.repeated())
+
+
+def query_location():
+    """The template line and the project code that ran the current query, as one line of text."""
+
+    template = python = None
+    base_dir = str(settings.BASE_DIR)
+    frame = sys._getframe(1)
+    while frame and not (template and python):
+        if template is None and frame.f_code.co_name == "render_annotated":
+            node = frame.f_locals.get("self")
+            if isinstance(node, Node) and getattr(node, "token", None) and getattr(node, "origin", None):
+                template = f"{node.origin.template_name or node.origin.name}, line {node.token.lineno}"
+        filename = frame.f_code.co_filename
+        if (
+            python is None
+            and filename.startswith(base_dir)
+            and "site-packages" not in filename
+            and not filename.endswith(("nplusone_services.py", "timing_services.py", "middleware.py"))
+        ):
+            python = f"{filename[len(base_dir) + 1:]}:{frame.f_lineno} in {frame.f_code.co_name}"
+        frame = frame.f_back
+    return " / ".join(location for location in (template, python) if location) or "unknown"
+
+
+@contextmanager
+def detect_repeated_queries(threshold=3, using="default"):
+    """Yield a RepeatedQueryDetector that sees every query of the block."""
+
+    detector = RepeatedQueryDetector(threshold)
+    with context_execute_wrapper(detector, using):
+        yield detector
+
+
+def _mark(instances):
+    """Mark objects that were loaded together with others, and the objects select_related with them."""
+
+    for instance in instances:
+        if not isinstance(instance, Model) or getattr(instance._state, "in_list", False):
+            continue
+        instance._state.in_list = True
+        _mark(instance._state.fields_cache.values())
+
+
+def _check(instance, relation):
+    if _strict.get() and instance is not None and getattr(instance._state, "in_list", False):
+        raise LazyLoadError(
+            f"{type(instance).__name__}.{relation} is loaded with a query per object, "
+            f"add select_related or prefetch_related to the queryset of the list."
+        )
+
+
+def install_strict_lazy_loading():
+    """Wrap the Django methods that load a relation lazily, once. They only check in strict mode.
+
+    An object is "in a list" when the queryset it came from returned more than one row. Loading
+    a foreign key or a one-to-one relation, or running the related manager (dish.productdish_set.all())
+    of such an object is what repeats per row, those raise LazyLoadError in strict mode.
+    Single objects (get(), first()) may load their relations as they like.
+    """
+
+    if _originals:
+        return
+
+    fetch_all = QuerySet._fetch_all
+    get_object = ForwardManyToOneDescriptor.get_object
+    reverse_get_queryset = ReverseOneToOneDescriptor.get_queryset
+
+    def _fetch_all(queryset):
+        if not _strict.get() or queryset._result_cache is not None:
+            return fetch_all(queryset)
+        # A related manager filters on the object it belongs to through _known_related_objects.
+        for field, instances in queryset._known_related_objects.items():
+            for instance in instances.values():
+                _check(instance, field.remote_field.get_accessor_name())
+        fetch_all(queryset)
+        if len(queryset._result_cache) > 1:
+            _mark(queryset._result_cache)
+
+    def _get_object(descriptor, instance):
+        _check(instance, descriptor.field.name)
+        return get_object(descriptor, instance)
+
+    def _reverse_get_queryset(descriptor, **hints):
+        _check(hints.get("instance"), descriptor.related.get_accessor_name())
+        return reverse_get_queryset(descriptor, **hints)
+
+    for owner, name, method in [
+        (QuerySet, "_fetch_all", _fetch_all),
+        (ForwardManyToOneDescriptor, "get_object", _get_object),
+        (ReverseOneToOneDescriptor, "get_queryset", _reverse_get_queryset),
+    ]:
+        _originals.append((owner, name, getattr(owner, name)))
+        setattr(owner, name, method)
+
+
+def uninstall_strict_lazy_loading():
+    """Put the Django methods back that install_strict_lazy_loading() replaced."""
+
+    while _originals:
+        owner, name, method = _originals.pop()
+        setattr(owner, name, method)
+
+
+def enable_strict_lazy_loading():
+    """Turn strict mode on for the current thread or task and everything started from it."""
+
+    install_strict_lazy_loading()
+    _strict.set(True)
+
+
+def disable_strict_lazy_loading():
+    """Turn strict mode off for the current thread or task and restore the Django methods."""
+
+    _strict.set(False)
+    uninstall_strict_lazy_loading()
+
+
+@contextmanager
+def strict_lazy_loading(enabled=True):
+    """Strict mode (or not, with enabled=False) for the code in the block."""
+
+    install_strict_lazy_loading()
+    token = _strict.set(enabled)
+    try:
+        yield
+    finally:
+        _strict.reset(token)
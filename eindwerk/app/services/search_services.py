@@ -0,0 +1,278 @@
+# Python imports
+import math
+import re
+import unicodedata
+from bisect import bisect_left
+from collections import defaultdict
+
+# Django imports
+from django.db import connections
+from django.db.models import BooleanField
+from django.db.models.expressions import RawSQL
+
+# Project imports
+from ..models import Dish
+from .feed_services import FeedFollower, dish_feed
+
+PAGE_SIZE = 25
+
+# The searched fields of a dish with their weight: a hit in the name counts most, a hit in the recipe least.
+WEIGHTS = {"name": 10.0, "ingredient_names": 4.0, "recipe": 1.0}
+
+
+def tokenize(text, strip_accents=True):
+    """Split a text in lowercase words without accents, "Crème brûlée" becomes ["creme", "brulee"]."""
+
+    text = text.lower()
+    if strip_accents:
+        text = unicodedata.normalize("NFKD", text)
+        text = "".join(char for char in text if not unicodedata.combining(char))
+    return re.findall(r"\w+", text)
+
+
+class SqliteSearchBackend:
+    """An FTS5 table over app_dish, kept in sync by triggers and ranked with bm25.
+
+    The table only holds the index (content="app_dish"), the text itself stays in app_dish.
+    A migration that rebuilds app_dish drops the triggers, install() puts them back and
+    rebuilds the index after every migrate.
+    """
+
+    TRIGGERS = {
+        "app_dish_fts_insert": """
+            CREATE TRIGGER app_dish_fts_insert AFTER INSERT ON app_dish BEGIN
+                INSERT INTO app_dish_fts(rowid, name, recipe, ingredient_names)
+                VALUES (new.id, new.name, new.recipe, new.ingredient_names);
+            END""",
+        "app_dish_fts_delete": """
+            CREATE TRIGGER app_dish_fts_delete AFTER DELETE ON app_dish BEGIN
+                INSERT INTO app_dish_fts(app_dish_fts, rowid, name, recipe, ingredient_names)
+                VALUES ('delete', old.id, old.name, old.recipe, old.ingredient_names);
+            END""",
+        "app_dish_fts_update": """
+            CREATE TRIGGER app_dish_fts_update AFTER UPDATE OF name, recipe, ingredient_names ON app_dish BEGIN
+                INSERT INTO app_dish_fts(app_dish_fts, rowid, name, recipe, ingredient_names)
+                VALUES ('delete', old.id, old.name, old.recipe, old.ingredient_names);
+                INSERT INTO app_dish_fts(rowid, name, recipe, ingredient_names)
+                VALUES (new.id, new.name, new.recipe, new.ingredient_names);
+            END""",
+    }
+
+    @staticmethod
+    def is_supported(connection):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+            return bool(cursor.fetchone()[0])
+
+    @staticmethod
+    def is_installed(connection):
+        return "app_dish_fts" in connection.introspection.table_names()
+
+    def install(self, connection):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS app_dish_fts USING fts5("
+                "name, recipe, ingredient_names, content='app_dish', content_rowid='id', "
+                "tokenize='unicode61 remove_diacritics 2')"
+            )
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'app_dish'")
+            existing = {row[0] for row in cursor.fetchall()}
+            missing = [name for name in self.TRIGGERS if name not in existing]
+            for name in missing:
+                cursor.execute(self.TRIGGERS[name])
+            if missing:
+                # Rows written while a trigger was missing are not in the index.
+                cursor.execute("INSERT INTO app_dish_fts(app_dish_fts) VALUES ('rebuild')")
+
+    def search(self, user, query, offset, limit):
+        # Every word has to match and may be incomplete ("pann" finds "pannenkoeken").
+        match = " ".join(f'"{term}"*' for term in tokenize(query))
+        weights = ", ".join(str(WEIGHTS[field]) for field in ("name", "recipe", "ingredient_names"))
+        return list(
+            Dish.objects.raw(
+                # Only the columns of the list, the other fields are deferred like Dish.objects.for_list().
+                "SELECT app_dish.id, app_dish.name, app_dish.is_favorite, app_dish.user_id FROM app_dish_fts "
+                "JOIN app_dish ON app_dish.id = app_dish_fts.rowid "
+                "WHERE app_dish_fts MATCH %s AND app_dish.user_id = %s "
+                f"ORDER BY bm25(app_dish_fts, {weights}), app_dish.id "
+                "LIMIT %s OFFSET %s",
+                [match, user.pk, limit, offset],
+            )
+        )
+
+
+class PostgresSearchBackend:
+    """A GIN index on the weighted tsvector of name, ingredient names and recipe.
+
+    The index is on an expression, so PostgreSQL maintains it with every write to app_dish.
+    The query has to use exactly the same expression, that is why it is built by vector().
+    """
+
+    @staticmethod
+    def vector(table=""):
+        column = f'"{table}".' if table else ""
+        return (
+            f"(setweight(to_tsvector('simple'::regconfig, coalesce({column}\"name\", '')), 'A') || "
+            f"setweight(to_tsvector('simple'::regconfig, coalesce({column}\"ingredient_names\", '')), 'B') || "
+            f"setweight(to_tsvector('simple'::regconfig, coalesce({column}\"recipe\", '')), 'C'))"
+        )
+
+    def install(self, connection):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS app_dish_search_gin ON app_dish USING gin ({self.vector()})"
+            )
+
+    def search(self, user, query, offset, limit):
+        # The "simple" configuration keeps accents, so the words of the query keep them too.
+        query = " & ".join(f"{term}:*" for term in tokenize(query, strip_accents=False))
+        vector = self.vector(Dish._meta.db_table)
+        tsquery = "to_tsquery('simple'::regconfig, %s)"
+        return list(
+            Dish.objects.for_user(user)
+            .for_list()
+            .filter(RawSQL(f"{vector} @@ {tsquery}", [query], output_field=BooleanField()))
+            .annotate(rank=RawSQL(f"ts_rank({vector}, {tsquery})", [query]))
+            .order_by("-rank", "pk")[offset:offset + limit]
+        )
+
+
+class InvertedIndex(FeedFollower):
+    """Pure-Python fallback for databases without full text search.
+
+    The index maps every word to the dishes that contain it, with a score per dish that
+    adds up the weights of the fields the word appears in. It is built on the first search;
+    after that only the dishes announced on the dish feed are read again.
+    """
+
+    def __init__(self):
+        super().__init__(dish_feed)
+
+    def reset(self):
+        with self.lock:
+            super().reset()
+            self.stale = set()
+            self.postings = defaultdict(dict)  # word -> {dish_id: score}
+            self.words = []  # sorted list of all words, for the prefix lookups
+            self.documents = {}  # dish_id -> (user_id, words of the dish)
+
+    def add(self, dish_id, user_id, fields):
+        scores = defaultdict(float)
+        for field, text in fields.items():
+            for word in tokenize(text or ""):
+                scores[word] += WEIGHTS[field]
+        for word, score in scores.items():
+            self.postings[word][dish_id] = score
+        self.documents[dish_id] = (user_id, set(scores))
+
+    def remove(self, dish_id):
+        user_id, words = self.documents.pop(dish_id, (None, ()))
+        for word in words:
+            self.postings[word].pop(dish_id, None)
+            if not self.postings[word]:
+                del self.postings[word]
+
+    def load(self):
+        self.stale = set()
+        self.postings = defaultdict(dict)
+        self.documents = {}
+        self.index(Dish.objects.all())
+
+    def apply(self, dish_ids):
+        self.stale.update(dish_ids)
+
+    def index(self, dishes):
+        for dish in dishes.values("pk", "user_id", *WEIGHTS):
+            self.add(dish.pop("pk"), dish.pop("user_id"), dish)
+        self.words = sorted(self.postings)
+
+    def refresh(self):
+        """Re-index the dishes that changed since the last search, deleted dishes are only removed."""
+
+        self.sync()
+        if self.stale:
+            for dish_id in self.stale:
+                self.remove(dish_id)
+            self.index(Dish.objects.filter(pk__in=self.stale))
+            self.stale = set()
+
+    def expand(self, term):
+        """All known words that start with term."""
+
+        start = bisect_left(self.words, term)
+        end = start
+        while end < len(self.words) and self.words[end].startswith(term):
+            end += 1
+        return self.words[start:end]
+
+    def search(self, user, query, offset, limit):
+        terms = tokenize(query)
+        with self.lock:
+            self.refresh()
+            total = len(self.documents) or 1
+            scores = None
+            for term in terms:
+                term_scores = defaultdict(float)
+                for word in self.expand(term):
+                    postings = self.postings[word]
+                    idf = math.log(1 + total / len(postings))
+                    for dish_id, score in postings.items():
+                        if self.documents[dish_id][0] == user.pk:
+                            term_scores[dish_id] += score * idf
+                if scores is None:
+                    scores = term_scores
+                else:
+                    # Every word has to match.
+                    scores = {dish_id: scores[dish_id] + term_scores[dish_id] for dish_id in scores if dish_id in term_scores}
+
+        ranked = sorted(scores or {}, key=lambda dish_id: (-scores[dish_id], dish_id))
+        page = ranked[offset:offset + limit]
+        dishes = Dish.objects.for_list().in_bulk(page)
+        return [dishes[dish_id] for dish_id in page if dish_id in dishes]
+
+
+python_index = InvertedIndex()
+
+# The backend per database alias, picked once per process.
+_backends = {}
+
+
+def get_search_backend(using="default"):
+    """Pick the search backend for the database: FTS5, PostgreSQL full text search or the Python index."""
+
+    if using not in _backends:
+        connection = connections[using]
+        if connection.vendor == "postgresql":
+            _backends[using] = PostgresSearchBackend()
+        elif connection.vendor == "sqlite" and SqliteSearchBackend.is_installed(connection):
+            _backends[using] = SqliteSearchBackend()
+        else:
+            _backends[using] = python_index
+    return _backends[using]
+
+
+def install_search_index(using="default"):
+    """Create or repair the search index of the database, called after every migrate."""
+
+    connection = connections[using]
+    if connection.vendor == "postgresql":
+        PostgresSearchBackend().install(connection)
+    elif connection.vendor == "sqlite" and SqliteSearchBackend.is_supported(connection):
+        SqliteSearchBackend().install(connection)
+    _backends.pop(using, None)
+
+
+def search_dishes(user, query, page=1, page_size=PAGE_SIZE):
+    """Search the dishes of the user on name, ingredients and recipe, best match first.
+
+    Every word of the query has to be found, the words may be the start of a longer word.
+    Returns the dishes of the page and whether there is a next page. An empty query returns
+    the dishes in alphabetical order.
+    """
+
+    offset = (page - 1) * page_size
+    if tokenize(query):
+        dishes = get_search_backend().search(user, query, offset, page_size + 1)
+    else:
+        dishes = list(Dish.objects.for_user(user).for_list().order_by("name", "pk")[offset:offset + page_size + 1])
+    return dishes[:page_size], len(dishes) > page_size
@@ -0,0 +1,296 @@
+# Python imports
+import random
+from collections import defaultdict
+from contextlib import contextmanager
+from decimal import Decimal
+from itertools import accumulate, islice
+
+# Django imports
+from django.contrib.auth.hashers import make_password
+from django.db import connections, transaction
+
+# Project imports
+from ..models import (
+    Dish,
+    DishMenu,
+    MenuList,
+    Product,
+    ProductDish,
+    ProductShoppingList,
+    ShoppingList,
+    Unit,
+    User,
+    UserDish,
+    UserMenu,
+    UserProduct,
+)
+from .autocomplete_services import products_bulk_saved
+from .dish_services import build_ingredient_summary, ingredient_names
+from .feed_services import dishes_changed
+from .shoplist_services import aggregate_menu_products, menu_content_hash, shopping_list_item
+from .unit_services import display_units
+
+# Used when the database has no units yet, the same units as db_scripts.sql.
+DEFAULT_UNITS = [
+    ("Gram", "g", Unit.MASS, Decimal("1")),
+    ("Kilogram", "kg", Unit.MASS, Decimal("1000")),
+    ("Milliliter", "ml", Unit.VOLUME, Decimal("1")),
+    ("Liter", "l", Unit.VOLUME, Decimal("1000")),
+    ("Eetlepel", "el", Unit.VOLUME, Decimal("15")),
+    ("Stuk", "st", Unit.COUNT, Decimal("1")),
+]
+
+PRODUCT_WORDS = [
+    "Tomaat", "Ui", "Look", "Wortel", "Prei", "Aardappel", "Bloem", "Ei", "Melk", "Boter",
+    "Kaas", "Rijst", "Pasta", "Kip", "Gehakt", "Zalm", "Spinazie", "Paprika", "Courgette", "Champignon",
+    "Room", "Citroen", "Basilicum", "Peterselie", "Linzen", "Kikkererwten", "Tofu", "Appel", "Suiker", "Olijfolie",
+]
+DISH_WORDS = ["Soep", "Stoofpot", "Ovenschotel", "Salade", "Curry", "Risotto", "Wok", "Taart", "Quiche", "Pasta"]
+RECIPE_SENTENCES = [
+    "Snij de groenten in kleine stukjes.",
+    "Verwarm de oven voor op 200 graden.",
+    "Fruit de ui en de look in wat olie.",
+    "Laat alles twintig minuten zachtjes sudderen.",
+    "Breng op smaak met peper en zout.",
+    "Kook de pasta beetgaar.",
+    "Werk af met verse kruiden.",
+]
+QUANTITIES = [Decimal(value) for value in ("1", "2", "3", "4", "50", "100", "150", "200", "250", "500")]
+
+
+def batched(iterable, size):
+    """Yield lists of at most size items, only one batch is in memory at a time."""
+
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+@contextmanager
+def deferred_constraints(using="default"):
+    """A transaction in which the foreign keys are only checked at the commit.
+
+    Django already creates its foreign keys as DEFERRABLE INITIALLY DEFERRED on PostgreSQL and
+    SQLite, this makes it explicit; MySQL has no deferred checks, there they are switched off.
+    """
+
+    connection = connections[using]
+    with transaction.atomic(using=using):
+        with connection.cursor() as cursor:
+            if connection.vendor == "postgresql":
+                cursor.execute("SET CONSTRAINTS ALL DEFERRED")
+            elif connection.vendor == "sqlite":
+                cursor.execute("PRAGMA defer_foreign_keys = ON")
+            elif connection.vendor == "mysql":
+                cursor.execute("SET foreign_key_checks = 0")
+        try:
+            yield
+        finally:
+            if connection.vendor == "mysql":
+                with connection.cursor() as cursor:
+                    cursor.execute("SET foreign_key_checks = 1")
+
+
+class DataSeeder:
+    """Generate a realistic amount of users with their dishes, menus and shopping lists.
+
+    The data only depends on seed and the scale, so two runs with the same arguments give the
+    same data (apart from the prefix that keeps the names unique). Products are shared by all
+    users and some are far more popular than others: product i is picked with a weight of
+    1 / (i + 1) ** skew, like word frequencies.
+
+    The rows are generated lazily and inserted in batches of batch_size with bulk_create. The
+    users are handled in groups of about batch_size dishes, each in its own transaction, so the
+    memory use depends on the batch size and the number of products, not on the number of users.
+    """
+
+    def __init__(
+        self,
+        seed=0,
+        users=100,
+        dishes=50,
+        ingredients=8,
+        products=2000,
+        skew=1.0,
+        menus=5,
+        dishes_per_menu=7,
+        shoppinglists=2,
+        batch_size=1000,
+        prefix="seed",
+        using="default",
+    ):
+        self.rng = random.Random(seed)
+        self.users = users
+        self.dishes = dishes
+        self.ingredients = min(ingredients, products)
+        self.products = products
+        self.skew = skew
+        self.menus = menus
+        self.dishes_per_menu = min(dishes_per_menu, dishes)
+        self.shoppinglists = min(shoppinglists, menus)
+        self.batch_size = batch_size
+        self.prefix = prefix
+        self.using = using
+        self.counts = defaultdict(int)
+
+    def username(self, index):
+        return f"{self.prefix}{index:07}"
+
+    def run(self, progress=None):
+        """Insert everything, progress(users done) is called after every group. Returns the row counts."""
+
+        self.units = self.get_units()
+        self.product_pool = self.get_products()
+        self.cum_weights = list(accumulate(1 / (rank + 1) ** self.skew for rank in range(len(self.product_pool))))
+        # The same hash for every user, hashing a password per user would take longer than the inserts.
+        self.password = make_password(self.prefix)
+
+        group_size = max(1, self.batch_size // max(self.dishes, 1))
+        for start in range(0, self.users, group_size):
+            with deferred_constraints(self.using):
+                self.seed_users(range(start, min(start + group_size, self.users)))
+            if progress:
+                progress(min(start + group_size, self.users))
+        return dict(self.counts)
+
+    def insert(self, model, rows, **kwargs):
+        """bulk_create the rows (any iterable) per batch and return the created objects."""
+
+        created = []
+        for batch in batched(rows, self.batch_size):
+            created += model.objects.using(self.using).bulk_create(batch, **kwargs)
+            self.counts[model.__name__] += len(batch)
+        return created
+
+    def get_units(self):
+        units = list(Unit.objects.using(self.using).order_by("pk"))
+        if not units:
+            units = self.insert(
+                Unit,
+                (Unit(name=name, abbreviation=abbreviation, dimension=dimension, factor=factor)
+                 for name, abbreviation, dimension, factor in DEFAULT_UNITS),
+            )
+        return units
+
+    def product_name(self, index):
+        word = PRODUCT_WORDS[index % len(PRODUCT_WORDS)]
+        return word if index < len(PRODUCT_WORDS) else f"{word} {index // len(PRODUCT_WORDS)}"
+
+    def get_products(self):
+        """The product pool, most popular first. Products that already exist are reused."""
+
+        names = [self.product_name(index) for index in range(self.products)]
+        existing = {}
+        for batch in batched(names, self.batch_size):
+            existing.update(Product.objects.using(self.using).filter(name__in=batch).in_bulk(field_name="name"))
+        with transaction.atomic(using=self.using):
+            created = self.insert(Product, (Product(name=name) for name in names if name not in existing))
+            if created:
+                products_bulk_saved()
+        existing.update((product.name, product) for product in created)
+        return [existing[name] for name in names]
+
+    def pick_products(self):
+        """Pick the ingredients of a dish, popular products more often, never twice in one dish."""
+
+        picked = {}
+        while len(picked) < self.ingredients:
+            for product in self.rng.choices(self.product_pool, cum_weights=self.cum_weights, k=self.ingredients):
+                picked.setdefault(product.pk, product)
+        return list(picked.values())[: self.ingredients]
+
+    def seed_users(self, indexes):
+        users = self.insert(
+            User,
+            (User(username=self.username(index), password=self.password) for index in indexes),
+        )
+        # Spread the products over the users.
+        self.insert(
+            UserProduct,
+            (
+                UserProduct(user=user, product=product)
+                for index, user in zip(indexes, users)
+                for product in self.product_pool[index::self.users]
+            ),
+            ignore_conflicts=True,
+        )
+
+        ingredients_by_dish = {}
+        dishes_by_user = defaultdict(list)
+        dishes = (
+            Dish(
+                name=f"{self.prefix} {self.rng.choice(DISH_WORDS)} {index}-{number}",
+                recipe=" ".join(self.rng.sample(RECIPE_SENTENCES, 3)),
+                user=user,
+            )
+            for index, user in zip(indexes, users)
+            for number in range(self.dishes)
+        )
+        for batch in batched(dishes, self.batch_size):
+            batch = self.insert(Dish, batch)
+            self.insert(UserDish, (UserDish(user_id=dish.user_id, dish=dish) for dish in batch))
+            product_dishes = self.insert(
+                ProductDish,
+                (
+                    ProductDish(
+                        dish=dish,
+                        product=product,
+                        quantity=self.rng.choice(QUANTITIES),
+                        unit=self.rng.choice(self.units),
+                    )
+                    for dish in batch
+                    for product in self.pick_products()
+                ),
+            )
+            for product_dish in product_dishes:
+                ingredients_by_dish.setdefault(product_dish.dish_id, []).append(product_dish)
+            for dish in batch:
+                rows = sorted(ingredients_by_dish.get(dish.pk, []), key=lambda row: row.product.name.lower())
+                dish.ingredient_summary = build_ingredient_summary(rows)
+                dish.ingredient_names = ingredient_names(dish.ingredient_summary)
+                dishes_by_user[dish.user_id].append(dish.pk)
+            Dish.objects.using(self.using).bulk_update(batch, ["ingredient_summary", "ingredient_names"])
+            dishes_changed([dish.pk for dish in batch])
+
+        menus = self.insert(
+            MenuList,
+            (
+                MenuList(name=f"{self.prefix} menu {index}-{number}", user=user)
+                for index, user in zip(indexes, users)
+                for number in range(self.menus)
+            ),
+        )
+        self.insert(UserMenu, (UserMenu(user_id=menu.user_id, menu=menu) for menu in menus))
+        dishes_by_menu = {
+            menu.pk: self.rng.sample(dishes_by_user[menu.user_id], self.dishes_per_menu) for menu in menus
+        }
+        self.insert(
+            DishMenu,
+            (DishMenu(menu_id=menu_id, dish_id=dish_id) for menu_id, dish_ids in dishes_by_menu.items() for dish_id in dish_ids),
+        )
+
+        # A shopping list for the first menus of every user, the menus are in the order they were generated.
+        # They are made like the app makes them, with the content hash of the menu and the totals in the
+        # most readable unit, so recent_shoppinglist() finds them. That takes 2 queries per list.
+        listed = [menu for position, menu in enumerate(menus) if position % self.menus < self.shoppinglists]
+        shoppinglists = self.insert(
+            ShoppingList,
+            (ShoppingList(user_id=menu.user_id, content_hash=menu_content_hash(menu)) for menu in listed),
+        )
+        units = display_units()
+        self.insert(
+            ProductShoppingList,
+            (
+                item
+                for menu, shoppinglist in zip(listed, shoppinglists)
+                for item in self.shopping_list_items(shoppinglist, menu, units)
+            ),
+        )
+
+    def shopping_list_items(self, shoppinglist, menu, units):
+        """The items of the menu as create_shoppinglist_from_menu() makes them, see shoplist_services."""
+
+        items = [shopping_list_item(row, units) for row in aggregate_menu_products(menu)]
+        for item in items:
+            item.shoppinglist = shoppinglist
+        return items
@@ -0,0 +1,299 @@
+# Python imports
+import hashlib
+from collections import defaultdict
+from datetime import timedelta
+
+# Django imports
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, Count, Exists, Max, Min, OuterRef, Q, Sum, Value, When
+from django.utils import timezone
+
+# Project imports
+from ..models import Dish, MenuList, ProductDish, ShoppingList, ProductShoppingList, User
+from .fragment_services import invalidate_on_commit
+from .unit_services import conversion_annotations, display_units, from_base, readable_unit
+
+
+def aggregate_menu_products(menu, product_ids=None):
+    """Return the summed quantity of every product used by the dishes in a menu.
+
+    The totals are computed by the database in a single grouped query. Quantities are first
+    converted into the base unit of their dimension (see unit_services), so "500 g" and "1 kg"
+    are summed into one total, while "2 st" and "300 g" of the same product stay separate.
+    Units that can't be converted are only summed with the same unit.
+    A dish that is added twice to the same menu is counted twice, just like it would be when
+    cooking it twice. Each row also carries the product name and abbreviation of the own unit
+    for the snapshot and the id of one ProductDish of the group as source reference.
+    With product_ids only the totals of those products are computed.
+    """
+
+    product_dishes = ProductDish.objects.filter(dish__dishmenu__menu=menu)
+    if product_ids is not None:
+        product_dishes = product_dishes.filter(product_id__in=product_ids)
+    return (
+        product_dishes
+        .annotate(**conversion_annotations())
+        .values("product_id", "product__name", "dimension", "own_unit_id")
+        .annotate(
+            total_quantity=Sum("base_quantity"),
+            unit_abbreviation=Max("unit__abbreviation"),
+            product_dish_id=Min("id"),
+        )
+        .order_by()
+    )
+
+
+def shopping_list_items(menu):
+    """Build the unsaved ProductShoppingList items for a menu.
+
+    Converted totals are shown in the most readable unit (1500 g becomes 1.5 kg).
+    Takes two queries: one for the units and one for the totals.
+    """
+
+    units = display_units()
+    return [shopping_list_item(row, units) for row in aggregate_menu_products(menu)]
+
+
+def shopping_list_item(row, units):
+    """Build one unsaved ProductShoppingList item from a row of aggregate_menu_products()."""
+
+    item = ProductShoppingList(
+        quantity=row["total_quantity"],
+        product_name=row["product__name"],
+        unit_abbreviation=row["unit_abbreviation"] or "",
+        sort_key=row["product__name"].lower(),
+        dimension=row["dimension"],
+        product_dish_id=row["product_dish_id"],
+        product_id=row["product_id"],
+        unit_id=row["own_unit_id"],
+    )
+    if row["dimension"] in units:
+        unit = readable_unit(row["total_quantity"], units[row["dimension"]])
+        item.quantity = from_base(row["total_quantity"], unit)
+        item.unit = unit
+        item.unit_abbreviation = unit.abbreviation
+    return item
+
+
+def line_key(item):
+    """The (product, dimension, own unit) group of aggregate_menu_products() a saved item belongs to."""
+
+    return item.product_id, item.dimension, None if item.dimension else item.unit_id
+
+
+def menu_totals(menu):
+    """The shopping list items of a menu without saving them, sorted like a shopping list."""
+
+    return sorted(shopping_list_items(menu), key=lambda item: item.sort_key)
+
+
+def menu_content_hash(menu):
+    """Return a sha256 of everything a shopping list of the menu is made from, with one query.
+
+    That is every ingredient row of the dishes in the menu, with the product name, the quantity and
+    the unit (a dish that is twice in the menu counts twice). The same menu a week later, or another
+    menu with the same dishes, gives the same hash as long as no recipe or unit was changed.
+    """
+
+    rows = (
+        ProductDish.objects.filter(dish__dishmenu__menu=menu)
+        .order_by()
+        .values_list(
+            "product_id", "product__name", "quantity", "unit_id", "unit__abbreviation", "unit__dimension", "unit__factor"
+        )
+    )
+    digest = hashlib.sha256()
+    for row in sorted(repr(row) for row in rows):
+        digest.update(row.encode())
+        digest.update(b"\n")
+    return digest.hexdigest()
+
+
+def get_or_create_shoppinglist(menu, user, linked=False, content_hash=None):
+    """Return (shoppinglist, created): a recent list of the user with the same content, or a new one.
+
+    A list is reused when it is at most SHOPPINGLIST_REUSE_DAYS old and nothing on it is ticked off,
+    so a double click, or the same weekly menu that wasn't shopped yet, doesn't make a second list.
+        - Unlinked lists are found by the content hash of the menu, see menu_content_hash().
+        - A linked list follows its menu anyway, so the newest linked list of the menu is reused.
+    Generating the same list again takes 3 queries, the user row is locked so two clicks at the
+    same time can't both create a list. A content_hash that was computed before (by the request that
+    queued the job) is used instead of reading the menu again.
+    """
+
+    with transaction.atomic():
+        User.objects.select_for_update().values_list("pk").get(pk=user.pk)
+        shoppinglist, content_hash = recent_shoppinglist(menu, user, linked, content_hash)
+        if shoppinglist is not None:
+            return shoppinglist, False
+        return create_shoppinglist_from_menu(menu, user, linked, content_hash), True
+
+
+def recent_shoppinglist(menu, user, linked=False, content_hash=None):
+    """Return (shoppinglist, content_hash): the list get_or_create_shoppinglist() would reuse, or None.
+
+    The content hash is "" for linked lists, it is only computed when it isn't given.
+    """
+
+    recent = (
+        ShoppingList.objects.for_user(user)
+        .filter(date__gte=timezone.now() - timedelta(days=settings.SHOPPINGLIST_REUSE_DAYS))
+        .exclude(Exists(ProductShoppingList.objects.filter(shoppinglist=OuterRef("pk"), checked=True)))
+    )
+    if linked:
+        return recent.filter(menu=menu).first(), ""
+    if content_hash is None:
+        content_hash = menu_content_hash(menu)
+    return recent.filter(menu__isnull=True, content_hash=content_hash).first(), content_hash
+
+
+def create_shoppinglist_from_menu(menu, user, linked=False, content_hash=""):
+    """Create a new shopping list for the user with all products needed for the menu.
+
+    The number of queries does not depend on the size of the menu:
+        - 1 insert for the ShoppingList.
+        - 1 select for the units and 1 grouped select for the product totals.
+        - 1 bulk insert for the ProductShoppingList rows.
+    Everything happens in one transaction, so a failure never leaves a half filled list behind.
+    A linked list keeps following the menu, see update_linked_shoppinglists().
+    """
+
+    with transaction.atomic():
+        shoppinglist = ShoppingList.objects.create(
+            user=user, menu=menu if linked else None, content_hash=content_hash
+        )
+        items = shopping_list_items(menu)
+        for item in items:
+            item.shoppinglist = shoppinglist
+        ProductShoppingList.objects.bulk_create(items)
+    return shoppinglist
+
+
+def update_linked_shoppinglists(shoppinglists, product_ids=None):
+    """Bring the lines of the given products up to date on the shopping lists that follow a menu.
+
+    Only the totals of product_ids are summed and only their lines are read and written, so the
+    cost depends on the size of the change and not on the size of the menu. product_ids=None
+    updates every line. Unlinked lists in the shoppinglists queryset are skipped.
+        - 1 select that locks the linked lists.
+        - 1 select for the units, then 1 select for the lines and per menu 1 grouped select.
+        - At most 1 bulk insert, 1 bulk update and a delete of the lines that are no longer needed.
+    A line that was changed by hand (manual) is left alone, also when the menu no longer needs it.
+    Returns the number of lines that were created, updated or deleted.
+    """
+
+    with transaction.atomic():
+        linked = list(
+            shoppinglists.filter(menu__isnull=False)
+            .select_for_update()
+            .order_by()
+            .values_list("pk", "menu_id")
+        )
+        if not linked:
+            return 0
+        if product_ids is not None:
+            product_ids = set(product_ids)
+            if not product_ids:
+                return 0
+
+        list_ids_by_menu = defaultdict(list)
+        for list_id, menu_id in linked:
+            list_ids_by_menu[menu_id].append(list_id)
+
+        lines = defaultdict(dict)
+        items = ProductShoppingList.objects.filter(shoppinglist_id__in=[list_id for list_id, _ in linked])
+        if product_ids is None:
+            items = items.filter(product__isnull=False)
+        else:
+            items = items.filter(product_id__in=product_ids)
+        for item in items.order_by("pk"):
+            lines[item.shoppinglist_id].setdefault(line_key(item), item)
+
+        units = display_units()
+        created, updated, deleted = [], [], []
+        for menu_id, list_ids in list_ids_by_menu.items():
+            needed = {
+                (row["product_id"], row["dimension"], row["own_unit_id"]): row
+                for row in aggregate_menu_products(menu_id, product_ids)
+            }
+            for list_id in list_ids:
+                current = lines[list_id]
+                for key, row in needed.items():
+                    fresh = shopping_list_item(row, units)
+                    item = current.pop(key, None)
+                    if item is None:
+                        fresh.shoppinglist_id = list_id
+                        created.append(fresh)
+                    elif not item.manual and (item.quantity, item.unit_id) != (fresh.quantity, fresh.unit_id):
+                        item.quantity = fresh.quantity
+                        item.unit_id = fresh.unit_id
+                        item.unit_abbreviation = fresh.unit_abbreviation
+                        updated.append(item)
+                deleted.extend(item.pk for item in current.values() if not item.manual)
+
+        if created:
+            ProductShoppingList.objects.bulk_create(created)
+        if updated:
+            ProductShoppingList.objects.bulk_update(updated, ["quantity", "unit", "unit_abbreviation"])
+        if deleted:
+            ProductShoppingList.objects.filter(pk__in=deleted).delete()
+        # bulk_create() and bulk_update() send no signals, so the cached tables are invalidated here.
+        invalidate_on_commit("shoppinglist", [list_id for list_id, _ in linked])
+    return len(created) + len(updated) + len(deleted)
+
+
+def menu_dish_changed(menu_id, dish_id):
+    """A dish was added to or removed from a menu: update its products on the lists that follow the menu.
+
+    Costs one query when no list follows the menu. When the dish itself was deleted its products
+    are unknown, then every line of the lists is updated.
+    """
+
+    shoppinglists = ShoppingList.objects.filter(menu_id=menu_id)
+    if not shoppinglists.exists():
+        return 0
+    product_ids = None
+    if dish_id is not None and Dish.objects.filter(pk=dish_id).exists():
+        product_ids = ProductDish.objects.filter(dish_id=dish_id).order_by().values_list("product_id", flat=True)
+    return update_linked_shoppinglists(shoppinglists, product_ids)
+
+
+def dish_products_changed(dish_id, product_ids):
+    """Ingredients of a dish changed: update those products on the lists that follow a menu with the dish.
+
+    Costs one query when no list follows such a menu.
+    """
+
+    shoppinglists = ShoppingList.objects.filter(menu__in=MenuList.objects.filter(dishmenu__dish_id=dish_id))
+    if not shoppinglists.exists():
+        return 0
+    return update_linked_shoppinglists(shoppinglists, product_ids)
+
+
+def set_checked(shoppinglist, checked_ids, unchecked_ids):
+    """Tick off (checked_ids) and untick (unchecked_ids) items of a shopping list with one UPDATE.
+
+    The new state of every item is given, the items are not flipped: two people that tick
+    items of the same list at the same time only write the items they touched, and sending
+    the same change twice does no harm. An id in both sets counts as checked.
+    Ids of other shopping lists are ignored. Returns the number of updated items.
+    """
+
+    checked_ids, unchecked_ids = set(checked_ids), set(unchecked_ids)
+    if not checked_ids and not unchecked_ids:
+        return 0
+    updated = ProductShoppingList.objects.filter(
+        shoppinglist=shoppinglist, pk__in=checked_ids | unchecked_ids
+    ).update(checked=Case(When(pk__in=checked_ids, then=Value(True)), default=Value(False)))
+    # update() sends no signals, so the cached table is invalidated here.
+    invalidate_on_commit("shoppinglist", [shoppinglist.pk])
+    return updated
+
+
+def checked_progress(shoppinglist):
+    """Return {"checked": n, "total": n} for the items of a shopping list, in one query."""
+
+    return ProductShoppingList.objects.filter(shoppinglist=shoppinglist).aggregate(
+        checked=Count("pk", filter=Q(checked=True)), total=Count("pk")
+    )
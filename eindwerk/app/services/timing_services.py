@@ -0,0 +1,163 @@
+# Python imports
+import inspect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import partial
+
+# Django imports
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.template.base import Template
+
+# The RequestTimer of the request that is handled in this thread or task.
+_current_timer = ContextVar("request_timer", default=None)
+# The execute wrappers of the code that runs in this thread or task, see context_execute_wrapper().
+_context_wrappers = ContextVar("context_execute_wrappers", default=())
+# How deep the template that renders in this thread or task is included, only the outer one is timed.
+_template_depth = ContextVar("template_depth", default=0)
+_original_render = None
+
+
+def _run_context_wrappers(execute, sql, params, many, context):
+    for wrapper in reversed(_context_wrappers.get()):
+        execute = partial(wrapper, execute)
+    return execute(sql, params, many, context)
+
+
+def install_context_wrappers(sender=None, connection=None, **kwargs):
+    """Add the wrapper that runs the context wrappers to a connection, once."""
+
+    if _run_context_wrappers not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_run_context_wrappers)
+
+
+# Every connection gets it when it connects, also the ones of the threads the async views run their queries in.
+connection_created.connect(install_context_wrappers)
+
+
+@contextmanager
+def context_execute_wrapper(wrapper, using="default"):
+    """Like connection.execute_wrapper(), but for the code in the block instead of the connection.
+
+    connection.execute_wrapper() only sees the connection of the current thread. An async view
+    runs its queries on the connection of a worker thread, the context (a ContextVar) is passed on
+    to that thread, so this wrapper sees them too.
+    """
+
+    install_context_wrappers(connection=connections[using])
+    token = _context_wrappers.set(_context_wrappers.get() + (wrapper,))
+    try:
+        yield
+    finally:
+        _context_wrappers.reset(token)
+
+
+class QueryTimer:
+    """Execute wrapper that counts the queries and adds up the time spent in the database.
+
+    The queries of an async view run in worker threads (asyncio.gather() with sync_to_async()),
+    so the totals are added up under a lock.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            with self.lock:
+                self.duration += elapsed
+                self.count += 1
+
+
+class RequestTimer:
+    """The time a request spends in the database and per phase ("tpl", "auth", ...).
+
+    The phases don't include the queries run during them, those are only counted in queries,
+    so the database time and the phases can be added up.
+    """
+
+    def __init__(self):
+        self.queries = QueryTimer()
+        self.durations = {}
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name):
+        start, sql = time.perf_counter(), self.queries.duration
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start - (self.queries.duration - sql)
+            with self.lock:
+                self.durations[name] = self.durations.get(name, 0.0) + elapsed
+
+
+def _timed_render(template, context):
+    # Included templates render inside their parent, only the outer template is timed.
+    timer = _current_timer.get()
+    if timer is None or _template_depth.get():
+        return _original_render(template, context)
+    token = _template_depth.set(1)
+    try:
+        with timer.phase("tpl"):
+            return _original_render(template, context)
+    finally:
+        _template_depth.reset(token)
+
+
+def install_template_timing():
+    """Wrap Template._render once, the wrapper only measures while a request is timed.
+
+    This is done on first use and not at startup, because the test runner swaps Template._render
+    for its own instrumented version before the tests run.
+    Template._render(self, context) is private Django API (Template.render() calls it), this checks
+    it is still there with those arguments, so a Django upgrade that changes it fails here loudly
+    instead of timing nothing or breaking every template.
+    """
+
+    global _original_render
+    if Template._render is _timed_render:
+        return
+    render = getattr(Template, "_render", None)
+    if render is None or list(inspect.signature(render).parameters) != ["self", "context"]:
+        raise ImproperlyConfigured(
+            "django.template.base.Template._render(self, context) is gone, the template timing of "
+            "app/services/timing_services.py has to be updated for this Django version."
+        )
+    _original_render = render
+    Template._render = _timed_render
+
+
+def current_timer():
+    return _current_timer.get()
+
+
+@contextmanager
+def request_timing(using="default"):
+    """Time the queries and template rendering of the code in the block, yields the RequestTimer.
+
+    A block inside another one (the middleware during a benchmark) shares the outer timer. The
+    queries of async views are timed as well, see context_execute_wrapper().
+    """
+
+    timer = _current_timer.get()
+    if timer is not None:
+        yield timer
+        return
+    install_template_timing()
+    timer = RequestTimer()
+    token = _current_timer.set(timer)
+    try:
+        with context_execute_wrapper(timer.queries, using):
+            yield timer
+    finally:
+        _current_timer.reset(token)
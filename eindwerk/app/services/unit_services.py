@@ -0,0 +1,93 @@
+# Python imports
+from decimal import Decimal
+
+# Django imports
+from django.db.models import BigIntegerField, Case, CharField, DecimalField, F, Q, Value, When
+from django.db.models.functions import Coalesce
+
+# Project imports
+from ..models import Unit
+
+# A unit can be converted when it has a dimension and a factor.
+CONVERTIBLE = Q(unit__dimension__gt="") & Q(unit__factor__isnull=False)
+
+DECIMAL = DecimalField(max_digits=20, decimal_places=4)
+
+
+def conversion_annotations():
+    """Annotations for a ProductDish queryset that express every quantity in the base unit of its dimension.
+
+    - dimension: the dimension of the unit, or "" when the unit can't be converted.
+    - own_unit_id: the unit of rows that can't be converted (they are only summed per unit), else NULL.
+    - base_quantity: the quantity times the unit factor (missing quantities count as 0).
+    Grouping on (product, dimension, own_unit_id) sums grams with kilograms, but keeps pieces apart.
+    """
+
+    return {
+        "dimension": Case(
+            When(CONVERTIBLE, then=F("unit__dimension")),
+            default=Value(""),
+            output_field=CharField(),
+        ),
+        "own_unit_id": Case(
+            When(CONVERTIBLE, then=Value(None)),
+            default=F("unit_id"),
+            output_field=BigIntegerField(),
+        ),
+        "base_quantity": Case(
+            When(CONVERTIBLE, then=Coalesce("quantity", Value(0), output_field=DECIMAL) * F("unit__factor")),
+            default=Coalesce("quantity", Value(0), output_field=DECIMAL),
+            output_field=DECIMAL,
+        ),
+    }
+
+
+def is_power_of_ten(factor):
+    return factor.normalize().as_tuple().digits == (1,)
+
+
+def display_units():
+    """Return the units a converted total can be shown in, per dimension and sorted by factor.
+
+    Only metric steps are used (g/kg, ml/cl/dl/l), so 30 ml is never shown as 2 tablespoons.
+    When there are two units with the same dimension and factor (for example two "gram" rows)
+    the oldest one is used.
+    """
+
+    units = {}
+    for unit in Unit.objects.filter(dimension__gt="", factor__isnull=False).order_by("factor", "pk"):
+        candidates = units.setdefault(unit.dimension, [])
+        if candidates and candidates[-1].factor == unit.factor:
+            continue
+        candidates.append(unit)
+
+    for dimension, candidates in units.items():
+        metric = [unit for unit in candidates if is_power_of_ten(unit.factor)]
+        units[dimension] = metric or candidates
+    return units
+
+
+def converts_exactly(base_quantity, unit):
+    """Whether the quantity can be written in the unit with 2 decimals without losing anything."""
+
+    quantity = Decimal(base_quantity) / unit.factor
+    return quantity == quantity.quantize(Decimal("0.01"))
+
+
+def readable_unit(base_quantity, candidates):
+    """Pick the largest unit in which the quantity is at least 1 and exact, e.g. 1500 g becomes kg.
+
+    1001 g stays in grams: as 1.00 kg the gram would be lost from the shopping list.
+    """
+
+    best = candidates[0]
+    for unit in candidates:
+        if unit.factor <= base_quantity and converts_exactly(base_quantity, unit):
+            best = unit
+    return best
+
+
+def from_base(base_quantity, unit):
+    """Convert a quantity in the base unit to the given unit, rounded to 2 decimals."""
+
+    return (Decimal(base_quantity) / unit.factor).quantize(Decimal("0.01"))
@@ -0,0 +1,131 @@
+# Django imports
+from django.apps import apps as global_apps
+from django.core.signals import request_finished
+from django.db import transaction
+from django.db.models.signals import post_delete, post_migrate, post_save
+from django.dispatch import receiver
+
+# Project imports
+from .models import Dish, DishMenu, MenuList, Product, ProductDish, ProductShoppingList, Unit, User
+from .services.dish_services import (
+    rebuild_ingredient_summaries,
+    summary_updates_paused,
+    update_ingredient_summary,
+)
+from .services.autocomplete_services import products_deleted, products_saved
+from .services.cache_services import invalidate_user
+from .services.feed_services import dishes_changed
+from .services.fragment_services import flush_counters, invalidate_on_commit
+from .services.search_services import install_search_index
+from .services.shoplist_services import dish_products_changed, menu_dish_changed
+
+
+@receiver(post_migrate)
+def migrated(sender, using="default", apps=global_apps, **kwargs):
+    """Create the dish search index, or repair it when a migration rebuilt the dish table.
+    Not after a migrate back to before the dish had its ingredient names, the index needs them."""
+    if sender.name == "app":
+        try:
+            dish_model = apps.get_model("app", "Dish")
+        except LookupError:
+            return
+        if any(field.name == "ingredient_names" for field in dish_model._meta.get_fields()):
+            install_search_index(using)
+
+
+@receiver(post_save, sender=Dish)
+@receiver(post_delete, sender=Dish)
+def dish_changed(sender, instance, raw=False, **kwargs):
+    """The in-memory dish indexes (search fallback, what can I cook) read the dish again."""
+    if not raw:
+        dishes_changed([instance.pk])
+
+
+@receiver(post_save, sender=ProductDish)
+@receiver(post_delete, sender=ProductDish)
+def product_dish_changed(sender, instance, raw=False, **kwargs):
+    """Keep the ingredient summary of the dish in sync when one of its products changes."""
+    if not raw and not summary_updates_paused():
+        update_ingredient_summary(instance.dish_id)
+
+
+@receiver(post_save, sender=ProductDish)
+@receiver(post_delete, sender=ProductDish)
+def product_dish_followed(sender, instance, raw=False, **kwargs):
+    """Shopping lists that follow a menu with the dish update the line of the product.
+    When the row got another product, the line of the old product is updated as well."""
+    if not raw and not summary_updates_paused():
+        product_ids = {instance.product_id, getattr(instance, "loaded_product_id", None)} - {None}
+        transaction.on_commit(lambda: dish_products_changed(instance.dish_id, product_ids))
+
+
+@receiver(post_save, sender=Product)
+def product_changed(sender, instance, created, raw=False, **kwargs):
+    """A renamed product changes the summary of every dish that uses it."""
+    if not raw and not created:
+        rebuild_ingredient_summaries(Dish.objects.filter(productdish__product=instance).distinct())
+
+
+@receiver(post_save, sender=Product)
+def product_saved(sender, instance, raw=False, **kwargs):
+    """New and renamed products are added to the autocomplete index once they are committed."""
+    if not raw:
+        products_saved([instance])
+
+
+@receiver(post_delete, sender=Product)
+def product_deleted(sender, instance, **kwargs):
+    products_deleted([instance])
+
+
+@receiver(post_save, sender=Unit)
+def unit_changed(sender, instance, created, raw=False, **kwargs):
+    """A changed abbreviation changes the summary of every dish that uses the unit."""
+    if not raw and not created:
+        rebuild_ingredient_summaries(Dish.objects.filter(productdish__unit=instance).distinct())
+
+
+@receiver(post_save, sender=MenuList)
+@receiver(post_delete, sender=MenuList)
+def menu_changed(sender, instance, raw=False, **kwargs):
+    """The menu card shows the name of the menu."""
+    if not raw:
+        invalidate_on_commit("menu", [instance.pk])
+
+
+@receiver(post_save, sender=DishMenu)
+@receiver(post_delete, sender=DishMenu)
+def dish_menu_changed(sender, instance, raw=False, **kwargs):
+    """The menu card shows the number of dishes."""
+    if not raw:
+        invalidate_on_commit("menu", [instance.menu_id])
+
+
+@receiver(post_save, sender=DishMenu)
+@receiver(post_delete, sender=DishMenu)
+def dish_menu_followed(sender, instance, raw=False, created=True, **kwargs):
+    """Shopping lists that follow the menu update the products of the added or removed dish.
+    An existing row that is saved again may point to another dish, then every line is updated."""
+    if not raw:
+        dish_id = instance.dish_id if created else None
+        transaction.on_commit(lambda: menu_dish_changed(instance.menu_id, dish_id))
+
+
+@receiver(post_save, sender=ProductShoppingList)
+@receiver(post_delete, sender=ProductShoppingList)
+def shopping_list_item_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        invalidate_on_commit("shoppinglist", [instance.shoppinglist_id])
+
+
+@receiver(post_save, sender=User)
+def user_changed(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    """Everything cached for the user may show the old user, a login only sets last_login."""
+    if not raw and not created and update_fields != frozenset(["last_login"]):
+        transaction.on_commit(lambda: invalidate_user(instance.pk))
+
+
+@receiver(request_finished)
+def request_done(sender, **kwargs):
+    """Write the fragment hits and misses of the request to the cache at once."""
+    flush_counters()
@@ -0,0 +1,34 @@
+# Django imports
+from django.urls import reverse
+
+# Project imports
+from .models import MenuList
+from .services.dish_services import rebuild_ingredient_summaries
+from .services.job_services import JobError, task
+from .services.shoplist_services import get_or_create_shoppinglist
+
+
+@task("create_shoppinglist")
+def create_shoppinglist(job, menu_id, linked=False, content_hash=None):
+    """Generate the shopping list of a menu for the user of the job, queued by CreateShoppingListFromMenuView.
+
+    content_hash is the hash of the menu content when the job was queued, see recent_shoppinglist().
+    """
+
+    try:
+        menu = MenuList.objects.for_user(job.user).get(pk=menu_id)
+    except MenuList.DoesNotExist:
+        raise JobError("Het menu bestaat niet meer.")
+    job.report(10, f"Winkellijst voor {menu.name} wordt gemaakt")
+    shoppinglist, created = get_or_create_shoppinglist(menu, job.user, linked, content_hash)
+    return {"shoppinglist": shoppinglist.pk, "url": reverse("shoppinglist_detail", kwargs={"pk": shoppinglist.pk})}
+
+
+@task("rebuild_ingredient_summaries", max_attempts=1)
+def rebuild_summaries(job, batch_size=500):
+    """Rebuild the ingredient summary of every dish, see the rebuild_ingredient_summaries command."""
+
+    def progress(done, total):
+        job.report(done * 100 // total, f"{done} van {total} gerechten")
+
+    return {"dishes": rebuild_ingredient_summaries(batch_size=batch_size, progress=progress)}
@@ -0,0 +1,55 @@
+from django import template
+
+from ..services.fragment_services import get_or_render, prefetch_versions, request_versions
+
+register = template.Library()
+
+
+class FragmentNode(template.Node):
+    def __init__(self, nodelist, name, kind, object_id):
+        self.nodelist = nodelist
+        self.name = name
+        self.kind = kind
+        self.object_id = object_id
+
+    def render(self, context):
+        request = context["request"]
+        return get_or_render(
+            self.name.resolve(context),
+            self.kind.resolve(context),
+            self.object_id.resolve(context),
+            request.user.pk,
+            lambda: self.nodelist.render(context),
+            request_versions(request),
+        )
+
+
+@register.tag
+def fragment(parser, token):
+    """Cache a part of a template per user until the object it shows changes.
+
+    Usage: {% fragment "dish-card" "dish" dish.pk %} ... {% endfragment %}
+    The first argument names the fragment, the other two give the object whose version is used,
+    see fragment_services. Never put a {% csrf_token %} inside, it is different per session.
+    """
+
+    bits = token.split_contents()
+    if len(bits) != 4:
+        raise template.TemplateSyntaxError(
+            f"'{bits[0]}' takes three arguments: the fragment name, the kind and the id of the object."
+        )
+    nodelist = parser.parse(("endfragment",))
+    parser.delete_first_token()
+    return FragmentNode(nodelist, *(parser.compile_filter(bit) for bit in bits[1:]))
+
+
+@register.simple_tag(takes_context=True)
+def fragment_versions(context, kind, objects, attribute="pk"):
+    """Read the versions of the fragments of a list in one round trip, put it before the loop.
+
+    Usage: {% fragment_versions "dish" object_list %}, or {% fragment_versions "dish" dishes "dish_id" %}
+    when the id of the object is another attribute of the items.
+    """
+
+    prefetch_versions(context["request"], kind, [getattr(item, attribute) for item in objects])
+    return ""
@@ -0,0 +1,19 @@
+from django.test.runner import DiscoverRunner
+
+from ..services.nplusone_services import disable_strict_lazy_loading, enable_strict_lazy_loading
+
+
+class StrictLazyLoadingTestRunner(DiscoverRunner):
+    """Run the tests in strict lazy loading mode, so an N+1 query in a view or service fails the test.
+
+    Use strict_lazy_loading(False) from nplusone_services around code that loads lazily on purpose.
+    Strict mode and the patched Django methods are undone when the tests are done.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        enable_strict_lazy_loading()
+
+    def teardown_test_environment(self, **kwargs):
+        disable_strict_lazy_loading()
+        super().teardown_test_environment(**kwargs)
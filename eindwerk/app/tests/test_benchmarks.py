@@ -0,0 +1,60 @@
+from django.core.cache import cache
+from django.test import TestCase, TransactionTestCase
+
+from ..models import User
+from ..services.autocomplete_services import product_index
+from ..services.benchmark_services import (
+    EXCLUDED_ROUTES,
+    ROUTES,
+    check_results,
+    load_baseline,
+    named_routes,
+    run_benchmark,
+    run_server_benchmark,
+)
+from ..services.cook_services import cook_index
+
+
+class BenchmarkTest(TestCase):
+    """Run the route benchmark with small sizes, the full run is: python manage.py benchmark_urls."""
+
+    def setUp(self):
+        cache.clear()
+        product_index.reset()
+        cook_index.reset()
+
+    def test_every_route_is_benchmarked(self):
+        """Test that a new route in app/urls.py is added to ROUTES (or EXCLUDED_ROUTES)."""
+        self.assertEqual(set(ROUTES) | set(EXCLUDED_ROUTES), named_routes())
+
+    def test_query_counts_stay_within_the_baseline(self):
+        results = run_benchmark([10, 100], repeat=1)
+        for name, by_size in results["routes"].items():
+            for size, measurements in by_size.items():
+                self.assertLess(measurements["status"], 400, f"{name} with {size} dishes")
+        self.assertEqual(check_results(results, load_baseline()), [])
+
+    def test_growing_query_count_is_reported(self):
+        results = {
+            "sizes": [10, 100],
+            "routes": {"dish_list": {"10": {"queries": 3}, "100": {"queries": 12}}},
+        }
+        self.assertEqual(len(check_results(results, {})), 1)
+        self.assertEqual(len(check_results(results, {"dish_list": 20})), 1)
+        self.assertEqual(len(check_results(results, {"dish_list": 5})), 2)
+
+
+class ServerBenchmarkTest(TransactionTestCase):
+    """The WSGI and ASGI applications read committed data, the full run is: python manage.py benchmark_servers."""
+
+    def setUp(self):
+        cache.clear()
+        product_index.reset()
+        cook_index.reset()
+
+    def test_both_servers_serve_every_page(self):
+        results = run_server_benchmark(size=10, requests=14, threads=2, clients=4, client_delay=0)
+        for name in ("wsgi", "asgi"):
+            self.assertEqual(results[name]["requests"], 14)
+            self.assertEqual(results[name]["statuses"], [200], name)
+        self.assertFalse(User.objects.exists())
@@ -0,0 +1,107 @@
+import json
+import re
+import threading
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.template.base import Template
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Dish, User
+from ..services.timing_services import QueryTimer, install_template_timing
+from .test_views.test_dish_views import STATIC_STORAGES
+
+
+@override_settings(STORAGES=STATIC_STORAGES)
+class ServerTimingMiddlewareTest(TestCase):
+    """Test the Server-Timing header and the sampled log records."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="testuser", password="testpassword")
+        self.client.force_login(self.user)
+        Dish.objects.create(name="Soep", recipe="", user=self.user)
+
+    def metrics(self, response):
+        return {
+            match.group(1): (float(match.group(2)), match.group(3))
+            for match in re.finditer(r'(\w+);dur=([\d.]+)(?:;desc="([^"]*)")?', response["Server-Timing"])
+        }
+
+    def test_header_has_every_metric(self):
+        response = self.client.get(reverse("dish_list"))
+        metrics = self.metrics(response)
+        self.assertEqual(list(metrics), ["db", "auth", "tpl", "view", "total"])
+        self.assertRegex(metrics["db"][1], r"^[1-9]\d* queries$")
+        self.assertGreater(metrics["tpl"][0], 0)
+        parts = sum(metrics[name][0] for name in ("db", "auth", "tpl", "view"))
+        self.assertAlmostEqual(parts, metrics["total"][0], delta=0.5)
+
+    def test_queries_of_async_views_are_counted(self):
+        """Test that under ASGI the queries the async views run in a thread are timed as well."""
+        self.async_client.force_login(self.user)
+        wsgi_response = self.client.get(reverse("dish_list"))
+        asgi_response = async_to_sync(self.async_client.get)(reverse("dish_list"))
+        self.assertEqual(self.metrics(asgi_response)["db"][1], self.metrics(wsgi_response)["db"][1])
+
+    def test_response_without_template(self):
+        response = self.client.post(reverse("add_to_menu"), {"dish_id": 0, "menu_id": 0})
+        self.assertEqual(response.status_code, 404)
+        self.assertIn("total;dur=", response["Server-Timing"])
+
+    @override_settings(SERVER_TIMING_SAMPLE_RATE=1)
+    def test_sampled_request_is_logged(self):
+        with self.assertLogs("app.timing", level="INFO") as logs:
+            self.client.get(reverse("dish_list"), headers={"HX-Request": "true"})
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record["url_name"], "dish_list")
+        self.assertTrue(record["htmx"])
+        self.assertEqual(record["status"], 200)
+        self.assertGreater(record["queries"], 0)
+
+    def test_nothing_is_logged_without_sampling(self):
+        with self.assertNoLogs("app.timing"):
+            self.client.get(reverse("dish_list"))
+
+
+class RequestTimerTest(TestCase):
+    """Test the timers the middleware uses."""
+
+    def test_queries_of_threads_are_all_counted(self):
+        timer = QueryTimer()
+
+        def run_queries():
+            for _ in range(1000):
+                timer(lambda sql, params, many, context: None, "SELECT 1", (), False, {})
+
+        threads = [threading.Thread(target=run_queries) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(timer.count, 8000)
+
+    def test_changed_template_render_fails_loudly(self):
+        """Test that a Django version with another Template._render is refused instead of patched."""
+        with mock.patch.object(Template, "_render", lambda self, context, origin: ""):
+            with self.assertRaises(ImproperlyConfigured):
+                install_template_timing()
+
+
+@override_settings(STORAGES=STATIC_STORAGES, NPLUSONE_THRESHOLD=1)
+class NPlusOneMiddlewareTest(TestCase):
+    """Test that repeated statements are logged, every statement counts with a threshold of 1."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="testuser", password="testpassword")
+        self.client.force_login(self.user)
+
+    def test_repeated_queries_are_logged(self):
+        with self.assertLogs("app.nplusone", level="WARNING") as logs:
+            self.client.get(reverse("dish_list"))
+        self.assertIn("Repeated queries in dish_list", logs.output[0])
+        self.assertIn("SELECT", logs.output[0])
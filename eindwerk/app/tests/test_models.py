@@ -185,3 +185,22 @@ class BugReportModelTest(TestCase):
             description="Recipe is not saving correctly.",
         )
         self.assertEqual(str(bug_report), "Bug in Recipe")
+
+
+class ForUserQuerySetTest(TestCase):
+    """Test the for_user() filter of the models owned by a user."""
+
+    def test_for_user(self):
+        """Test that only the objects of the user are returned."""
+        user = User.objects.create_user(username="testuser", password="testpassword")
+        other = User.objects.create_user(username="other", password="testpassword")
+        dish = Dish.objects.create(name="Tomato Soup", recipe="", user=user)
+        Dish.objects.create(name="Pasta", recipe="", user=other)
+        product = Product.objects.create(name="Tomato")
+        product_dish = ProductDish.objects.create(product=product, dish=dish, quantity=1)
+        menu = MenuList.objects.create(name="Weekly Menu", user=user)
+
+        self.assertQuerySetEqual(Dish.objects.for_user(user), [dish])
+        self.assertQuerySetEqual(ProductDish.objects.for_user(user), [product_dish])
+        self.assertQuerySetEqual(MenuList.objects.for_user(user), [menu])
+        self.assertQuerySetEqual(MenuList.objects.for_user(other), [])
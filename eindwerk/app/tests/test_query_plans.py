@@ -0,0 +1,151 @@
+import re
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from ..models import (
+    Dish,
+    DishMenu,
+    MenuList,
+    Product,
+    ProductDish,
+    ProductShoppingList,
+    ShoppingList,
+    Unit,
+    User,
+    UserDish,
+    UserMenu,
+    UserProduct,
+)
+
+STATIC_STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+}
+
+# Tables that are small and global, reading them completely is expected.
+FULL_SCAN_ALLOWED = {"app_unit"}
+
+
+class QueryRecorder:
+    """Execute wrapper that keeps the SQL and parameters of every SELECT of the app tables."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        if sql.lstrip().upper().startswith("SELECT") and '"app_' in sql:
+            self.queries.append((sql, params))
+        return execute(sql, params, many, context)
+
+
+def full_scans(sql, params):
+    """Return the app tables that the database reads without using an index."""
+
+    with connection.cursor() as cursor:
+        if connection.vendor == "sqlite":
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+            plan = [row[-1] for row in cursor.fetchall()]
+            pattern = re.compile(r"^SCAN (app_\w+)\b")
+        else:
+            cursor.execute(f"EXPLAIN {sql}", params)
+            plan = [row[0] for row in cursor.fetchall()]
+            pattern = re.compile(r"Seq Scan on (app_\w+)")
+
+    tables = {match.group(1) for line in plan if (match := pattern.search(line.strip(" -|`>")))}
+    return tables - FULL_SCAN_ALLOWED
+
+
+@override_settings(STORAGES=STATIC_STORAGES)
+class QueryPlanTest(TestCase):
+    """Run EXPLAIN on every query the read views issue and fail on full table scans.
+
+    SQLite and PostgreSQL only pick an index when the table is big enough, therefore
+    a few users with a realistic amount of data are created.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        units = Unit.objects.bulk_create(
+            [Unit(name="Gram", abbreviation="g"), Unit(name="Stuk", abbreviation="st")]
+        )
+        products = Product.objects.bulk_create(
+            [Product(name=f"Product {i}") for i in range(300)]
+        )
+        for u in range(5):
+            user = User.objects.create_user(username=f"user{u}", password="testpassword")
+            UserProduct.objects.bulk_create(
+                [UserProduct(user=user, product=product) for product in products[u * 60:(u + 1) * 60]]
+            )
+            dishes = Dish.objects.bulk_create(
+                [Dish(name=f"Gerecht {u}-{i}", recipe="", user=user) for i in range(60)]
+            )
+            UserDish.objects.bulk_create([UserDish(user=user, dish=dish) for dish in dishes])
+            ProductDish.objects.bulk_create(
+                [
+                    ProductDish(
+                        dish=dish,
+                        product=products[(i * 7 + j) % len(products)],
+                        unit=units[j % 2],
+                        quantity=j + 1,
+                    )
+                    for i, dish in enumerate(dishes)
+                    for j in range(6)
+                ]
+            )
+            menus = MenuList.objects.bulk_create(
+                [MenuList(name=f"Menu {u}-{i}", user=user) for i in range(10)]
+            )
+            UserMenu.objects.bulk_create([UserMenu(user=user, menu=menu) for menu in menus])
+            DishMenu.objects.bulk_create(
+                [DishMenu(menu=menu, dish=dishes[(i * 3 + j) % 60]) for i, menu in enumerate(menus) for j in range(7)]
+            )
+            shoppinglists = ShoppingList.objects.bulk_create([ShoppingList(user=user) for _ in range(10)])
+            product_dishes = list(ProductDish.objects.filter(dish__user=user)[:40])
+            ProductShoppingList.objects.bulk_create(
+                [
+                    ProductShoppingList(shoppinglist=shoppinglist, product_dish=product_dish, quantity=1)
+                    for shoppinglist in shoppinglists
+                    for product_dish in product_dishes
+                ]
+            )
+        cls.user = User.objects.get(username="user2")
+        with connection.cursor() as cursor:
+            # Let the planner know the table sizes.
+            cursor.execute("ANALYZE")
+
+    def urls(self):
+        dish = Dish.objects.for_user(self.user).first()
+        menu = MenuList.objects.for_user(self.user).first()
+        shoppinglist = ShoppingList.objects.for_user(self.user).first()
+        product_dish = ProductDish.objects.for_user(self.user).first()
+        item = ProductShoppingList.objects.for_user(self.user).first()
+        return [
+            reverse("dish_list"),
+            reverse("dish_detail", kwargs={"pk": dish.pk}),
+            reverse("dish_update", kwargs={"pk": dish.pk}),
+            reverse("dish_delete", kwargs={"pk": dish.pk}),
+            reverse("product_dish_update", kwargs={"pk": product_dish.pk}),
+            reverse("product_dish_delete", kwargs={"pk": product_dish.pk}),
+            reverse("menu_list"),
+            reverse("menu_detail", kwargs={"pk": menu.pk}),
+            reverse("menu_update", kwargs={"pk": menu.pk}),
+            reverse("menu_delete", kwargs={"pk": menu.pk}),
+            reverse("shoppinglist"),
+            reverse("shoppinglist_detail", kwargs={"pk": shoppinglist.pk}),
+            reverse("shoppinglist_delete", kwargs={"pk": shoppinglist.pk}),
+            reverse("update_product_shoppinglist", kwargs={"pk": item.pk}),
+            reverse("delete_product_shoppinglist", kwargs={"pk": item.pk}),
+            reverse("unit_list"),
+        ]
+
+    def test_views_do_not_scan_full_tables(self):
+        self.client.force_login(self.user)
+        for url in self.urls():
+            recorder = QueryRecorder()
+            with self.subTest(url=url), connection.execute_wrapper(recorder):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                for sql, params in recorder.queries:
+                    self.assertEqual(full_scans(sql, params), set(), sql)
@@ -0,0 +1,110 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+
+from ...models import Dish, Product, ProductDish, User, UserProduct
+from ...services.autocomplete_services import (
+    SNAPSHOT_KEY,
+    ProductNameIndex,
+    product_feed,
+    product_index,
+    products_bulk_saved,
+    products_saved,
+    suggest_product_names,
+)
+
+
+class AutocompleteTestMixin:
+    def setUp(self):
+        cache.clear()
+        product_index.reset()
+
+
+class SuggestProductNamesTest(AutocompleteTestMixin, TestCase):
+    """Test the product name suggestions of a user."""
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username="testuser", password="testpassword")
+        for name in ["Bloem", "Bloemkool", "Boter", "Bladerdeeg", "Ei"]:
+            Product.objects.create(name=name)
+
+    def test_prefix_is_case_insensitive(self):
+        self.assertEqual(suggest_product_names(self.user, "BLOE"), ["Bloem", "Bloemkool"])
+        self.assertEqual(suggest_product_names(self.user, " "), [])
+
+    def test_products_of_the_user_come_first_by_usage(self):
+        """Test that the most used product of the user is suggested first."""
+        dish = Dish.objects.create(name="Soep", recipe="", user=self.user)
+        bloemkool = Product.objects.get(name="Bloemkool")
+        UserProduct.objects.create(user=self.user, product=bloemkool)
+        UserProduct.objects.create(user=self.user, product=Product.objects.get(name="Bladerdeeg"))
+        ProductDish.objects.create(dish=dish, product=bloemkool, quantity=1)
+
+        self.assertEqual(
+            suggest_product_names(self.user, "b"), ["Bloemkool", "Bladerdeeg", "Bloem", "Boter"]
+        )
+
+    def test_index_follows_product_changes(self):
+        """Test that created, renamed and deleted products are seen without rebuilding the index."""
+        suggest_product_names(self.user, "b")
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.create(name="Bonen")
+            boter = Product.objects.get(name="Boter")
+            boter.name = "Roomboter"
+            boter.save()
+            Product.objects.get(name="Bladerdeeg").delete()
+
+        with self.assertNumQueries(0):
+            # The usage of the user is cached and the index is not read again.
+            self.assertEqual(suggest_product_names(self.user, "b"), ["Bloem", "Bloemkool", "Bonen"])
+        self.assertEqual(suggest_product_names(self.user, "room"), ["Roomboter"])
+
+
+class ProductNameIndexSyncTest(AutocompleteTestMixin, TestCase):
+    """Test that two workers share their changes through the cache."""
+
+    def test_changes_reach_the_other_worker(self):
+        Product.objects.create(name="Bloem")
+        first, second = ProductNameIndex(), ProductNameIndex()
+        first.lookup("b")
+        with self.assertNumQueries(0):
+            # The second worker starts from the snapshot of the first.
+            self.assertEqual(second.lookup("b"), ["Bloem"])
+
+        boter = Product.objects.create(name="Boter")
+        # Published by another process: the second index is not told directly.
+        product_feed.followers.discard(second)
+        product_feed.publish(("save", boter.pk, boter.name))
+
+        with mock.patch.object(ProductNameIndex, "sync_interval", 0), self.assertNumQueries(0):
+            self.assertEqual(second.lookup("b"), ["Bloem", "Boter"])
+
+    def test_missing_changes_reload_the_index(self):
+        second = ProductNameIndex()
+        second.lookup("b")
+        product_feed.followers.discard(second)
+        with self.captureOnCommitCallbacks(execute=True):
+            products_saved([Product.objects.create(name="Bloem")])
+        cache.delete(product_feed.change_key.format(1))
+        cache.delete(SNAPSHOT_KEY)
+
+        with mock.patch.object(ProductNameIndex, "sync_interval", 0):
+            self.assertEqual(second.lookup("b"), ["Bloem"])
+
+    def test_bulk_save_reloads_the_index(self):
+        """Test that products created in bulk are published as one reload, also to the other workers."""
+        first, second = ProductNameIndex(), ProductNameIndex()
+        first.lookup("b")
+        second.lookup("b")
+        product_feed.followers.discard(second)
+        version = product_feed.version()
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.bulk_create([Product(name="Bloem"), Product(name="Boter")])
+            products_bulk_saved()
+        self.assertEqual(product_feed.version(), version + 1)
+
+        self.assertEqual(first.lookup("b"), ["Bloem", "Boter"])
+        with mock.patch.object(ProductNameIndex, "sync_interval", 0):
+            self.assertEqual(second.lookup("b"), ["Bloem", "Boter"])
@@ -0,0 +1,146 @@
+import threading
+import time
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+
+from ... import cache as tiered_backend
+from ...cache import LocalCache
+from ...models import User
+from ...services import cache_services
+from ...services.cache_services import (
+    LOCK_KEY,
+    cache_stats,
+    get_or_compute,
+    invalidate_user,
+    reset_cache_stats,
+    tiered_cache,
+    user_key,
+    user_version,
+)
+
+
+class LocalCacheTest(TestCase):
+    """Test the LRU cache of the process."""
+
+    def test_least_recently_used_entry_goes_first(self):
+        local = LocalCache(max_entries=2)
+        local.set("a", 1, 60)
+        local.set("b", 2, 60)
+        local.get("a")
+        local.set("c", 3, 60)
+        self.assertEqual([local.get(key) for key in ("a", "c")], [1, 3])
+        self.assertIs(local.get("b"), tiered_backend._missing)
+
+    def test_entry_expires(self):
+        local = LocalCache(max_entries=10)
+        local.set("a", [1], 60)
+        local.get("a").append(2)
+        self.assertEqual(local.get("a"), [1])
+        with mock.patch.object(tiered_backend.time, "monotonic", return_value=time.monotonic() + 61):
+            self.assertIs(local.get("a"), tiered_backend._missing)
+
+
+class TieredCacheTest(TestCase):
+    """Test the L1 in front of the shared cache, the user namespaces and the single flight."""
+
+    def setUp(self):
+        tiered_cache().clear()
+        reset_cache_stats()
+
+    def test_l1_is_filled_from_the_l2(self):
+        tiered = tiered_cache()
+        cache.set("soup", "<p>Soep</p>")
+        self.assertEqual(tiered.get("soup"), "<p>Soep</p>")
+        # Only a new version of a key reaches the other processes, their L1 keeps the old value.
+        cache.delete("soup")
+        self.assertEqual(tiered.get("soup"), "<p>Soep</p>")
+        self.assertIsNone(tiered.get("stew"))
+        self.assertEqual(
+            cache_stats(),
+            {
+                "l1": {"hits": 1, "misses": 2, "hit_rate": 33.3},
+                "l2": {"hits": 1, "misses": 1, "hit_rate": 50.0},
+            },
+        )
+
+    def test_invalidate_user_moves_all_keys_of_the_user(self):
+        tiered = tiered_cache()
+        tiered.set(user_key(1, "a"), "A")
+        tiered.set(user_key(1, "b"), "B")
+        tiered.set(user_key(2, "a"), "other user")
+
+        with mock.patch.object(cache_services.cache, "incr", wraps=cache.incr) as incr:
+            invalidate_user(1)
+        self.assertEqual(incr.call_count, 1)
+        self.assertIsNone(tiered.get(user_key(1, "a")))
+        self.assertIsNone(tiered.get(user_key(1, "b")))
+        self.assertEqual(tiered.get(user_key(2, "a")), "other user")
+
+    def test_lost_user_version_never_matches_an_old_key(self):
+        version = user_version(1)
+        cache.delete("user:version:1")
+        self.assertNotEqual(user_version(1), version)
+
+    def test_user_change_invalidates_but_login_does_not(self):
+        user = User.objects.create_user(username="testuser", password="testpassword")
+        version = user_version(user.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.force_login(user)
+        self.assertEqual(user_version(user.pk), version)
+        with self.captureOnCommitCallbacks(execute=True):
+            user.first_name = "Inias"
+            user.save()
+        self.assertNotEqual(user_version(user.pk), version)
+
+    def test_concurrent_misses_compute_once(self):
+        computed = []
+        start = threading.Barrier(8)
+        results = []
+
+        def compute():
+            computed.append(1)
+            time.sleep(0.05)
+            return "menu"
+
+        def request():
+            start.wait()
+            results.append(get_or_compute("menu:5:1", compute))
+
+        threads = [threading.Thread(target=request) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, ["menu"] * 8)
+        self.assertEqual(len(computed), 1)
+
+    def test_waits_for_another_process(self):
+        """Test that a value another process is computing is waited for instead of computed again."""
+        cache.add(LOCK_KEY.format("menu:5:1"), 1)
+
+        def other_process():
+            cache.set("menu:5:1", "menu")
+            cache.delete(LOCK_KEY.format("menu:5:1"))
+
+        timer = threading.Timer(0.1, other_process)
+        timer.start()
+        self.assertEqual(get_or_compute("menu:5:1", lambda: "computed again"), "menu")
+        timer.join()
+
+    def test_slow_process_keeps_its_lock(self):
+        """Test that the wait is bounded and the lock of the other process is not released."""
+        cache.add(LOCK_KEY.format("menu:5:1"), "other process")
+        with mock.patch.object(cache_services, "LOCK_WAIT", 0.1):
+            self.assertEqual(get_or_compute("menu:5:1", lambda: "menu"), "menu")
+        self.assertEqual(cache.get(LOCK_KEY.format("menu:5:1")), "other process")
+
+    def test_cache_stats_command(self):
+        tiered_cache().get("soup")
+        out = StringIO()
+        call_command("cache_stats", "--reset", stdout=out)
+        self.assertIn("l1", out.getvalue())
+        self.assertEqual(cache_stats()["l1"]["misses"], 0)
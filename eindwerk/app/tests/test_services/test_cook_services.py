@@ -0,0 +1,89 @@
+from unittest import mock
+
+from django.test import TestCase
+
+from ...models import Dish, Product, ProductDish, User
+from ...services import cook_services
+from ...services.cook_services import UserCookIndex, cook_index, what_can_i_cook
+
+
+class UserCookIndexTest(TestCase):
+    """Test the ranking of the bitset index without the database."""
+
+    def setUp(self):
+        self.index = UserCookIndex()
+        self.index.add(1, "Pannenkoeken", {10: "Bloem", 11: "Ei", 12: "Melk"})
+        self.index.add(2, "Omelet", {11: "Ei"})
+        self.index.add(3, "Soep", {13: "Prei", 14: "Aardappel"})
+
+    def test_fewest_missing_first(self):
+        results = self.index.rank([11, 12])
+        self.assertEqual([result["name"] for result in results], ["Omelet", "Pannenkoeken"])
+        self.assertEqual(
+            (results[1]["covered"], results[1]["needed"], results[1]["coverage"], results[1]["missing"]),
+            (2, 3, 67, ["Bloem"]),
+        )
+
+    def test_removed_dish_frees_its_position(self):
+        self.index.remove(2)
+        self.index.add(4, "Gekookt ei", {11: "Ei"})
+
+        self.assertEqual(self.index.positions[4], 1)
+        self.assertEqual([result["name"] for result in self.index.rank([11])], ["Gekookt ei", "Pannenkoeken"])
+        self.assertEqual(self.index.rank([13, 99])[0]["missing"], ["Aardappel"])
+
+
+class WhatCanICookTest(TestCase):
+    """Test that the index of a user follows the changes of the ingredients."""
+
+    def setUp(self):
+        cook_index.reset()
+        self.user = User.objects.create_user(username="testuser", password="testpassword")
+        self.egg = Product.objects.create(name="Ei")
+        self.milk = Product.objects.create(name="Melk")
+        self.omelet = Dish.objects.create(name="Omelet", recipe="", user=self.user)
+        ProductDish.objects.create(dish=self.omelet, product=self.egg, quantity=2)
+        other = User.objects.create_user(username="other", password="testpassword")
+        other_dish = Dish.objects.create(name="Eitje", recipe="", user=other)
+        ProductDish.objects.create(dish=other_dish, product=self.egg, quantity=1)
+
+    def names(self, products):
+        return [result["name"] for result in what_can_i_cook(self.user, [product.pk for product in products])]
+
+    def test_only_dishes_of_the_user(self):
+        self.assertEqual(self.names([self.egg]), ["Omelet"])
+
+    def test_follows_ingredient_changes(self):
+        """Test that new and deleted ingredients are seen with one query for the changed dish."""
+        self.names([self.egg])
+        with self.captureOnCommitCallbacks(execute=True):
+            product_dish = ProductDish.objects.create(dish=self.omelet, product=self.milk, quantity=1)
+
+        with self.assertNumQueries(1):
+            results = what_can_i_cook(self.user, [self.egg.pk])
+        self.assertEqual(results[0]["missing"], ["Melk"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            product_dish.delete()
+        self.assertEqual(what_can_i_cook(self.user, [self.egg.pk])[0]["missing"], [])
+
+    def test_answers_without_queries(self):
+        self.names([self.egg])
+        with self.assertNumQueries(0):
+            self.names([self.egg, self.milk])
+
+    def test_least_recently_used_index_goes_first(self):
+        other = User.objects.get(username="other")
+        with mock.patch.object(cook_services, "MAX_USERS", 1):
+            self.names([self.egg])
+            what_can_i_cook(other, [self.egg.pk])
+        self.assertEqual(list(cook_index.users), [other.pk])
+        self.assertNotIn(self.omelet.pk, cook_index.dish_users)
+
+    def test_idle_index_is_dropped(self):
+        self.names([self.egg])
+        later = cook_services.time.monotonic() + cook_services.IDLE_TIMEOUT + 1
+        with mock.patch.object(cook_services.time, "monotonic", return_value=later):
+            what_can_i_cook(User.objects.get(username="other"), [self.egg.pk])
+        self.assertNotIn(self.user.pk, cook_index.users)
+        self.assertEqual(self.names([self.egg]), ["Omelet"])
@@ -0,0 +1,58 @@
+from django.core.management import call_command
+from django.test import TestCase
+
+from ...models import Dish, Product, ProductDish, Unit
+from ...services.dish_services import rebuild_ingredient_summaries
+
+
+class IngredientSummaryTest(TestCase):
+    """Test that Dish.ingredient_summary follows the changes of its products."""
+
+    def setUp(self):
+        self.gram = Unit.objects.create(name="Gram", abbreviation="g")
+        self.dish = Dish.objects.create(name="Pannenkoeken", recipe="")
+        self.flour = Product.objects.create(name="Bloem")
+
+    def test_summary_follows_product_dish_changes(self):
+        """Test creating, updating and deleting a ProductDish."""
+        product_dish = ProductDish.objects.create(
+            dish=self.dish, product=self.flour, quantity=250, unit=self.gram
+        )
+        self.dish.refresh_from_db()
+        self.assertEqual(
+            self.dish.ingredient_summary,
+            [{"id": product_dish.pk, "name": "Bloem", "quantity": "250", "unit": "g"}],
+        )
+
+        product_dish.quantity = None
+        product_dish.save()
+        self.dish.refresh_from_db()
+        self.assertIsNone(self.dish.ingredient_summary[0]["quantity"])
+
+        product_dish.delete()
+        self.dish.refresh_from_db()
+        self.assertEqual(self.dish.ingredient_summary, [])
+
+    def test_summary_follows_unit_rename(self):
+        """Test that a changed abbreviation is shown in the summary."""
+        ProductDish.objects.create(dish=self.dish, product=self.flour, quantity=1, unit=self.gram)
+        self.gram.abbreviation = "gr"
+        self.gram.save()
+        self.dish.refresh_from_db()
+        self.assertEqual(self.dish.ingredient_summary[0]["unit"], "gr")
+
+    def test_rebuild_backfills_existing_rows(self):
+        """Test that the rebuild fixes summaries written without signals."""
+        ProductDish.objects.bulk_create(
+            [ProductDish(dish=self.dish, product=self.flour, quantity=2, unit=self.gram)]
+        )
+        self.assertEqual(Dish.objects.get().ingredient_summary, [])
+
+        call_command("rebuild_ingredient_summaries", stdout=open("/dev/null", "w"))
+        self.assertEqual(Dish.objects.get().ingredient_summary[0]["name"], "Bloem")
+
+    def test_rebuild_query_count_is_per_batch(self):
+        """Test that rebuilding does not query per dish."""
+        Dish.objects.bulk_create([Dish(name=f"Gerecht {i}", recipe="") for i in range(30)])
+        with self.assertNumQueries(3):
+            rebuild_ingredient_summaries()
@@ -0,0 +1,126 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ...models import (
+    Dish,
+    DishMenu,
+    MenuList,
+    Product,
+    ProductDish,
+    ProductShoppingList,
+    ShoppingList,
+    Unit,
+    User,
+)
+from ...services.fragment_services import fragment_stats, get_or_render, get_version
+from ..test_views.test_dish_views import STATIC_STORAGES
+
+
+class FragmentCacheTest(TestCase):
+    """Test the versioned fragments and their counters."""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_fragment_is_rendered_once_per_user_and_version(self):
+        renders = []
+
+        def render():
+            renders.append(1)
+            return "<p>Soep</p>"
+
+        for user_id in (1, 1, 2):
+            self.assertEqual(get_or_render("dish-card", "dish", 5, user_id, render), "<p>Soep</p>")
+        self.assertEqual(len(renders), 2)
+        self.assertEqual(fragment_stats()["dish-card"], {"hits": 1, "misses": 2, "hit_rate": 33.3})
+
+    def test_lost_version_never_matches_an_old_fragment(self):
+        """Test that a version removed from the cache does not bring old fragments back."""
+        version = get_version("dish", 5)
+        cache.delete("fragment:version:dish:5")
+        self.assertNotEqual(get_version("dish", 5), version)
+
+
+@override_settings(STORAGES=STATIC_STORAGES)
+class FragmentInvalidationTest(TestCase):
+    """Test that the signals invalidate exactly the fragments that show the changed object."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="testuser", password="testpassword")
+        self.client.force_login(self.user)
+        self.gram = Unit.objects.create(name="Gram", abbreviation="g")
+        self.piece = Unit.objects.create(name="Stuk", abbreviation="st")
+        self.soup = Dish.objects.create(name="Soep", recipe="", user=self.user)
+        self.cake = Dish.objects.create(name="Cake", recipe="", user=self.user)
+        self.flour = Product.objects.create(name="Bloem")
+        self.egg = Product.objects.create(name="Ei")
+        with self.captureOnCommitCallbacks(execute=True):
+            ProductDish.objects.create(dish=self.soup, product=self.flour, quantity=100, unit=self.gram)
+            ProductDish.objects.create(dish=self.cake, product=self.egg, quantity=2, unit=self.piece)
+
+    def versions(self):
+        return get_version("dish", self.soup.pk), get_version("dish", self.cake.pk)
+
+    def test_cached_dish_list_is_served_from_the_cache(self):
+        self.client.get(reverse("dish_list"))
+        self.client.get(reverse("dish_list"))
+        self.assertEqual(fragment_stats()["dish-card"]["hits"], 2)
+
+    def cache_queries(self, url):
+        """The queries of a request on the table of the db cache."""
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        return len([query for query in queries if "app_cache" in query["sql"]])
+
+    def test_cache_queries_do_not_grow_with_the_list(self):
+        """Test that the versions of all cards are read at once and the counters are written once."""
+        db_cache = {"BACKEND": "django.core.cache.backends.db.DatabaseCache", "LOCATION": "app_cache"}
+        with self.settings(CACHES={**settings.CACHES, "default": db_cache}):
+            call_command("createcachetable", verbosity=0)
+            # Fill the fragments and create the counters first, then both pages only read and count.
+            for _ in range(2):
+                self.client.get(reverse("dish_list"))
+            small = self.cache_queries(reverse("dish_list"))
+            for number in range(10):
+                Dish.objects.create(name=f"Gerecht {number}", recipe="", user=self.user)
+            self.client.get(reverse("dish_list"))
+            self.assertEqual(self.cache_queries(reverse("dish_list")), small)
+
+    def test_ingredient_change_invalidates_only_its_dish(self):
+        soup, cake = self.versions()
+        with self.captureOnCommitCallbacks(execute=True):
+            ProductDish.objects.create(dish=self.soup, product=self.egg, quantity=1, unit=self.piece)
+        self.assertEqual(self.versions(), (soup + 1, cake))
+
+    def test_unit_rename_invalidates_only_the_dishes_using_it(self):
+        """Test that a renamed unit reaches the dishes with that unit, but no shopping lists."""
+        shoppinglist = ShoppingList.objects.create(user=self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            ProductShoppingList.objects.create(
+                shoppinglist=shoppinglist, product_name="Bloem", unit_abbreviation="g", quantity=1
+            )
+        soup, cake = self.versions()
+        shoppinglist_version = get_version("shoppinglist", shoppinglist.pk)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.gram.abbreviation = "gr"
+            self.gram.save()
+
+        self.assertEqual(self.versions(), (soup + 1, cake))
+        self.assertEqual(get_version("shoppinglist", shoppinglist.pk), shoppinglist_version)
+
+    def test_menu_card_follows_its_dishes(self):
+        menu = MenuList.objects.create(name="Week", user=self.user)
+        version = get_version("menu", menu.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            DishMenu.objects.create(menu=menu, dish=self.soup)
+        self.assertEqual(get_version("menu", menu.pk), version + 1)
+
+        response = self.client.get(reverse("menu_list"))
+        self.assertContains(response, "Aantal gerechten: 1")
@@ -0,0 +1,175 @@
+import threading
+import time
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import IntegrityError, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from ...models import Job, User
+from ...services import job_services
+from ...services.job_services import JobError, claim_job, enqueue, run_job, task, work
+
+calls = []
+
+
+@task("test_add")
+def add(job, a, b):
+    job.report(50, "Halfweg")
+    calls.append((a, b))
+    return {"sum": a + b}
+
+
+@task("test_flaky", max_attempts=2)
+def flaky(job):
+    calls.append(job.attempts)
+    if job.attempts < 2:
+        raise ValueError("Nog niet.")
+    return "ok"
+
+
+@task("test_broken", max_attempts=5)
+def broken(job):
+    raise JobError("Dit lukt nooit.")
+
+
+@override_settings(JOBS_RUN_INLINE=False, JOB_RETRY_DELAY=10, JOB_TIMEOUT=60)
+class JobQueueTest(TestCase):
+    """Test queueing, claiming and running background jobs."""
+
+    def setUp(self):
+        calls.clear()
+        self.user = User.objects.create_user(username="testuser", password="testpassword")
+
+    def test_run_a_job(self):
+        job = enqueue("test_add", user=self.user, a=1, b=2)
+        self.assertEqual(job.status, Job.QUEUED)
+
+        claimed = claim_job("worker-1")
+        self.assertEqual((claimed.pk, claimed.status, claimed.attempts), (job.pk, Job.RUNNING, 1))
+        self.assertIsNone(claim_job("worker-2"))
+
+        self.assertTrue(run_job(claimed))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.result, job.progress, job.message), (Job.DONE, {"sum": 3}, 100, "Halfweg"))
+
+    def test_same_job_is_queued_once(self):
+        first = enqueue("test_add", user=self.user, a=1, b=2)
+        self.assertEqual(enqueue("test_add", user=self.user, b=2, a=1), first)
+        self.assertNotEqual(enqueue("test_add", user=self.user, a=1, b=3), first)
+        self.assertNotEqual(enqueue("test_add", a=1, b=2), first)
+
+    def test_key_of_an_unfinished_job_is_unique(self):
+        """Test that two requests that queue the same job at once can't both create it."""
+        first = enqueue("test_add", user=self.user, a=1, b=2)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Job.objects.create(task="test_add", key=first.key)
+        self.assertEqual(enqueue("test_add", user=self.user, a=1, b=2), first)
+        self.assertEqual(Job.objects.count(), 1)
+
+    def test_finished_job_is_queued_again(self):
+        first = enqueue("test_add", user=self.user, a=1, b=2)
+        run_job(claim_job("worker"))
+        self.assertNotEqual(enqueue("test_add", user=self.user, a=1, b=2), first)
+
+    def test_failed_attempt_is_retried_later(self):
+        job = enqueue("test_flaky")
+        with self.assertLogs("app.jobs", "ERROR"):
+            self.assertFalse(run_job(claim_job("worker")))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertIn("Nog niet.", job.error)
+        self.assertGreater(job.run_after, timezone.now() + timedelta(seconds=5))
+        self.assertIsNone(claim_job("worker"))
+
+        with mock.patch.object(job_services.timezone, "now", return_value=job.run_after):
+            self.assertTrue(run_job(claim_job("worker")))
+        self.assertEqual(calls, [1, 2])
+
+    def test_job_error_is_not_retried(self):
+        job = enqueue("test_broken")
+        with self.assertLogs("app.jobs", "ERROR"):
+            run_job(claim_job("worker"))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 1))
+        self.assertIsNotNone(job.finished)
+
+    def test_job_of_a_dead_worker_is_claimed_again(self):
+        job = enqueue("test_add", a=1, b=1)
+        claim_job("worker-1")
+        Job.objects.filter(pk=job.pk).update(heartbeat=timezone.now() - timedelta(seconds=61))
+        claimed = claim_job("worker-2")
+        self.assertEqual((claimed.worker, claimed.attempts), ("worker-2", 2))
+
+    def test_inline_jobs_run_right_away(self):
+        with self.settings(JOBS_RUN_INLINE=True), self.assertLogs("app.jobs", "ERROR"):
+            job = enqueue("test_flaky")
+        self.assertEqual((job.status, job.result, job.attempts), (Job.DONE, "ok", 2))
+
+    def test_inline_job_bookkeeping(self):
+        """Test that an inline job is created claimed and finished with one write, its progress isn't stored."""
+        with self.settings(JOBS_RUN_INLINE=True), self.assertNumQueries(4):
+            job = enqueue("test_add", a=1, b=2)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.message, job.result), (Job.DONE, 1, "", {"sum": 3}))
+
+    def test_unknown_task(self):
+        with self.assertRaises(JobError):
+            enqueue("does_not_exist")
+
+
+@task("test_slow")
+def slow(job):
+    time.sleep(0.5)
+    # The job has run longer than JOB_TIMEOUT, another worker must not take it over.
+    calls.append(claim_job("worker-2"))
+    return "ok"
+
+
+@override_settings(JOBS_RUN_INLINE=False, JOB_RETRY_DELAY=0)
+class WorkerTest(TransactionTestCase):
+    """Test that workers in several threads share the queue without running a job twice."""
+
+    def setUp(self):
+        calls.clear()
+
+    def test_no_job_runs_twice(self):
+        Job.objects.bulk_create(
+            [Job(task="test_add", arguments={"a": number, "b": 0}, key=str(number)) for number in range(20)]
+        )
+        stop = threading.Event()
+        threads = [
+            threading.Thread(target=work, args=(f"worker-{number}", stop), kwargs={"burst": True})
+            for number in range(4)
+        ]
+        with self.assertLogs("app.jobs", "INFO"):
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        # No job was run by two workers. The in-memory SQLite database of the tests refuses a write
+        # while another connection writes ("table is locked") instead of waiting. A job hit by that is
+        # tried again, or when its last write failed, left running for another worker after JOB_TIMEOUT.
+        ran = [a for a, b in calls]
+        self.assertEqual(len(ran), len(set(ran)))
+        done = Job.objects.filter(status=Job.DONE).values_list("arguments__a", flat=True)
+        self.assertLessEqual(set(done), set(ran))
+        self.assertFalse(Job.objects.filter(status=Job.QUEUED).exists())
+
+    def test_long_job_keeps_its_heartbeat(self):
+        job = Job.objects.create(task="test_slow", key="slow")
+        with self.settings(JOB_TIMEOUT=0.3):
+            self.assertTrue(run_job(claim_job("worker-1")))
+        self.assertEqual(calls, [None])
+        job.refresh_from_db()
+        self.assertEqual((job.worker, job.attempts, job.result), ("worker-1", 1, "ok"))
+
+    def test_run_worker_command(self):
+        Job.objects.create(task="test_add", arguments={"a": 2, "b": 3}, key="command")
+        with self.assertLogs("app.jobs", "INFO"):
+            call_command("run_worker", "--burst", "--threads", "1", stdout=StringIO())
+        self.assertEqual(Job.objects.get().result, {"sum": 5})
@@ -0,0 +1,83 @@
+from unittest import mock
+
+from django.db.models.query import QuerySet
+from django.template import Context, Template
+from django.test import TestCase
+from django.test.runner import DiscoverRunner
+
+from ...models import Dish, Product, ProductDish, User
+from ...services.nplusone_services import LazyLoadError, detect_repeated_queries, strict_lazy_loading
+from ..runner import StrictLazyLoadingTestRunner
+
+
+class NPlusOneTest(TestCase):
+    """Test the repeated query detector and the strict lazy loading mode."""
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(username="testuser", password="testpassword")
+        for name in ("Soep", "Stoofpot", "Taart"):
+            dish = Dish.objects.create(name=name, recipe="", user=user)
+            ProductDish.objects.create(dish=dish, product=Product.objects.create(name=f"Product {name}"))
+
+    def test_repeats_are_reported_with_template_line(self):
+        template = Template("{% for item in items %}\n{{ item.product.name }}\n{% endfor %}")
+        with strict_lazy_loading(False), detect_repeated_queries(threshold=3) as detector:
+            template.render(Context({"items": ProductDish.objects.all()}))
+
+        [(count, sql, location)] = detector.repeated()
+        self.assertEqual(count, 3)
+        self.assertIn('FROM "app_product"', sql)
+        self.assertIn("line 2", location)
+        self.assertIn("3x", detector.report())
+
+    def test_strict_mode_raises_for_objects_from_a_list(self):
+        with strict_lazy_loading():
+            items = list(ProductDish.objects.all())
+            with self.assertRaises(LazyLoadError):
+                items[0].product
+            dishes = list(Dish.objects.all())
+            with self.assertRaises(LazyLoadError):
+                list(dishes[0].productdish_set.all())
+
+    def test_strict_mode_allows_loaded_relations_and_single_objects(self):
+        with strict_lazy_loading():
+            items = list(ProductDish.objects.select_related("dish"))
+            self.assertTrue(items[0].dish.name)
+            self.assertTrue(ProductDish.objects.first().product.name)
+            dishes = list(Dish.objects.prefetch_related("productdish_set"))
+            self.assertEqual(len(dishes[0].productdish_set.all()), 1)
+
+    def test_strict_mode_raises_for_relation_of_select_related_object(self):
+        with strict_lazy_loading():
+            items = list(ProductDish.objects.select_related("dish"))
+            with self.assertRaises(LazyLoadError):
+                items[0].dish.user
+
+    def test_strict_mode_nests(self):
+        with strict_lazy_loading():
+            items = list(ProductDish.objects.all())
+            with strict_lazy_loading(False):
+                self.assertTrue(items[0].product.name)
+                with strict_lazy_loading():
+                    with self.assertRaises(LazyLoadError):
+                        items[1].product
+                self.assertTrue(items[1].product.name)
+            with self.assertRaises(LazyLoadError):
+                items[2].product
+
+    def test_strict_mode_is_undone_after_the_run(self):
+        """Test that the test runner restores the Django methods and turns strict mode off at the end."""
+        runner = StrictLazyLoadingTestRunner()
+        with (
+            mock.patch.object(DiscoverRunner, "setup_test_environment"),
+            mock.patch.object(DiscoverRunner, "teardown_test_environment"),
+        ):
+            runner.teardown_test_environment()
+            try:
+                self.assertEqual(QuerySet._fetch_all.__module__, "django.db.models.query")
+                items = list(ProductDish.objects.all())
+                self.assertTrue(items[0].product.name)
+            finally:
+                runner.setup_test_environment()
+        self.assertNotEqual(QuerySet._fetch_all.__module__, "django.db.models.query")
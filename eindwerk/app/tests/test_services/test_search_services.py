@@ -0,0 +1,92 @@
+from django.test import TestCase
+
+from ...models import Dish, Product, ProductDish, User
+from ...services.feed_services import dishes_changed
+from ...services.search_services import (
+    InvertedIndex,
+    SqliteSearchBackend,
+    get_search_backend,
+    search_dishes,
+)
+
+
+class SearchBackendTestMixin:
+    """The same tests run against every backend that can run on the test database."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="testpassword")
+        self.other = User.objects.create_user(username="other", password="testpassword")
+        self.pancakes = self.add_dish("Pannenkoeken", "Bak in een pan.", ["Bloem", "Ei"])
+        self.cake = self.add_dish("Cake", "Meng de pannenkoekenmix niet.", ["Bloem", "Boter"])
+        self.add_dish("Crème brûlée", "Karamelliseer de suiker.", ["Room"])
+        self.add_dish("Pannenkoeken van een ander", "", ["Bloem"], user=self.other)
+
+    def add_dish(self, name, recipe, products, user=None):
+        dish = Dish.objects.create(name=name, recipe=recipe, user=user or self.user)
+        for product_name in products:
+            product, created = Product.objects.get_or_create(name=product_name)
+            ProductDish.objects.create(dish=dish, product=product, quantity=1)
+        return dish
+
+    def search(self, query):
+        return [dish.name for dish in self.backend.search(self.user, query, 0, 25)]
+
+    def test_name_ranks_above_recipe(self):
+        """Test that a match in the name comes before a match in the recipe."""
+        self.assertEqual(self.search("pannenkoeken"), ["Pannenkoeken", "Cake"])
+
+    def test_every_word_must_match_as_prefix(self):
+        self.assertEqual(self.search("blo ei"), ["Pannenkoeken"])
+        self.assertEqual(sorted(self.search("bloem")), ["Cake", "Pannenkoeken"])
+
+    def test_accents_are_ignored(self):
+        self.assertEqual(self.search("creme brulee"), ["Crème brûlée"])
+
+    def test_only_dishes_of_the_user(self):
+        self.assertNotIn("Pannenkoeken van een ander", self.search("pannenkoeken"))
+
+    def test_index_follows_changes(self):
+        """Test that renamed products, changed dishes and deleted dishes are found correctly."""
+        Product.objects.filter(name="Boter").update(name="Margarine")
+        Product.objects.get(name="Margarine").save()
+        cake = Dish.objects.get(pk=self.cake.pk)
+        cake.name = "Taart"
+        cake.save()
+        self.pancakes.delete()
+
+        self.assertEqual(self.search("margarine"), ["Taart"])
+        self.assertEqual(self.search("ei"), [])
+
+
+class SqliteSearchBackendTest(SearchBackendTestMixin, TestCase):
+    def setUp(self):
+        self.backend = get_search_backend()
+        if not isinstance(self.backend, SqliteSearchBackend):
+            self.skipTest("The test database has no FTS5 index.")
+        super().setUp()
+
+
+class InvertedIndexTest(SearchBackendTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.backend = InvertedIndex()
+
+    def test_only_changed_dishes_are_read_again(self):
+        self.search("cake")
+        with self.captureOnCommitCallbacks(execute=True):
+            dishes_changed([self.cake.pk])
+        with self.assertNumQueries(2):
+            # One select for the changed dish, one for the results.
+            self.search("cake")
+
+
+class SearchDishesTest(TestCase):
+    def test_pages(self):
+        user = User.objects.create_user(username="testuser", password="testpassword")
+        Dish.objects.bulk_create([Dish(name=f"Soep {i:02}", recipe="", user=user) for i in range(30)])
+
+        first, has_next = search_dishes(user, "soep", page=1)
+        second, has_more = search_dishes(user, "soep", page=2)
+
+        self.assertEqual((len(first), has_next, len(second), has_more), (25, True, 5, False))
+        self.assertFalse({dish.pk for dish in first} & {dish.pk for dish in second})
@@ -0,0 +1,80 @@
+from django.core.cache import cache
+from django.db.models import F
+from django.test import TestCase
+
+from ...models import Dish, DishMenu, MenuList, ProductDish, ProductShoppingList, ShoppingList, User
+from ...services.autocomplete_services import product_feed
+from ...services.seed_services import DataSeeder, batched
+from ...services.shoplist_services import menu_content_hash, recent_shoppinglist, shopping_list_items
+
+
+class DataSeederTest(TestCase):
+    """Test the generated data set, with a batch size that is smaller than the data."""
+
+    def seed(self, prefix="seed", seed=1, **kwargs):
+        options = dict(users=3, dishes=4, ingredients=3, products=12, menus=2, dishes_per_menu=2, shoppinglists=1)
+        options.update(kwargs)
+        return DataSeeder(seed=seed, batch_size=5, prefix=prefix, **options).run()
+
+    def setUp(self):
+        cache.clear()
+
+    def test_counts(self):
+        counts = self.seed()
+        self.assertEqual(User.objects.count(), 3)
+        self.assertEqual(Dish.objects.count(), 12)
+        self.assertEqual(ProductDish.objects.count(), 36)
+        self.assertEqual(MenuList.objects.count(), 6)
+        self.assertEqual(DishMenu.objects.count(), 12)
+        self.assertEqual(ShoppingList.objects.count(), 3)
+        self.assertEqual(counts["ProductShoppingList"], ProductShoppingList.objects.count())
+
+    def test_shopping_lists_are_made_like_the_app_makes_them(self):
+        """Test that a seeded list has the hash and converted totals of its menu, so it is reused."""
+        self.seed()
+        for shoppinglist in ShoppingList.objects.select_related("user"):
+            # shoppinglists=1: the list of the first menu of the user.
+            menu = MenuList.objects.filter(user=shoppinglist.user).order_by("pk").first()
+            self.assertEqual(shoppinglist.content_hash, menu_content_hash(menu))
+            self.assertEqual(recent_shoppinglist(menu, shoppinglist.user)[0], shoppinglist)
+            items = ProductShoppingList.objects.filter(shoppinglist=shoppinglist)
+            self.assertEqual(
+                sorted((item.product_id, item.quantity, item.unit_abbreviation) for item in shopping_list_items(menu)),
+                sorted(items.values_list("product_id", "quantity", "unit_abbreviation")),
+            )
+
+    def test_products_are_published_once(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.seed()
+        self.assertEqual(product_feed.version(), 1)
+
+    def test_dishes_have_their_summary_and_own_menus(self):
+        self.seed()
+        for dish in Dish.objects.prefetch_related("productdish_set"):
+            self.assertEqual(
+                sorted(item["id"] for item in dish.ingredient_summary),
+                sorted(product_dish.pk for product_dish in dish.productdish_set.all()),
+            )
+        self.assertFalse(DishMenu.objects.exclude(dish__user=F("menu__user")).exists())
+
+    def test_same_seed_gives_same_data(self):
+        self.seed(prefix="a")
+        self.seed(prefix="b")
+
+        def ingredients(prefix):
+            return [
+                (dish.name.split(" ", 1)[1], [item["name"] for item in dish.ingredient_summary])
+                for dish in Dish.objects.filter(name__startswith=f"{prefix} ").order_by("pk")
+            ]
+
+        self.assertEqual(ingredients("a"), ingredients("b"))
+
+    def test_popular_products_are_used_more(self):
+        self.seed(users=10, dishes=10, products=30, skew=1.5)
+        uses = {
+            name: ProductDish.objects.filter(product__name=name).count() for name in ("Tomaat", "Olijfolie")
+        }
+        self.assertGreater(uses["Tomaat"], uses["Olijfolie"])
+
+    def test_batched(self):
+        self.assertEqual(list(batched(range(5), 2)), [[0, 1], [2, 3], [4]])
@@ -0,0 +1,337 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from ...models import (
+    Dish,
+    DishMenu,
+    MenuList,
+    Product,
+    ProductDish,
+    ProductShoppingList,
+    ShoppingList,
+    Unit,
+    User,
+)
+from ...services.fragment_services import get_version
+from ...services.shoplist_services import (
+    checked_progress,
+    create_shoppinglist_from_menu,
+    dish_products_changed,
+    get_or_create_shoppinglist,
+    menu_content_hash,
+    menu_dish_changed,
+    set_checked,
+)
+
+
+class CreateShoppingListFromMenuTest(TestCase):
+    """Test the shopping list generation from a menu."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="testpassword")
+        self.gram = Unit.objects.create(name="Gram", abbreviation="g", dimension=Unit.MASS, factor=1)
+        self.kilogram = Unit.objects.create(name="Kilogram", abbreviation="kg", dimension=Unit.MASS, factor=1000)
+        self.piece = Unit.objects.create(name="Stuk", abbreviation="st", dimension=Unit.COUNT, factor=1)
+        self.pinch = Unit.objects.create(name="Mespunt", abbreviation="mpt")
+        self.flour = Product.objects.create(name="Bloem")
+        self.egg = Product.objects.create(name="Ei")
+        self.menu = MenuList.objects.create(name="Weekmenu")
+
+    def add_dish(self, name, ingredients):
+        dish = Dish.objects.create(name=name, recipe="")
+        for product, quantity, unit in ingredients:
+            ProductDish.objects.create(dish=dish, product=product, quantity=quantity, unit=unit)
+        DishMenu.objects.create(menu=self.menu, dish=dish)
+        return dish
+
+    def test_quantities_are_summed_per_product_and_unit(self):
+        """Test that the same product with the same unit ends up on one line."""
+        self.add_dish("Pannenkoeken", [(self.flour, 250, self.gram), (self.egg, 3, self.piece)])
+        self.add_dish("Cake", [(self.flour, 200, self.gram), (self.egg, None, self.piece)])
+
+        shoppinglist = create_shoppinglist_from_menu(self.menu, self.user)
+
+        totals = {
+            item.product_name: item.quantity
+            for item in shoppinglist.productshoppinglist_set.all()
+        }
+        self.assertEqual(totals, {"Bloem": Decimal("450"), "Ei": Decimal("3")})
+
+    def test_different_units_stay_separate(self):
+        """Test that a product with two different units gives two lines."""
+        self.add_dish("Brood", [(self.flour, 500, self.gram), (self.flour, 1, self.piece)])
+
+        shoppinglist = create_shoppinglist_from_menu(self.menu, self.user)
+
+        self.assertEqual(shoppinglist.productshoppinglist_set.count(), 2)
+
+    def test_query_count_does_not_grow_with_menu(self):
+        """Test that a big menu takes as many queries as a small one."""
+        self.add_dish("Pannenkoeken", [(self.flour, 250, self.gram)])
+        with self.assertNumQueries(6):
+            create_shoppinglist_from_menu(self.menu, self.user)
+
+        for i in range(20):
+            self.add_dish(f"Gerecht {i}", [(self.flour, 100, self.gram), (self.egg, 1, self.piece)])
+        with self.assertNumQueries(6):
+            create_shoppinglist_from_menu(self.menu, self.user)
+
+    def test_items_survive_deleting_the_dish(self):
+        """Test that the snapshot keeps an old shopping list readable."""
+        dish = self.add_dish("Brood", [(self.flour, 500, self.gram)])
+        shoppinglist = create_shoppinglist_from_menu(self.menu, self.user)
+
+        dish.delete()
+
+        item = shoppinglist.productshoppinglist_set.get()
+        self.assertEqual((item.product_name, item.unit_abbreviation), ("Bloem", "g"))
+        self.assertIsNone(item.product_dish)
+
+    def test_compatible_units_are_converted(self):
+        """Test that grams and kilograms are summed and shown in the most readable unit."""
+        self.add_dish("Brood", [(self.flour, 500, self.gram)])
+        self.add_dish("Cake", [(self.flour, 1, self.kilogram)])
+
+        item = create_shoppinglist_from_menu(self.menu, self.user).productshoppinglist_set.get()
+
+        self.assertEqual((item.quantity, item.unit_abbreviation, item.unit), (Decimal("1.5"), "kg", self.kilogram))
+
+    def test_bigger_unit_only_when_exact(self):
+        """Test that 1001 g is not rounded to 1.00 kg."""
+        self.add_dish("Brood", [(self.flour, 1, self.gram)])
+        self.add_dish("Cake", [(self.flour, 1, self.kilogram)])
+
+        item = create_shoppinglist_from_menu(self.menu, self.user).productshoppinglist_set.get()
+
+        self.assertEqual((item.quantity, item.unit_abbreviation), (Decimal("1001"), "g"))
+
+    def test_duplicate_units_are_merged(self):
+        """Test that two unit rows with the same dimension and factor end up on one line."""
+        other_gram = Unit.objects.create(name="gram", abbreviation="gr", dimension=Unit.MASS, factor=1)
+        self.add_dish("Brood", [(self.flour, 200, self.gram)])
+        self.add_dish("Cake", [(self.flour, 300, other_gram)])
+
+        item = create_shoppinglist_from_menu(self.menu, self.user).productshoppinglist_set.get()
+
+        self.assertEqual((item.quantity, item.unit_abbreviation), (Decimal("500"), "g"))
+
+    def test_units_without_conversion_are_kept_per_unit(self):
+        """Test that a unit without dimension is summed on its own line."""
+        self.add_dish("Soep", [(self.flour, 1, self.pinch), (self.flour, 100, self.gram)])
+        self.add_dish("Saus", [(self.flour, 2, self.pinch)])
+
+        items = create_shoppinglist_from_menu(self.menu, self.user).productshoppinglist_set.all()
+
+        self.assertEqual(
+            sorted((item.unit_abbreviation, item.quantity) for item in items),
+            [("g", Decimal("100")), ("mpt", Decimal("3"))],
+        )
+
+
+@override_settings(SHOPPINGLIST_REUSE_DAYS=7)
+class GetOrCreateShoppingListTest(TestCase):
+    """Test that a list with the same menu content is generated once."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="testpassword")
+        self.gram = Unit.objects.create(name="Gram", abbreviation="g", dimension=Unit.MASS, factor=1)
+        self.flour = Product.objects.create(name="Bloem")
+        self.menu = MenuList.objects.create(name="Weekmenu")
+        self.dish = Dish.objects.create(name="Brood", recipe="")
+        self.product_dish = ProductDish.objects.create(dish=self.dish, product=self.flour, quantity=500, unit=self.gram)
+        DishMenu.objects.create(menu=self.menu, dish=self.dish)
+
+    def test_same_content_gives_the_same_list(self):
+        first, created = get_or_create_shoppinglist(self.menu, self.user)
+        self.assertTrue(created)
+        with self.assertNumQueries(5):
+            self.assertEqual(get_or_create_shoppinglist(self.menu, self.user), (first, False))
+
+        # Another menu with the same dishes, like next week's copy of this menu.
+        other = MenuList.objects.create(name="Volgende week")
+        DishMenu.objects.create(menu=other, dish=self.dish)
+        self.assertEqual(get_or_create_shoppinglist(other, self.user), (first, False))
+
+    def test_changed_content_gives_a_new_list(self):
+        first, _ = get_or_create_shoppinglist(self.menu, self.user)
+        hashes = {menu_content_hash(self.menu)}
+        self.product_dish.quantity = 600
+        self.product_dish.save()
+        hashes.add(menu_content_hash(self.menu))
+        DishMenu.objects.create(menu=self.menu, dish=self.dish)
+        hashes.add(menu_content_hash(self.menu))
+        self.gram.abbreviation = "gr"
+        self.gram.save()
+        hashes.add(menu_content_hash(self.menu))
+        self.assertEqual(len(hashes), 4)
+
+        second, created = get_or_create_shoppinglist(self.menu, self.user)
+        self.assertTrue(created)
+        self.assertNotEqual(first, second)
+
+    def test_shopped_and_old_lists_are_not_reused(self):
+        first, _ = get_or_create_shoppinglist(self.menu, self.user)
+        ProductShoppingList.objects.filter(shoppinglist=first).update(checked=True)
+        second, created = get_or_create_shoppinglist(self.menu, self.user)
+        self.assertTrue(created)
+
+        ShoppingList.objects.filter(pk=second.pk).update(date=timezone.now() - timedelta(days=8))
+        self.assertTrue(get_or_create_shoppinglist(self.menu, self.user)[1])
+
+    def test_lists_are_per_user_and_link(self):
+        first, _ = get_or_create_shoppinglist(self.menu, self.user)
+        other_user = User.objects.create_user(username="other", password="testpassword")
+        self.assertTrue(get_or_create_shoppinglist(self.menu, other_user)[1])
+
+        linked, created = get_or_create_shoppinglist(self.menu, self.user, linked=True)
+        self.assertTrue(created)
+        self.assertEqual(get_or_create_shoppinglist(self.menu, self.user, linked=True), (linked, False))
+
+
+class LinkedShoppingListTest(TestCase):
+    """Test that a shopping list that follows its menu only updates the lines of a change."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="testuser", password="testpassword")
+        self.gram = Unit.objects.create(name="Gram", abbreviation="g", dimension=Unit.MASS, factor=1)
+        self.kilogram = Unit.objects.create(name="Kilogram", abbreviation="kg", dimension=Unit.MASS, factor=1000)
+        self.flour = Product.objects.create(name="Bloem")
+        self.egg = Product.objects.create(name="Ei")
+        self.milk = Product.objects.create(name="Melk")
+        self.menu = MenuList.objects.create(name="Weekmenu")
+        self.pancakes = self.dish("Pannenkoeken", [(self.flour, 250), (self.egg, 3)])
+        self.cake = self.dish("Cake", [(self.flour, 800)])
+        with self.captureOnCommitCallbacks(execute=True):
+            DishMenu.objects.create(menu=self.menu, dish=self.pancakes)
+        self.shoppinglist = create_shoppinglist_from_menu(self.menu, self.user, linked=True)
+
+    def dish(self, name, ingredients):
+        dish = Dish.objects.create(name=name, recipe="")
+        for product, quantity in ingredients:
+            ProductDish.objects.create(dish=dish, product=product, quantity=quantity, unit=self.gram)
+        return dish
+
+    def lines(self, shoppinglist=None):
+        return {
+            item.product_name: (item.quantity, item.unit_abbreviation)
+            for item in ProductShoppingList.objects.filter(shoppinglist=shoppinglist or self.shoppinglist)
+        }
+
+    def test_adding_and_removing_a_dish(self):
+        egg_line = ProductShoppingList.objects.get(product=self.egg)
+        with self.captureOnCommitCallbacks(execute=True):
+            dish_menu = DishMenu.objects.create(menu=self.menu, dish=self.cake)
+        self.assertEqual(self.lines(), {"Bloem": (Decimal("1.05"), "kg"), "Ei": (Decimal("3"), "g")})
+        # The line of a product that is not in the added dish is not written.
+        self.assertEqual(ProductShoppingList.objects.get(product=self.egg).pk, egg_line.pk)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            DishMenu.objects.filter(menu=self.menu, dish=self.pancakes).delete()
+        self.assertEqual(self.lines(), {"Bloem": (Decimal("800"), "g")})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            dish_menu.delete()
+        self.assertEqual(self.lines(), {})
+
+    def test_changed_quantity_and_product(self):
+        product_dish = ProductDish.objects.get(dish=self.pancakes, product=self.egg)
+        product_dish.quantity = 4
+        with self.captureOnCommitCallbacks(execute=True):
+            product_dish.save()
+        self.assertEqual(self.lines()["Ei"], (Decimal("4"), "g"))
+
+        product_dish = ProductDish.objects.get(pk=product_dish.pk)
+        product_dish.product = self.milk
+        with self.captureOnCommitCallbacks(execute=True):
+            product_dish.save()
+        self.assertEqual(self.lines(), {"Bloem": (Decimal("250"), "g"), "Melk": (Decimal("4"), "g")})
+
+    def test_manual_quantities_are_kept(self):
+        ProductShoppingList.objects.filter(product=self.flour).update(quantity=1, unit=self.kilogram, manual=True)
+        with self.captureOnCommitCallbacks(execute=True):
+            DishMenu.objects.create(menu=self.menu, dish=self.cake)
+            DishMenu.objects.filter(menu=self.menu, dish=self.pancakes).delete()
+        self.assertEqual(self.lines(), {"Bloem": (Decimal("1"), "g")})
+
+    def test_unlinked_lists_stay_the_same(self):
+        unlinked = create_shoppinglist_from_menu(self.menu, self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            DishMenu.objects.create(menu=self.menu, dish=self.cake)
+        self.assertEqual(self.lines(unlinked), {"Bloem": (Decimal("250"), "g"), "Ei": (Decimal("3"), "g")})
+        self.assertIsNone(unlinked.menu)
+
+    def test_query_count_does_not_grow_with_the_menu(self):
+        """Test that a change costs as many queries for a big menu as for a small one."""
+        with self.assertNumQueries(9):
+            menu_dish_changed(self.menu.pk, self.pancakes.pk)
+        for number in range(20):
+            product = Product.objects.create(name=f"Product {number}")
+            DishMenu.objects.create(menu=self.menu, dish=self.dish(f"Gerecht {number}", [(product, 1)]))
+        with self.assertNumQueries(9):
+            menu_dish_changed(self.menu.pk, self.pancakes.pk)
+
+    def test_one_query_without_linked_lists(self):
+        ShoppingList.objects.update(menu=None)
+        with self.assertNumQueries(1):
+            self.assertEqual(menu_dish_changed(self.menu.pk, self.pancakes.pk), 0)
+        with self.assertNumQueries(1):
+            self.assertEqual(dish_products_changed(self.pancakes.pk, [self.egg.pk]), 0)
+
+    def test_cached_table_is_invalidated(self):
+        version = get_version("shoppinglist", self.shoppinglist.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            DishMenu.objects.create(menu=self.menu, dish=self.cake)
+        self.assertNotEqual(get_version("shoppinglist", self.shoppinglist.pk), version)
+
+
+class SetCheckedTest(TestCase):
+    """Test ticking off the items of a shopping list."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="testuser", password="testpassword")
+        self.shoppinglist = ShoppingList.objects.create(user=self.user)
+        self.items = ProductShoppingList.objects.bulk_create(
+            [
+                ProductShoppingList(shoppinglist=self.shoppinglist, quantity=1, product_name=name, sort_key=name)
+                for name in ("bloem", "ei", "melk")
+            ]
+        )
+
+    def checked(self):
+        return list(ProductShoppingList.objects.filter(checked=True).values_list("product_name", flat=True))
+
+    def test_one_update_for_all_items(self):
+        flour, egg, milk = self.items
+        ProductShoppingList.objects.filter(pk=milk.pk).update(checked=True)
+        with self.assertNumQueries(1):
+            updated = set_checked(self.shoppinglist, [flour.pk, egg.pk], [milk.pk])
+        self.assertEqual(updated, 3)
+        self.assertEqual(self.checked(), ["bloem", "ei"])
+        self.assertEqual(checked_progress(self.shoppinglist), {"checked": 2, "total": 3})
+
+    def test_concurrent_changes_are_kept(self):
+        """Test that two people that tick different items don't undo each other."""
+        flour, egg, milk = self.items
+        set_checked(self.shoppinglist, [flour.pk], [])
+        # The second page still shows flour unticked, it only sends the item that was clicked there.
+        set_checked(self.shoppinglist, [egg.pk], [])
+        self.assertEqual(self.checked(), ["bloem", "ei"])
+
+    def test_items_of_other_lists_are_ignored(self):
+        other = ProductShoppingList.objects.create(
+            shoppinglist=ShoppingList.objects.create(user=self.user), quantity=1, product_name="zout"
+        )
+        self.assertEqual(set_checked(self.shoppinglist, [other.pk], []), 0)
+        self.assertEqual(self.checked(), [])
+
+    def test_cached_table_is_invalidated(self):
+        version = get_version("shoppinglist", self.shoppinglist.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            set_checked(self.shoppinglist, [self.items[0].pk], [])
+        self.assertNotEqual(get_version("shoppinglist", self.shoppinglist.pk), version)
@@ -0,0 +1,81 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from ...models import Dish, DishMenu, MenuList, ShoppingList, Unit, User, UserDish, UserMenu
+from ...views.dish_views import DishBodyView, DishDetailView, DishListView
+from ...views.menu_views import MenuDetailView, MenuListView
+from ...views.shoplist_views import ShoppingListDetailView
+from ...views.shoppinglist_views import ShoppingListListView
+from ...views.unit_views import UnitListView
+from .test_dish_views import STATIC_STORAGES
+
+
+@override_settings(STORAGES=STATIC_STORAGES)
+class AsyncViewTest(TestCase):
+    """Test the async read views through the ASGI handler (self.async_client)."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="testuser", password="testpassword")
+        self.other = User.objects.create_user(username="other", password="testpassword")
+        self.client.force_login(self.user)
+        self.dish = Dish.objects.create(name="Soep", recipe="Kook alles.", user=self.user)
+        UserDish.objects.create(user=self.user, dish=self.dish)
+        self.menu = MenuList.objects.create(name="Weekmenu", user=self.user)
+        UserMenu.objects.create(user=self.user, menu=self.menu)
+        DishMenu.objects.create(menu=self.menu, dish=self.dish)
+        self.shoppinglist = ShoppingList.objects.create(user=self.user)
+        Unit.objects.create(name="Gram", abbreviation="g")
+
+    async def test_views_are_async(self):
+        for view in (
+            DishListView,
+            DishBodyView,
+            DishDetailView,
+            MenuListView,
+            MenuDetailView,
+            ShoppingListListView,
+            ShoppingListDetailView,
+            UnitListView,
+        ):
+            self.assertTrue(view.view_is_async, view.__name__)
+
+    async def test_pages(self):
+        await self.async_client.aforce_login(self.user)
+        for url, text in (
+            (reverse("dish_list"), "Soep"),
+            (reverse("dish_detail", kwargs={"pk": self.dish.pk}), "Soep"),
+            (reverse("dish_body", kwargs={"pk": self.dish.pk}), "Kook alles."),
+            (reverse("menu_list"), "Weekmenu"),
+            (reverse("menu_detail", kwargs={"pk": self.menu.pk}), "Soep"),
+            (reverse("shoppinglist"), "testuser"),
+            (reverse("shoppinglist_detail", kwargs={"pk": self.shoppinglist.pk}), "Winkellijst"),
+            (reverse("unit_list"), "Gram"),
+        ):
+            response = await self.async_client.get(url)
+            self.assertContains(response, text, msg_prefix=url)
+
+    async def test_keyset_partial(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse("dish_list"), headers={"HX-Request": "true"})
+        self.assertTemplateUsed(response, "dish/partials/dish_rows.html")
+        self.assertIsNone(response.context["next_page_url"])
+
+    async def test_login_required(self):
+        response = await self.async_client.get(reverse("menu_detail", kwargs={"pk": self.menu.pk}))
+        self.assertEqual(response.status_code, 302)
+
+    async def test_objects_of_other_users(self):
+        await self.async_client.aforce_login(self.other)
+        response = await self.async_client.get(reverse("menu_detail", kwargs={"pk": self.menu.pk}))
+        self.assertEqual(response.status_code, 404)
+        response = await self.async_client.get(reverse("dish_detail", kwargs={"pk": self.dish.pk}))
+        self.assertEqual(response.status_code, 403)
+        response = await self.async_client.get(reverse("shoppinglist_detail", kwargs={"pk": self.shoppinglist.pk}))
+        self.assertEqual(response.status_code, 404)
+
+    def test_sync_client(self):
+        """Test that the async views also work under WSGI, Django runs them in an event loop."""
+        response = self.client.get(reverse("menu_detail", kwargs={"pk": self.menu.pk}))
+        self.assertContains(response, "Soep")
@@ -0,0 +1,341 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ...models import (
+    Dish,
+    DishMenu,
+    MenuList,
+    Product,
+    ProductDish,
+    ProductShoppingList,
+    ShoppingList,
+    Unit,
+    User,
+    UserDish,
+    UserProduct,
+)
+from ...services.autocomplete_services import product_index
+from ...services.cook_services import cook_index
+
+STATIC_STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+}
+
+
+@override_settings(STORAGES=STATIC_STORAGES)
+class DishListViewTest(TestCase):
+    """Test the list of dishes of a user."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="testuser", password="testpassword")
+        self.client.force_login(self.user)
+        self.gram = Unit.objects.create(name="Gram", abbreviation="g")
+
+    def add_dishes(self, amount):
+        for i in range(amount):
+            dish = Dish.objects.create(
+                name=f"Gerecht {Dish.objects.count()}", recipe="", user=self.user
+            )
+            UserDish.objects.create(user=self.user, dish=dish)
+            product, created = Product.objects.get_or_create(name=f"Product {i}")
+            ProductDish.objects.create(dish=dish, product=product, quantity=1, unit=self.gram)
+
+    def count_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("dish_list"))
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response
+
+    def test_ingredients_are_loaded_when_opened(self):
+        """Test that the list leaves out the ingredients and the body of the dish shows them."""
+        self.add_dishes(1)
+        _, response = self.count_queries()
+        self.assertNotContains(response, "Product 0")
+        dish = Dish.objects.get()
+        self.assertContains(response, reverse("dish_body", kwargs={"pk": dish.pk}))
+
+        response = self.client.get(reverse("dish_body", kwargs={"pk": dish.pk}), headers={"HX-Request": "true"})
+        self.assertTemplateUsed(response, "dish/partials/dish_body.html")
+        self.assertContains(response, "Product 0")
+
+    def test_recipe_is_not_queried(self):
+        """Test that the list does not read the long text columns or the menus."""
+        self.add_dishes(1)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse("dish_list"))
+        dish_query = next(query["sql"] for query in queries if 'FROM "app_dish"' in query["sql"])
+        self.assertNotIn('"recipe"', dish_query)
+        self.assertNotIn('"ingredient_summary"', dish_query)
+        self.assertFalse(any('"app_menulist"' in query["sql"] for query in queries))
+
+    def test_menu_picker_lists_own_menus(self):
+        MenuList.objects.create(name="Weekmenu", user=self.user)
+        other = User.objects.create_user(username="other", password="testpassword")
+        MenuList.objects.create(name="Ander menu", user=other)
+        response = self.client.get(reverse("menu_picker"), headers={"HX-Request": "true"})
+        self.assertContains(response, "Weekmenu")
+        self.assertNotContains(response, "Ander menu")
+
+    def test_query_count_does_not_grow_with_dishes(self):
+        """Test that more dishes do not cause more queries."""
+        self.add_dishes(2)
+        small, _ = self.count_queries()
+        self.add_dishes(20)
+        large, _ = self.count_queries()
+        self.assertEqual(small, large)
+
+
+@override_settings(STORAGES=STATIC_STORAGES)
+class DishListPaginationTest(TestCase):
+    """Test the keyset pagination of the dish list."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="testuser", password="testpassword")
+        self.client.force_login(self.user)
+        # Created in reverse, so the order of the names differs from the order of the pks.
+        for i in reversed(range(30)):
+            Dish.objects.create(name=f"Gerecht {i:02}", recipe="", user=self.user)
+
+    def test_pages_cover_every_dish_once(self):
+        """Test that following the cursors returns all dishes in order, without duplicates."""
+        seen = []
+        url = reverse("dish_list")
+        while url:
+            response = self.client.get(url, headers={"HX-Request": "true"})
+            seen += [dish.pk for dish in response.context["object_list"]]
+            cursor = response.context["next_cursor"]
+            url = f"{reverse('dish_list')}?after={cursor}" if cursor else None
+
+        expected = list(Dish.objects.order_by("name", "pk").values_list("pk", flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_htmx_request_gets_partial(self):
+        """Test that htmx requests only get the rows and the loader of the next page."""
+        response = self.client.get(reverse("dish_list"), headers={"HX-Request": "true"})
+        self.assertTemplateUsed(response, "dish/partials/dish_rows.html")
+        self.assertTemplateNotUsed(response, "dish/list.html")
+        self.assertContains(response, 'hx-trigger="revealed"')
+        self.assertEqual(len(response.context["object_list"]), 25)
+
+    def test_invalid_cursor_gives_404(self):
+        response = self.client.get(reverse("dish_list") + "?after=nonsense")
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(STORAGES=STATIC_STORAGES)
+class DishSearchViewTest(TestCase):
+    """Test the htmx search on the dish list."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="testuser", password="testpassword")
+        self.client.force_login(self.user)
+        Dish.objects.create(name="Pannenkoeken", recipe="", user=self.user)
+        Dish.objects.create(name="Spaghetti", recipe="", user=self.user)
+
+    def test_search_returns_matching_rows(self):
+        response = self.client.get(reverse("dish_search"), {"q": "spag"}, headers={"HX-Request": "true"})
+        self.assertTemplateUsed(response, "dish/partials/dish_rows.html")
+        self.assertContains(response, "Spaghetti")
+        self.assertNotContains(response, "Pannenkoeken")
+
+    def test_invalid_page_gives_404(self):
+        response = self.client.get(reverse("dish_search"), {"q": "spag", "page": "0"})
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(STORAGES=STATIC_STORAGES)
+class WhatCanICookViewTest(TestCase):
+    """Test the "what can I cook?" page."""
+
+    def setUp(self):
+        cache.clear()
+        cook_index.reset()
+        self.user = User.objects.create_user(username="testuser", password="testpassword")
+        self.client.force_login(self.user)
+        self.egg = Product.objects.create(name="Ei")
+        dish = Dish.objects.create(name="Omelet", recipe="", user=self.user)
+        ProductDish.objects.create(dish=dish, product=self.egg, quantity=2)
+
+    def test_page_lists_the_products(self):
+        response = self.client.get(reverse("dish_cook"))
+        self.assertContains(response, 'value="%d"' % self.egg.pk)
+
+    def test_htmx_gets_the_results(self):
+        response = self.client.get(reverse("dish_cook"), {"product": self.egg.pk}, headers={"HX-Request": "true"})
+        self.assertTemplateUsed(response, "dish/partials/cook_results.html")
+        self.assertContains(response, "Omelet")
+        self.assertContains(response, "Je hebt alles in huis!")
+
+
+@override_settings(STORAGES=STATIC_STORAGES)
+class DishFormsetSaveTest(TestCase):
+    """Test creating and updating a dish with its ingredients formset."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="testuser", password="testpassword")
+        self.client.force_login(self.user)
+        self.gram = Unit.objects.create(name="Gram", abbreviation="g")
+
+    def post_data(self, name, ingredients, initial=()):
+        """Build the POST data of the dish form with one formset row per ingredient."""
+        rows = list(initial) + [(None, product, quantity) for product, quantity in ingredients]
+        data = {
+            "name": name,
+            "recipe": "Alles mengen",
+            "productdish_set-TOTAL_FORMS": str(len(rows)),
+            "productdish_set-INITIAL_FORMS": str(len(initial)),
+            "productdish_set-MIN_NUM_FORMS": "0",
+            "productdish_set-MAX_NUM_FORMS": "1000",
+        }
+        for i, (pk, product, quantity) in enumerate(rows):
+            data[f"productdish_set-{i}-id"] = pk or ""
+            data[f"productdish_set-{i}-product_name"] = product
+            data[f"productdish_set-{i}-quantity"] = quantity
+            data[f"productdish_set-{i}-unit"] = self.gram.pk
+        return data
+
+    def create_dish(self, name, amount):
+        ingredients = [(f"Product {i}", i + 1) for i in range(amount)]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse("dish_create"), self.post_data(name, ingredients))
+        self.assertEqual(response.status_code, 302)
+        return len(queries)
+
+    def test_create_links_everything(self):
+        """Test that the dish, products and relations are created."""
+        self.create_dish("Soep", 3)
+        dish = Dish.objects.get(name="Soep")
+        self.assertEqual(dish.productdish_set.count(), 3)
+        self.assertEqual(dish.user, self.user)
+        self.assertEqual(self.user.user_dishes.get().dish, dish)
+        self.assertEqual(self.user.userproduct_set.count(), 3)
+        self.assertEqual(len(dish.ingredient_summary), 3)
+
+    def test_product_of_another_user_is_linked_too(self):
+        """Test that a product name another user uses first is in the products of this user as well."""
+        other = User.objects.create_user(username="otheruser", password="testpassword")
+        product = Product.objects.create(name="Product 0")
+        UserProduct.objects.create(user=other, product=product)
+
+        self.create_dish("Soep", 2)
+
+        self.assertIn(product, Product.objects.for_user(self.user))
+        self.assertIn(product, Product.objects.for_user(other))
+
+    def test_create_query_count_does_not_grow_with_ingredients(self):
+        """Test that 40 ingredients take as many queries as 5."""
+        self.assertEqual(self.create_dish("Soep", 5), self.create_dish("Stoofpot", 40))
+
+    def test_update_changes_existing_rows(self):
+        """Test that an update changes existing rows and adds new ones."""
+        self.create_dish("Soep", 2)
+        dish = Dish.objects.get(name="Soep")
+        first, second = dish.productdish_set.order_by("pk")
+        initial = [(first.pk, "Product 0", 10), (second.pk, "Wortel", 2)]
+
+        response = self.client.post(
+            reverse("dish_update", kwargs={"pk": dish.pk}),
+            self.post_data("Soep", [("Ui", 1)], initial=initial),
+        )
+
+        self.assertEqual(response.status_code, 302)
+        dish.refresh_from_db()
+        self.assertEqual(
+            [(item["name"], item["quantity"]) for item in dish.ingredient_summary],
+            [("Product 0", "10"), ("Ui", "1"), ("Wortel", "2")],
+        )
+
+    def test_update_follows_linked_shopping_list(self):
+        """Test that changed, replaced and deleted rows update a list that follows a menu with the dish."""
+        self.create_dish("Soep", 3)
+        dish = Dish.objects.get(name="Soep")
+        menu = MenuList.objects.create(name="Weekmenu", user=self.user)
+        DishMenu.objects.create(menu=menu, dish=dish)
+        shoppinglist = ShoppingList.objects.create(user=self.user, menu=menu)
+        first, second, third = dish.productdish_set.order_by("pk")
+        initial = [(first.pk, "Product 0", 10), (second.pk, "Wortel", 2), (third.pk, "Product 2", 3)]
+        data = self.post_data("Soep", [], initial=initial)
+        data["productdish_set-2-DELETE"] = "on"
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("dish_update", kwargs={"pk": dish.pk}), data)
+
+        # Product 1 and Product 2 had no line yet and are no longer in the dish, they are not added.
+        lines = ProductShoppingList.objects.filter(shoppinglist=shoppinglist).order_by("sort_key")
+        self.assertEqual([(item.product_name, item.quantity) for item in lines], [("Product 0", 10), ("Wortel", 2)])
+
+
+@override_settings(STORAGES=STATIC_STORAGES)
+class DishAccessTest(TestCase):
+    """Test that users can only see their own dishes."""
+
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user(username="owner", password="testpassword")
+        self.other = User.objects.create_user(username="other", password="testpassword")
+        self.dish = Dish.objects.create(name="Soep", recipe="", user=self.owner)
+
+    def test_owner_can_view_dish(self):
+        self.client.force_login(self.owner)
+        response = self.client.get(reverse("dish_detail", kwargs={"pk": self.dish.pk}))
+        self.assertEqual(response.status_code, 200)
+
+    def test_other_user_is_denied(self):
+        self.client.force_login(self.other)
+        response = self.client.get(reverse("dish_detail", kwargs={"pk": self.dish.pk}))
+        self.assertEqual(response.status_code, 403)
+
+    def test_other_user_cannot_load_the_body(self):
+        self.client.force_login(self.other)
+        response = self.client.get(reverse("dish_body", kwargs={"pk": self.dish.pk}))
+        self.assertEqual(response.status_code, 403)
+
+
+@override_settings(STORAGES=STATIC_STORAGES)
+class ProductAutocompleteViewTest(TestCase):
+    """Test the autocomplete of the product field in the dish formset."""
+
+    def setUp(self):
+        cache.clear()
+        product_index.reset()
+        self.user = User.objects.create_user(username="testuser", password="testpassword")
+        self.client.force_login(self.user)
+        Product.objects.create(name="Bloem")
+        Product.objects.create(name="Boter")
+
+    def test_options_for_the_prefixed_field(self):
+        response = self.client.get(
+            reverse("product_autocomplete"),
+            {"productdish_set-0-product_name": "bl"},
+            headers={"HX-Request": "true"},
+        )
+        self.assertContains(response, '<option value="Bloem">')
+        self.assertNotContains(response, "Boter")
+
+    def test_new_products_from_the_formset_are_suggested(self):
+        """Test that products created in bulk by the formset reach the index."""
+        self.client.get(reverse("product_autocomplete"), {"q": "b"})
+        data = {
+            "name": "Pannenkoeken",
+            "recipe": "Bakken",
+            "productdish_set-TOTAL_FORMS": "1",
+            "productdish_set-INITIAL_FORMS": "0",
+            "productdish_set-MIN_NUM_FORMS": "0",
+            "productdish_set-MAX_NUM_FORMS": "1000",
+            "productdish_set-0-product_name": "Bakpoeder",
+            "productdish_set-0-quantity": "1",
+            "productdish_set-0-unit": "",
+        }
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("dish_create"), data)
+
+        response = self.client.get(reverse("product_autocomplete"), {"q": "bak"})
+        self.assertContains(response, '<option value="Bakpoeder">')
@@ -0,0 +1,53 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from ...models import Dish, DishMenu, Job, MenuList, Product, ProductDish, ShoppingList, User, UserMenu
+from ...services.job_services import claim_job, run_job
+from .test_dish_views import STATIC_STORAGES
+
+HTMX = {"HX-Request": "true"}
+
+
+@override_settings(STORAGES=STATIC_STORAGES, JOBS_RUN_INLINE=False)
+class ShoppingListJobTest(TestCase):
+    """Test that a shopping list is made by a background job while the page polls its status."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="testuser", password="testpassword")
+        self.client.force_login(self.user)
+        self.menu = MenuList.objects.create(name="Weekmenu", user=self.user)
+        UserMenu.objects.create(user=self.user, menu=self.menu)
+        dish = Dish.objects.create(name="Soep", recipe="", user=self.user)
+        ProductDish.objects.create(dish=dish, product=Product.objects.create(name="Wortel"), quantity=2)
+        DishMenu.objects.create(menu=self.menu, dish=dish)
+        self.url = reverse("create_shoppinglist_from_menu", kwargs={"menu_id": self.menu.pk})
+
+    def test_status_is_polled_until_the_list_is_made(self):
+        response = self.client.post(self.url)
+        job = Job.objects.get()
+        self.assertRedirects(response, reverse("job_detail", kwargs={"pk": job.pk}))
+        self.assertFalse(ShoppingList.objects.exists())
+        # A second click while the job is waiting doesn't queue another one.
+        self.client.post(self.url)
+        self.assertEqual(Job.objects.count(), 1)
+
+        response = self.client.get(reverse("job_detail", kwargs={"pk": job.pk}), headers=HTMX)
+        self.assertTemplateUsed(response, "job/partials/job_status.html")
+        self.assertContains(response, 'hx-trigger="every 1s"')
+
+        run_job(claim_job("worker"))
+        shoppinglist = ShoppingList.objects.get()
+        response = self.client.get(reverse("job_detail", kwargs={"pk": job.pk}), headers=HTMX)
+        self.assertEqual(response["HX-Redirect"], reverse("shoppinglist_detail", kwargs={"pk": shoppinglist.pk}))
+
+        response = self.client.get(reverse("job_detail", kwargs={"pk": job.pk}))
+        self.assertContains(response, "Bekijk resultaat")
+        self.assertNotContains(response, "hx-trigger")
+
+    def test_jobs_of_other_users(self):
+        self.client.post(self.url)
+        self.client.force_login(User.objects.create_user(username="other", password="testpassword"))
+        response = self.client.get(reverse("job_detail", kwargs={"pk": Job.objects.get().pk}))
+        self.assertEqual(response.status_code, 404)
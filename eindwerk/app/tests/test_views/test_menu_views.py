@@ -0,0 +1,57 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ...models import Dish, DishMenu, MenuList, Product, ProductDish, Unit, User, UserDish, UserMenu
+from ...services.dish_services import update_ingredient_summary
+from .test_dish_views import STATIC_STORAGES
+
+
+@override_settings(STORAGES=STATIC_STORAGES)
+class MenuDetailViewTest(TestCase):
+    """Test the dishes of a menu and the totals panel."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="testuser", password="testpassword")
+        self.client.force_login(self.user)
+        self.gram = Unit.objects.create(name="Gram", abbreviation="g", dimension=Unit.MASS, factor=1)
+        self.kilogram = Unit.objects.create(name="Kilogram", abbreviation="kg", dimension=Unit.MASS, factor=1000)
+        self.menu = MenuList.objects.create(name="Weekmenu", user=self.user)
+        UserMenu.objects.create(user=self.user, menu=self.menu)
+
+    def add_dish(self, name, ingredients):
+        dish = Dish.objects.create(name=name, recipe="", user=self.user)
+        UserDish.objects.create(user=self.user, dish=dish)
+        for product_name, quantity, unit in ingredients:
+            product, created = Product.objects.get_or_create(name=product_name)
+            ProductDish.objects.create(dish=dish, product=product, quantity=quantity, unit=unit)
+        update_ingredient_summary(dish.pk)
+        DishMenu.objects.create(menu=self.menu, dish=dish)
+        return dish
+
+    def get(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("menu_detail", kwargs={"pk": self.menu.pk}))
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response
+
+    def test_totals_are_summed_over_the_dishes(self):
+        self.add_dish("Soep", [("Wortel", 500, self.gram), ("Ui", 1, None)])
+        self.add_dish("Stoofpot", [("Wortel", 1, self.kilogram)])
+        _, response = self.get()
+        totals = [(item.product_name, item.get_quantity_display(), item.unit_abbreviation) for item in response.context["totals"]]
+        self.assertEqual(totals, [("Ui", "1", ""), ("Wortel", "1.50", "kg")])
+        self.assertContains(response, "Totaal voor dit menu")
+
+    def test_query_count_does_not_grow_with_the_menu(self):
+        self.add_dish("Soep", [("Wortel", 500, self.gram)])
+        small, _ = self.get()
+        for number in range(5):
+            self.add_dish(f"Gerecht {number}", [(f"Product {number}", 1, self.gram), ("Ui", 2, None)])
+        cache.clear()
+        large, response = self.get()
+        self.assertEqual(small, large)
+        self.assertEqual(len(response.context["dishes"]), 6)
@@ -0,0 +1,143 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ...models import (
+    Dish,
+    DishMenu,
+    MenuList,
+    Product,
+    ProductDish,
+    ProductShoppingList,
+    ShoppingList,
+    Unit,
+    User,
+    UserDish,
+    UserMenu,
+)
+from ...services.dish_services import update_ingredient_summary
+from .test_dish_views import STATIC_STORAGES
+
+HTMX = {"HX-Request": "true"}
+
+
+@override_settings(STORAGES=STATIC_STORAGES)
+class PartialResponseTest(TestCase):
+    """Test that the write views answer htmx with a fragment and other clients with a redirect."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="testuser", password="testpassword")
+        self.client.force_login(self.user)
+        self.gram = Unit.objects.create(name="Gram", abbreviation="g", dimension=Unit.MASS, factor=1)
+        self.dish = Dish.objects.create(name="Soep", recipe="", user=self.user)
+        UserDish.objects.create(user=self.user, dish=self.dish)
+        self.product_dishes = [
+            ProductDish.objects.create(dish=self.dish, product=Product.objects.create(name=name), quantity=100, unit=self.gram)
+            for name in ("Wortel", "Ui")
+        ]
+        update_ingredient_summary(self.dish.pk)
+        self.menu = MenuList.objects.create(name="Weekmenu", user=self.user)
+        UserMenu.objects.create(user=self.user, menu=self.menu)
+        self.shoppinglist = ShoppingList.objects.create(user=self.user)
+        self.items = ProductShoppingList.objects.bulk_create(
+            [
+                ProductShoppingList(shoppinglist=self.shoppinglist, quantity=2, product_name=name, sort_key=name.lower())
+                for name in ("Bloem", "Ei")
+            ]
+        )
+
+    def test_product_dish_update(self):
+        url = reverse("product_dish_update", kwargs={"pk": self.product_dishes[0].pk})
+        response = self.client.get(url, headers=HTMX)
+        self.assertTemplateUsed(response, "product_dish/partials/form_row.html")
+        self.assertNotContains(response, "<html")
+
+        data = {"product_name": "Wortel", "quantity": 250, "unit": self.gram.pk}
+        response = self.client.post(url, data, headers=HTMX)
+        self.assertTemplateUsed(response, "product_dish/partials/ingredient_row.html")
+        self.assertContains(response, f'id="ingredient-{self.product_dishes[0].pk}"')
+        self.assertContains(response, "250")
+
+        response = self.client.post(url, {**data, "product_name": ""}, headers=HTMX)
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, "product_dish/partials/form_row.html")
+
+        response = self.client.post(url, data)
+        self.assertRedirects(response, reverse("dish_detail", kwargs={"pk": self.dish.pk}))
+
+    def test_product_dish_delete(self):
+        url = reverse("product_dish_delete", kwargs={"pk": self.product_dishes[0].pk})
+        response = self.client.post(url, headers=HTMX)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b"")
+        self.assertFalse(ProductDish.objects.filter(pk=self.product_dishes[0].pk).exists())
+
+        response = self.client.post(reverse("product_dish_delete", kwargs={"pk": self.product_dishes[1].pk}))
+        self.assertRedirects(response, reverse("dish_detail", kwargs={"pk": self.dish.pk}))
+
+    def test_shoppinglist_item_update(self):
+        url = reverse("update_product_shoppinglist", kwargs={"pk": self.items[0].pk})
+        response = self.client.get(url, headers=HTMX)
+        self.assertTemplateUsed(response, "shoplist/partials/item_form_row.html")
+
+        response = self.client.post(url, {"quantity": 3}, headers=HTMX)
+        self.assertTemplateUsed(response, "shoplist/partials/item_row.html")
+        self.assertContains(response, f'id="item-{self.items[0].pk}"')
+
+    def test_shoppinglist_item_delete_updates_the_counter(self):
+        ProductShoppingList.objects.filter(pk=self.items[1].pk).update(checked=True)
+        url = reverse("delete_product_shoppinglist", kwargs={"pk": self.items[0].pk})
+        response = self.client.post(url, headers=HTMX)
+        self.assertContains(response, 'id="shoppinglist-progress"')
+        self.assertContains(response, 'hx-swap-oob="true"')
+        self.assertContains(response, "1 / 1 afgevinkt")
+
+    def test_add_to_menu(self):
+        data = {"dish_id": self.dish.pk, "menu_id": self.menu.pk}
+        response = self.client.post(reverse("add_to_menu"), data, headers=HTMX)
+        self.assertTemplateUsed(response, "menu/partials/added_to_menu.html")
+        self.assertContains(response, "Soep is toegevoegd aan Weekmenu.")
+
+        response = self.client.post(reverse("add_to_menu"), data)
+        self.assertRedirects(response, reverse("dish_list"))
+        self.assertEqual(DishMenu.objects.count(), 2)
+
+    def test_remove_from_menu_updates_the_totals(self):
+        DishMenu.objects.create(menu=self.menu, dish=self.dish)
+        DishMenu.objects.create(menu=self.menu, dish=self.dish)
+        data = {"dish_id": self.dish.pk, "menu_id": self.menu.pk}
+        response = self.client.post(reverse("remove_from_menu"), data, headers=HTMX)
+        self.assertContains(response, 'id="menu-totals" hx-swap-oob="true"')
+        # One of the two times the dish is in the menu is left: 100 g of every ingredient.
+        self.assertEqual([item.quantity for item in response.context["totals"]], [100, 100])
+
+    def test_unit_create(self):
+        Unit.objects.create(name="Liter", abbreviation="l")
+        data = {"name": "Kilogram", "abbreviation": "kg", "dimension": Unit.MASS, "factor": 1000}
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse("unit_create"), data, headers=HTMX)
+        self.assertTemplateUsed(response, "unit/partials/unit_created.html")
+        self.assertContains(response, "<li>Kilogram: kg</li>")
+        self.assertNotContains(response, "Liter")
+        self.assertFalse(any('FROM "app_unit"' in query["sql"] and "INSERT" not in query["sql"] for query in queries))
+
+        response = self.client.post(reverse("unit_create"), {**data, "name": ""}, headers=HTMX)
+        self.assertTemplateUsed(response, "unit/partials/unit_form.html")
+
+    def test_fewer_queries_and_bytes_than_a_reload(self):
+        """Test that the fragment costs far less than the redirect and the page it loads."""
+
+        def measure(item, **kwargs):
+            url = reverse("update_product_shoppinglist", kwargs={"pk": item.pk})
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post(url, {"quantity": 5}, **kwargs)
+            return len(queries), len(response.content)
+
+        htmx_queries, htmx_bytes = measure(self.items[0], headers=HTMX)
+        page_queries, page_bytes = measure(self.items[1], follow=True)
+        self.assertLess(htmx_queries, page_queries)
+        self.assertLess(htmx_bytes * 10, page_bytes)
@@ -0,0 +1,127 @@
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from ...models import (
+    Dish,
+    DishMenu,
+    MenuList,
+    Product,
+    ProductDish,
+    ProductShoppingList,
+    ShoppingList,
+    User,
+    UserDish,
+    UserMenu,
+)
+from .test_dish_views import STATIC_STORAGES
+
+
+@override_settings(STORAGES=STATIC_STORAGES)
+class ShoppingListListViewTest(TestCase):
+    """Test the paginated list of shopping lists."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="testpassword")
+        self.client.force_login(self.user)
+        now = timezone.now()
+        lists = ShoppingList.objects.bulk_create(
+            [ShoppingList(user=self.user) for _ in range(30)]
+        )
+        # Give some lists the same date, so the descending pk has to break the ties.
+        for i, shoppinglist in enumerate(lists):
+            shoppinglist.date = now - timedelta(days=i // 3)
+        ShoppingList.objects.bulk_update(lists, ["date"])
+
+    def test_newest_first_over_pages(self):
+        """Test that the second page continues where the first one stopped."""
+        first = self.client.get(reverse("shoppinglist"))
+        cursor = first.context["next_cursor"]
+        second = self.client.get(reverse("shoppinglist"), {"after": cursor}, headers={"HX-Request": "true"})
+
+        seen = [item.pk for item in first.context["object_list"]]
+        seen += [item.pk for item in second.context["object_list"]]
+        expected = list(ShoppingList.objects.order_by("-date", "-pk").values_list("pk", flat=True))
+        self.assertEqual(seen, expected)
+        self.assertIsNone(second.context["next_cursor"])
+        self.assertTemplateUsed(second, "shoppinglist/partials/shoppinglist_cards.html")
+
+
+@override_settings(STORAGES=STATIC_STORAGES)
+class CheckItemsViewTest(TestCase):
+    """Test ticking off items from the shopping list page."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="testpassword")
+        self.client.force_login(self.user)
+        self.shoppinglist = ShoppingList.objects.create(user=self.user)
+        self.item = ProductShoppingList.objects.create(shoppinglist=self.shoppinglist, quantity=1, product_name="Bloem")
+        self.url = reverse("check_shoppinglist_items", kwargs={"pk": self.shoppinglist.pk})
+
+    def test_checked_state_is_stored(self):
+        response = self.client.post(self.url, {"checked": [self.item.pk]}, headers={"HX-Request": "true"})
+        self.assertTemplateUsed(response, "shoplist/partials/check_progress.html")
+        self.assertContains(response, "1 / 1 afgevinkt")
+        self.item.refresh_from_db()
+        self.assertTrue(self.item.checked)
+
+        response = self.client.get(reverse("shoppinglist_detail", kwargs={"pk": self.shoppinglist.pk}))
+        self.assertContains(response, f'data-id="{self.item.pk}" checked')
+
+    def test_list_of_another_user(self):
+        other = User.objects.create_user(username="other", password="testpassword")
+        self.client.force_login(other)
+        response = self.client.post(self.url, {"checked": [self.item.pk]})
+        self.assertEqual(response.status_code, 404)
+        self.item.refresh_from_db()
+        self.assertFalse(self.item.checked)
+
+
+@override_settings(STORAGES=STATIC_STORAGES)
+class LinkedShoppingListViewTest(TestCase):
+    """Test a shopping list that follows its menu from the pages."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="testpassword")
+        self.client.force_login(self.user)
+        self.menu = MenuList.objects.create(name="Weekmenu", user=self.user)
+        UserMenu.objects.create(user=self.user, menu=self.menu)
+        self.soup, self.stew = (self.dish(name) for name in ("Soep", "Stoofpot"))
+        DishMenu.objects.create(menu=self.menu, dish=self.soup)
+
+    def dish(self, name):
+        dish = Dish.objects.create(name=name, recipe="", user=self.user)
+        UserDish.objects.create(user=self.user, dish=dish)
+        ProductDish.objects.create(dish=dish, product=Product.objects.get_or_create(name="Wortel")[0], quantity=2)
+        return dish
+
+    def test_added_dish_keeps_the_manual_quantity(self):
+        url = reverse("create_shoppinglist_from_menu", kwargs={"menu_id": self.menu.pk})
+        response = self.client.post(url, {"linked": "1"}, follow=True)
+        self.assertContains(response, "Volgt het menu")
+        item = ProductShoppingList.objects.get(shoppinglist__menu=self.menu)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("add_to_menu"), {"dish_id": self.stew.pk, "menu_id": self.menu.pk})
+        item.refresh_from_db()
+        self.assertEqual(item.quantity, 4)
+
+        self.client.post(reverse("update_product_shoppinglist", kwargs={"pk": item.pk}), {"quantity": 5})
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("remove_from_menu"), {"dish_id": self.stew.pk, "menu_id": self.menu.pk})
+        item.refresh_from_db()
+        self.assertEqual((item.quantity, item.manual), (5, True))
+
+    def test_only_post_creates_a_list(self):
+        url = reverse("create_shoppinglist_from_menu", kwargs={"menu_id": self.menu.pk})
+        self.assertEqual(self.client.get(url).status_code, 405)
+        first = self.client.post(url)
+        second = self.client.post(url)
+        self.assertEqual(first.url, second.url)
+        self.assertEqual(ShoppingList.objects.count(), 1)
+
+    def test_not_linked_by_default(self):
+        self.client.post(reverse("create_shoppinglist_from_menu", kwargs={"menu_id": self.menu.pk}))
+        self.assertIsNone(ShoppingList.objects.get().menu)
@@ -3,6 +3,7 @@ from django.urls import path
 from .views.bug_views import *
 from .views.dish_views import *
 from .views.index_views import *
+from .views.job_views import *
 from .views.menu_views import *
 from .views.product_dish_views import *
 from .views.product_views import *
@@ -21,12 +22,18 @@ urlpatterns = [
     path(
         "products/", ProductListView.as_view(), name="products"
     ),  # This only gives the products of the user
+    path(
+        "products/autocomplete/", ProductAutocompleteView.as_view(), name="product_autocomplete"
+    ),
     # This url is disabled for now, currently no need to create a product that is not linked to any other object.
     # path('product/create/', ProductCreateView.as_view(), name='product_create'),
     # Dish
     path("dish/", DishListView.as_view(), name="dish_list"),
+    path("dish/search/", DishSearchView.as_view(), name="dish_search"),
+    path("dish/cook/", WhatCanICookView.as_view(), name="dish_cook"),
     path("dish/create/", DishCreateView.as_view(), name="dish_create"),
     path("dish/<int:pk>/", DishDetailView.as_view(), name="dish_detail"),
+    path("dish/<int:pk>/body/", DishBodyView.as_view(), name="dish_body"),
     path("dish/<int:pk>/update/", DishUpdateView.as_view(), name="dish_update"),
     path("dish/<int:pk>/delete/", DishDeleteView.as_view(), name="dish_delete"),
     # ProductDish
@@ -51,6 +58,7 @@ urlpatterns = [
     path("menu/<int:pk>/update/", MenuUpdateView.as_view(), name="menu_update"),
     path("menu/<int:pk>/delete/", MenuDeleteView.as_view(), name="menu_delete"),
     path("menu/<int:pk>/", MenuDetailView.as_view(), name="menu_detail"),
+    path("menu/picker/", MenuPickerView.as_view(), name="menu_picker"),
     path("add_to_menu/", AddToMenuView.as_view(), name="add_to_menu"),
     path("remove_from_menu/", RemoveFromMenuView.as_view(), name="remove_from_menu"),
     # Shoppinglist
@@ -71,6 +79,11 @@ urlpatterns = [
         ShoppingListDetailView.as_view(),
         name="shoppinglist_detail",
     ),
+    path(
+        "shoppinglist/<int:pk>/check/",
+        CheckItemsView.as_view(),
+        name="check_shoppinglist_items",
+    ),
     path(
         "shoplist/<int:pk>/update",
         UpdateItemFromShoppingListView.as_view(),
@@ -86,6 +99,8 @@ urlpatterns = [
         AddItemToShoppingListView.as_view(),
         name="add_product_to_shoppinglist",
     ),
+    # Background jobs
+    path("job/<int:pk>/", JobDetailView.as_view(), name="job_detail"),
     # Bug Report
     path("bug_report/create/", BugReportCreateView.as_view(), name="bug_report_create"),
 ]
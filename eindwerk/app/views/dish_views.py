@@ -1,67 +1,149 @@
 # Django imports
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.db import transaction
+from django.http import Http404
 from django.shortcuts import redirect
 from django.views.generic import (
+    TemplateView,
     ListView,
     DetailView,
     CreateView,
     UpdateView,
     DeleteView,
 )
-from django.urls import reverse_lazy
+from django.urls import reverse, reverse_lazy
+from urllib.parse import urlencode
 
 # Project imports
 
 from django.conf import settings
-from ..models import Dish, ProductDish, Product, UserDish, UserProduct, MenuList
-from ..custom_mixins import UserDishAccessMixin
+from ..models import Dish, ProductDish, UserDish
+from ..custom_mixins import (
+    AsyncDetailMixin,
+    AsyncKeysetListMixin,
+    AsyncLoginRequiredMixin,
+    UserDishAccessMixin,
+)
 from ..forms import DishForm
 from ..formsets import ProductDishFormSet
+from ..services.dish_services import save_product_dish_formset
+from ..services.cook_services import cook_products, what_can_i_cook
+from ..services.search_services import search_dishes
 
 
-class DishListView(LoginRequiredMixin, ListView):
+class DishListView(AsyncLoginRequiredMixin, AsyncKeysetListMixin, ListView):
     """
     This view displays a list of all the user's dishes along with their corresponding recipes and products.
 
     The view requires the user to be logged in. Only the dishes belonging to the current user are displayed.
+    The list only shows the names, the recipe and the ingredients are left out of the query and
+    are loaded by htmx when a dish is opened (see DishBodyView). The menus for the "add to menu"
+    modal are loaded when the modal opens (see MenuPickerView). The dishes are loaded per page of 25,
+    the next page is fetched by htmx when the end of the list is scrolled into view
+    (see KeysetPaginationMixin). The page is read with the async ORM (see AsyncKeysetListMixin).
 
     The context data for the view includes:
-        - dish_products: A dictionary mapping each dish to its associated products.
-        - menus: A queryset of all menus belonging to the current user.
+        - object_list: One page of dishes of the current user.
+        - next_cursor: The cursor of the next page, None on the last page.
         - user: The current user.
     """
 
     login_url = settings.LOGIN_URL
     model = Dish
     template_name = "dish/list.html"
+    partial_template_name = "dish/partials/dish_rows.html"
+
+    def get_queryset(self):
+        # Query all dishes belonging to the current user, without the long text columns.
+        return Dish.objects.for_user(self.request.user).for_list()
 
     def get_context_data(self, *, object_list=None, **kwargs):
-        user = self.request.user
-        # Query all dishes belonging to the current user.
-        dishes = Dish.objects.filter(userdish__user=user)
-        # Get the context data from the parent (List)View and adds more objects to it.
+        # Get the context data from the parent (List)View and adds the current user to it.
         context = super().get_context_data(object_list=object_list, **kwargs)
+        context["user"] = self.request.user
+        return context
 
-        # Create a dictionary to store dishes and their associated products.
-        dish_products = {}
-        for dish in dishes:
-            # Query all products associated with the current dish.
-            products = ProductDish.objects.filter(dish=dish).select_related(
-                "product", "unit"
-            )
-            dish_products[dish] = products
 
-        # Query all menus belonging to the current user.
-        menus = MenuList.objects.filter(usermenu__user=user)
+class DishBodyView(AsyncLoginRequiredMixin, UserDishAccessMixin, AsyncDetailMixin, DetailView):
+    """
+    This view returns the recipe and the ingredients of one dish for the dish list.
 
-        # Add the dish-products dictionary, the current user, and the user's menus to the context.
-        context["dish_products"] = dish_products
-        context["menus"] = menus
-        context["user"] = user
+    It is called by htmx the first time a dish is opened in the list, so only the dishes
+    that are actually viewed are read in full.
+    """
+
+    login_url = settings.LOGIN_URL
+    model = Dish
+    template_name = "dish/partials/dish_body.html"
+
+
+class DishSearchView(LoginRequiredMixin, ListView):
+    """
+    This view searches the dishes of the user on name, ingredients and recipe.
+
+    It is called by htmx from the search box on the dish list and returns the same rows as the list,
+    best match first and per page of 25. The search index depends on the database, see search_services.
+
+    GET parameters:
+        - q: The search words, an empty search gives all dishes.
+        - page: The page number, starting at 1.
+    """
+
+    login_url = settings.LOGIN_URL
+    model = Dish
+    template_name = "dish/partials/dish_rows.html"
+
+    def get_queryset(self):
+        self.query = self.request.GET.get("q", "")
+        try:
+            self.page = int(self.request.GET.get("page", 1))
+        except ValueError:
+            raise Http404("Ongeldige pagina.")
+        if self.page < 1:
+            raise Http404("Ongeldige pagina.")
+        dishes, self.has_next = search_dishes(self.request.user, self.query, self.page)
+        return dishes
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["next_page_url"] = (
+            reverse("dish_search") + "?" + urlencode({"q": self.query, "page": self.page + 1})
+            if self.has_next
+            else None
+        )
         return context
 
 
-class DishDetailView(LoginRequiredMixin, UserDishAccessMixin, DetailView):
+class WhatCanICookView(LoginRequiredMixin, TemplateView):
+    """
+    This view lets the user tick the products they have and shows which of their dishes they can cook.
+
+    The dishes are ranked by the number of missing ingredients, see cook_services. Changing a checkbox
+    sends the form with htmx and only the results are returned.
+
+    GET parameters:
+        - product: The id of a product the user has, can be given more than once.
+    """
+
+    login_url = settings.LOGIN_URL
+    template_name = "dish/cook.html"
+
+    def get_template_names(self):
+        if self.request.htmx:
+            return ["dish/partials/cook_results.html"]
+        return [self.template_name]
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        user = self.request.user
+        selected = {int(value) for value in self.request.GET.getlist("product") if value.isdigit()}
+        context["products"] = cook_products(user)
+        context["selected"] = selected
+        context["results"] = what_can_i_cook(user, selected) if selected else []
+        return context
+
+
+class DishDetailView(AsyncLoginRequiredMixin, UserDishAccessMixin, AsyncDetailMixin, DetailView):
     """
     This view allows users to view a dish in detail.
     Only dishes related to the user will be displayed.
@@ -71,32 +153,14 @@ class DishDetailView(LoginRequiredMixin, UserDishAccessMixin, DetailView):
         model (Model): The model class representing the dish.
         template_name (str): The name of the template to render.
 
-    Methods:
-        get_context_data(**kwargs): Returns a dictionary containing the context data for the view.
-            This includes the current dish and its associated product dishes.
-
+    The products are read from dish.ingredient_summary, the menus of the "add to menu" modal
+    are loaded by htmx when the modal opens.
     """
 
     login_url = settings.LOGIN_URL
     model = Dish
     template_name = "dish/detail.html"
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data()
-        # Get the current dish.
-        dish = self.get_object()
-
-        # Get the related product dishes.
-        dish_products = ProductDish.objects.filter(dish=dish).select_related(
-            "product", "unit"
-        )
-
-        menus = MenuList.objects.filter(usermenu__user=self.request.user)
-        context["menus"] = menus
-        context["dish_products"] = dish_products
-
-        return context
-
 
 class DishCreateView(LoginRequiredMixin, UserDishAccessMixin, CreateView):
     """This view creates a new dish object. A Dish containing multiple products.
@@ -125,40 +189,14 @@ class DishCreateView(LoginRequiredMixin, UserDishAccessMixin, CreateView):
 
     def form_valid(self, form):
         context = self.get_context_data()
-        user = self.request.user
         productdish_formset = context["productdish_formset"]
         if form.is_valid() and productdish_formset.is_valid():
-            self.object = form.save()
-
-            # Save the Dish first
-            dish = self.object
-            # Create the UserDish object for establishing the relation between the user and the dish.
-            UserDish.objects.get_or_create(user=user, dish=dish)
-
-            # Iterate over the productdish_formset and save each ProductDish object
-            for productdish_form in productdish_formset:
-                # These fields are manually added to the ProductDishForm, therefore we have to extract the data out of the form fields.
-                product_name = productdish_form.cleaned_data.get("product_name")
-                product_is_favorite = productdish_form.cleaned_data.get(
-                    "product_is_favorite"
-                )
-
-                if product_name is not None:
-                    # Create or get the Product with the data from above.
-                    product, created = Product.objects.get_or_create(
-                        name=product_name, defaults={"is_favorite": product_is_favorite}
-                    )
-
-                    # Create the ProductDish object
-                    ProductDish.objects.get_or_create(
-                        dish=dish,
-                        product=product,
-                        quantity=productdish_form.cleaned_data.get("quantity"),
-                        unit=productdish_form.cleaned_data.get("unit"),
-                    )
-                    # Create the UserProduct object
-                    UserProduct.objects.get_or_create(user=user, product=product)
-
+            with transaction.atomic():
+                # Save the Dish first
+                form.instance.user = self.request.user
+                self.object = form.save()
+                # Save the products, ProductDish and UserProduct/UserDish relations in one batch.
+                save_product_dish_formset(self.object, productdish_formset, self.request.user)
             return redirect(self.get_success_url())
         else:
             return self.form_invalid(form)
@@ -188,63 +226,36 @@ class DishUpdateView(LoginRequiredMixin, UserDishAccessMixin, UpdateView):
     def get_context_data(self, **kwargs):
         """Add extra context variables to the view."""
         data = super().get_context_data(**kwargs)
+        # Select the products up front, so filling in the product names does not query per form.
+        queryset = ProductDish.objects.filter(dish=self.object).select_related("product")
         if self.request.method == "POST":
             data["productdish_formset"] = ProductDishFormSet(
-                self.request.POST, instance=self.object
+                self.request.POST, instance=self.object, queryset=queryset
             )
         else:
-            data["productdish_formset"] = ProductDishFormSet(instance=self.object)
-            for form in data["productdish_formset"]:
-                product_dish = form.instance
-                try:
-                    product = product_dish.product
-                    form.fields["product_name"].initial = product.name
-                    form.fields["product_is_favorite"].initial = product.is_favorite
-                except Product.DoesNotExist:
-                    form.fields["product_name"].initial = ""
-                    form.fields["product_is_favorite"].initial = False
+            data["productdish_formset"] = ProductDishFormSet(
+                instance=self.object, queryset=queryset
+            )
+        for form in data["productdish_formset"]:
+            product_dish = form.instance
+            if product_dish.pk:
+                form.fields["product_name"].initial = product_dish.product.name
+                form.fields["product_is_favorite"].initial = product_dish.product.is_favorite
+            else:
+                form.fields["product_name"].initial = ""
+                form.fields["product_is_favorite"].initial = False
         return data
 
     def form_valid(self, form):
         """Handle form validation and saving logic."""
         context = self.get_context_data()
-        user = self.request.user
         productdish_formset = context["productdish_formset"]
 
         if form.is_valid() and productdish_formset.is_valid():
-            self.object = form.save()
-            dish = self.object
-            UserDish.objects.get_or_create(user=user, dish=dish)
-
-            for productdish_form in productdish_formset:
-                if productdish_form.cleaned_data.get("DELETE"):
-                    productdish_form.instance.delete()
-                    continue
-
-                product_name = productdish_form.cleaned_data.get("product_name")
-                product_is_favorite = productdish_form.cleaned_data.get(
-                    "product_is_favorite"
-                )
-                quantity = productdish_form.cleaned_data.get("quantity")
-                unit = productdish_form.cleaned_data.get("unit")
-
-                if product_name is not None:
-                    product, created = Product.objects.get_or_create(
-                        name=product_name, defaults={"is_favorite": product_is_favorite}
-                    )
-
-                    ProductDish.objects.update_or_create(
-                        id=productdish_form.instance.id,
-                        defaults={
-                            "dish": dish,
-                            "product": product,
-                            "quantity": quantity,
-                            "unit": unit,
-                        },
-                    )
-
-                    UserProduct.objects.get_or_create(user=user, product=product)
-
+            with transaction.atomic():
+                self.object = form.save()
+                # Create, update and delete all ProductDish rows of the formset in one batch.
+                save_product_dish_formset(self.object, productdish_formset, self.request.user)
             return redirect(self.get_success_url())
         else:
             return self.form_invalid(form)
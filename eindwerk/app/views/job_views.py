@@ -0,0 +1,33 @@
+# Django imports
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.views.generic.detail import DetailView
+from django_htmx.http import HttpResponseClientRedirect
+
+# Project imports
+from django.conf import settings
+from ..models import Job
+
+
+class JobDetailView(LoginRequiredMixin, DetailView):
+    """This view shows the progress of a background job of the user.
+    The status fragment asks htmx to load it again every second until the job is finished,
+    then htmx is sent to the result (for example the new shopping list) when there is one."""
+
+    login_url = settings.LOGIN_URL
+    model = Job
+    context_object_name = "job"
+    template_name = "job/detail.html"
+
+    def get_queryset(self):
+        return Job.objects.for_user(self.request.user)
+
+    def get_template_names(self):
+        if self.request.htmx:
+            return ["job/partials/job_status.html"]
+        return super().get_template_names()
+
+    def render_to_response(self, context, **response_kwargs):
+        job = self.object
+        if self.request.htmx and job.status == Job.DONE and (job.result or {}).get("url"):
+            return HttpResponseClientRedirect(job.result["url"])
+        return super().render_to_response(context, **response_kwargs)
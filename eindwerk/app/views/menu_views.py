@@ -1,4 +1,5 @@
 # Django imports
+from asgiref.sync import sync_to_async
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.shortcuts import redirect, render
 from django.urls import reverse_lazy
@@ -8,23 +9,34 @@ from django.views.generic.detail import DetailView
 from django.views.generic.edit import CreateView, UpdateView, DeleteView
 from django.urls import reverse
 from django.shortcuts import redirect, get_object_or_404
+from django.http import Http404
+from django.db.models import Count
 
 # Project imports
 from django.conf import settings
-from ..models import MenuList, UserMenu, DishMenu, Dish, ProductDish, UserDish
+from ..models import MenuList, UserMenu, DishMenu, Dish
+from ..custom_mixins import (
+    AsyncDetailMixin,
+    AsyncKeysetListMixin,
+    AsyncLoginRequiredMixin,
+    alist,
+)
 from ..forms import MenuForm
+from ..services.shoplist_services import menu_totals
 from ..formsets import DishMenuFormSet
 
 
-class MenuListView(LoginRequiredMixin, ListView):
-    """This view lists your items in your menu."""
+class MenuListView(AsyncLoginRequiredMixin, AsyncKeysetListMixin, ListView):
+    """This view lists your items in your menu.
+    The menus are loaded per page, the number of dishes is counted in the same query."""
 
     login_url = settings.LOGIN_URL
     model = MenuList
     template_name = "menu/list.html"
+    partial_template_name = "menu/partials/menu_cards.html"
 
     def get_queryset(self, **kwargs):
-        return MenuList.objects.filter(usermenu__user=self.request.user)
+        return MenuList.objects.for_user(self.request.user).annotate(dish_count=Count("dishmenu"))
 
 
 class MenuCreateView(LoginRequiredMixin, CreateView):
@@ -46,6 +58,7 @@ class MenuCreateView(LoginRequiredMixin, CreateView):
 
     def form_valid(self, form):
         if form.is_valid():
+            form.instance.user = self.request.user
             self.object = form.save()
             UserMenu.objects.get_or_create(user=self.request.user, menu=self.object)
             return redirect(self.get_success_url())
@@ -70,7 +83,7 @@ class MenuUpdateView(LoginRequiredMixin, UpdateView):
     success_url = reverse_lazy("menu_list")
 
     def get_queryset(self):
-        return MenuList.objects.filter(usermenu__user=self.request.user)
+        return MenuList.objects.for_user(self.request.user)
 
 
 class MenuDeleteView(LoginRequiredMixin, DeleteView):
@@ -86,71 +99,87 @@ class MenuDeleteView(LoginRequiredMixin, DeleteView):
     template_name = "menu/delete.html"
 
     def get_queryset(self, **kwargs):
-        return MenuList.objects.filter(usermenu__user=self.request.user)
+        return MenuList.objects.for_user(self.request.user)
 
 
-class MenuDetailView(LoginRequiredMixin, DetailView):
-    """View to display details of a menu related to the user and only show dishes related to the user."""
+class MenuDetailView(AsyncLoginRequiredMixin, AsyncDetailMixin, DetailView):
+    """View to display details of a menu related to the user and only show dishes related to the user.
+    The menu and its dishes are read with the async ORM, the dishes only need the menu id from the url.
+    Without the menu (not found or from another user) the page is a 404 anyway.
+    The ingredients of every dish come from dish.ingredient_summary. The totals panel sums the
+    ingredients of the whole menu, the same totals as "Maak winkellijst". That costs two more
+    queries on every view of the page (the units and one grouped query for the totals)."""
 
     login_url = settings.LOGIN_URL
     model = MenuList
     template_name = "menu/detail.html"
     context_object_name = "menu"
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        menu = self.get_object()
+    async def aget_related(self):
+        # Retrieve all dishes associated with this menu and linked to the user.
+        # The ingredients are rendered from dish.ingredient_summary, no extra queries needed.
+        dishes = DishMenu.objects.filter(
+            menu_id=self.kwargs["pk"], dish__user=self.request.user
+        ).select_related("dish")
+        # Django 5.0 runs the async ORM calls of a request one after another on its connection,
+        # so these queries follow each other, they don't overlap.
+        return {"dishes": await alist(dishes), "totals": await sync_to_async(menu_totals)(self.kwargs["pk"])}
+
+    def get_queryset(self):
+        return MenuList.objects.for_user(self.request.user)
 
-        # Retrieve all dishes associated with this menu and linked to the user
-        user_dish_ids = UserDish.objects.filter(user=self.request.user).values_list(
-            "dish_id", flat=True
-        )
-        context["dishes"] = DishMenu.objects.filter(
-            menu=menu, dish_id__in=user_dish_ids
-        )
 
-        # Retrieve all product dishes associated with the dishes in this menu
-        dish_ids = DishMenu.objects.filter(
-            menu=menu, dish_id__in=user_dish_ids
-        ).values_list("dish_id", flat=True)
-        context["product_dishes"] = ProductDish.objects.filter(dish_id__in=dish_ids)
+class MenuPickerView(LoginRequiredMixin, ListView):
+    """This view returns the menus of the user as options for the "add to menu" modal.
+    It is called by htmx when the modal opens, so the dish pages don't query the menus up front."""
 
-        return context
+    login_url = settings.LOGIN_URL
+    model = MenuList
+    template_name = "menu/partials/menu_options.html"
 
     def get_queryset(self):
-        return MenuList.objects.filter(usermenu__user=self.request.user)
+        return MenuList.objects.for_user(self.request.user).only("id", "name")
 
 
 class AddToMenuView(LoginRequiredMixin, View):
     """This view makes it possible to add a dish to a menu.
     We are getting the dish id and the menu id, so we can make the DishMenu object wich makes the relation between Dish and Menu.
+    With htmx the modal stays open and only shows a confirmation, instead of loading the dish list again.
     """
 
     def post(self, request, *args, **kwargs):
         dish_id = request.POST.get("dish_id")
         menu_id = request.POST.get("menu_id")
 
-        dish = get_object_or_404(Dish, pk=dish_id)
-        menu = get_object_or_404(MenuList, pk=menu_id)
+        dish = get_object_or_404(Dish.objects.for_user(request.user), pk=dish_id)
+        menu = get_object_or_404(MenuList.objects.for_user(request.user), pk=menu_id)
 
         DishMenu.objects.create(menu=menu, dish=dish)
-        UserMenu.objects.update_or_create(user=self.request.user, menu=menu)
         # MenuList.objects.update_or_create()
+        if request.htmx:
+            return render(request, "menu/partials/added_to_menu.html", {"dish": dish, "menu": menu})
         return redirect("dish_list")
 
 
 class RemoveFromMenuView(LoginRequiredMixin, View):
     """This view makes it possible to delete a dish to a menu.
     We are getting the dish id and the menu id, so we can delete the DishMenu object wich makes the relation between Dish and Menu.
+    With htmx the card of the dish is removed and only the totals of the menu are sent along (out of band).
     """
 
     def post(self, request, *args, **kwargs):
         dish_id = request.POST.get("dish_id")
         menu_id = request.POST.get("menu_id")
 
-        dish = get_object_or_404(Dish, pk=dish_id)
-        menu = get_object_or_404(MenuList, pk=menu_id)
-
-        DishMenu.objects.filter(menu=menu, dish=dish).first().delete()
+        dish_menu = (
+            DishMenu.objects.for_user(request.user)
+            .filter(menu_id=menu_id, dish_id=dish_id)
+            .first()
+        )
+        if dish_menu is None:
+            raise Http404
+        dish_menu.delete()
 
+        if request.htmx:
+            return render(request, "menu/partials/menu_totals.html", {"totals": menu_totals(menu_id), "oob": True})
         return redirect("menu_detail", pk=menu_id)
@@ -5,32 +5,35 @@ from django.views.generic import UpdateView, DeleteView
 
 # Project imports
 from django.conf import settings
-from ..custom_mixins import UserDishAccessMixin
+from ..custom_mixins import HtmxFormMixin, UserDishAccessMixin
 from ..models import ProductDish, Product
 from ..forms import ProductDishForm
+from ..services.dish_services import build_ingredient_summary
 
 
-class ProductDishUpdateView(LoginRequiredMixin, UserDishAccessMixin, UpdateView):
-    """This views makes it possible to update a product dish."""
+class ProductDishUpdateView(LoginRequiredMixin, UserDishAccessMixin, HtmxFormMixin, UpdateView):
+    """This views makes it possible to update a product dish.
+    With htmx the form replaces the row of the ingredient on the dish page and the saved row comes back."""
 
     login_url = settings.LOGIN_URL
     model = ProductDish
     form_class = ProductDishForm
     template_name = "product_dish/update.html"
+    htmx_template_name = "product_dish/partials/form_row.html"
+    htmx_success_template_name = "product_dish/partials/ingredient_row.html"
 
     def get_queryset(self):
         # We need to make sure that the user can only edit hos own objects.
-        queryset = super().get_queryset()
-        return queryset.filter(dish__userdish__user=self.request.user)
+        return ProductDish.objects.for_user(self.request.user)
 
     def get_initial(self):
         """Add product_name and product_is_favorite to initial values.
         Need to explicit do this because they do not inherit from the ModelForm."""
 
         initial = super().get_initial()
-        product_dish = self.get_object()
-        initial["product_name"] = product_dish.product.name
-        initial["product_is_favorite"] = product_dish.product.is_favorite
+        product = self.object.product
+        initial["product_name"] = product.name
+        initial["product_is_favorite"] = product.is_favorite
         return initial
 
     def form_valid(self, form):
@@ -53,25 +56,31 @@ class ProductDishUpdateView(LoginRequiredMixin, UserDishAccessMixin, UpdateView)
         """Redirect to the detail page of the associated Dish."""
         return reverse('dish_detail', kwargs={'pk': self.object.dish_id})
 
+    def get_htmx_success_context(self):
+        # The row shows the same entry as the stored summary of the dish.
+        return {"ingredient": build_ingredient_summary([self.object])[0]}
 
-class ProductDishDeleteView(LoginRequiredMixin, UserDishAccessMixin, DeleteView):
-    """View to delete a productdish related to the user."""
+
+class ProductDishDeleteView(LoginRequiredMixin, UserDishAccessMixin, HtmxFormMixin, DeleteView):
+    """View to delete a productdish related to the user.
+    With htmx the delete button posts directly (after a confirm) and the empty response removes the row."""
 
     login_url = settings.LOGIN_URL
     model = ProductDish
     template_name = "product_dish/delete.html"
 
+    def get_queryset(self):
+        return ProductDish.objects.for_user(self.request.user)
+
     def get_success_url(self):
-        obj = self.get_object()
-        return reverse("dish_detail", kwargs={"pk": obj.dish.pk})
+        return reverse("dish_detail", kwargs={"pk": self.object.dish_id})
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        obj = self.get_object()
-        dish = obj.dish
+        dish = self.object.dish
 
-        # Retrieve all productdish items related to the current dish
-        product_dishes = ProductDish.objects.filter(dish=dish)
+        # Retrieve all productdish items related to the current dish, with their product and unit.
+        product_dishes = ProductDish.objects.filter(dish=dish).select_related("product", "unit")
 
         context['dish'] = dish
         context['product_dishes'] = product_dishes
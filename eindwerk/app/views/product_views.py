@@ -1,9 +1,11 @@
 # Django imports
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.views.generic import ListView
+from django.shortcuts import render
+from django.views.generic import ListView, View
 
 # Project imports
 from ..models import Product
+from ..services.autocomplete_services import suggest_product_names
 from django.conf import settings
 
 
@@ -15,4 +17,25 @@ class ProductListView(LoginRequiredMixin, ListView):
     template_name = "shoppinglist/list.html"
 
     def get_queryset(self):
-        return Product.objects.filter(user=self.request.user)
+        return Product.objects.for_user(self.request.user)
+
+
+class ProductAutocompleteView(LoginRequiredMixin, View):
+    """This view suggests product names while the user types in the product field of a dish.
+
+    It is called by htmx with the value of the field and returns the <option>s of the datalist.
+    The field has a formset prefix (productdish_set-0-product_name), so every parameter that ends
+    with product_name is accepted, next to a plain q.
+    """
+
+    login_url = settings.LOGIN_URL
+
+    def get(self, request, *args, **kwargs):
+        query = request.GET.get("q") or next(
+            (value for key, value in request.GET.items() if key.endswith("product_name")), ""
+        )
+        return render(
+            request,
+            "product/partials/suggestions.html",
+            {"suggestions": suggest_product_names(request.user, query)},
+        )
@@ -1,4 +1,5 @@
 # Django imports
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, redirect, get_object_or_404
 from django.urls import reverse_lazy, reverse
 from django.views.generic.list import ListView
@@ -6,12 +7,14 @@ from django.views.generic.detail import DetailView
 from django.views.generic.edit import CreateView, UpdateView, DeleteView
 from django.views.generic.base import View
 from django.contrib.auth.mixins import LoginRequiredMixin
-from decimal import Decimal
 
 # Project imports
 from django.conf import settings
-from ..models import ProductDish, MenuList, ShoppingList, ProductShoppingList
+from ..models import Job, MenuList, ShoppingList, ProductShoppingList
+from ..custom_mixins import AsyncDetailMixin, AsyncLoginRequiredMixin, HtmxFormMixin
 from ..forms import ProductShoppingListForm
+from ..services.job_services import enqueue
+from ..services.shoplist_services import checked_progress, recent_shoppinglist, set_checked
 
 
 "Nakijken of deze code nog van toepassing is!"
@@ -22,9 +25,12 @@ from ..forms import ProductShoppingListForm
 #     template_name = "shoplist/list.html"
 
 
-class ShoppingListDetailView(LoginRequiredMixin, DetailView):
+class ShoppingListDetailView(AsyncLoginRequiredMixin, AsyncDetailMixin, DetailView):
     """This view shows all the details of the shopping list, products, units and amount.
-    This only for shoppinglists related tot he user"""
+    This only for shoppinglists related tot he user.
+    The items hold a snapshot of the product name and unit, so they are read from one table.
+    The list is read with the async ORM, the items only when the cached table is stale.
+    The number of ticked off items is counted next to it, outside the cached table."""
 
     login_url = settings.LOGIN_URL
     model = ShoppingList
@@ -32,102 +38,121 @@ class ShoppingListDetailView(LoginRequiredMixin, DetailView):
     template_name = "shoplist/detail.html"
 
     def get_queryset(self):
-        return ShoppingList.objects.filter(user=self.request.user)
+        return ShoppingList.objects.for_user(self.request.user).select_related("menu")
 
+    async def aget_related(self):
+        return {"progress": await sync_to_async(checked_progress)(self.kwargs["pk"])}
 
-class CreateShoppingListFromMenuView(LoginRequiredMixin, View):
-    """View to create a new shopping list from a selected menu for the logged-in user.
 
-    This view handles the process of creating a shopping list based on the products
-    contained in the dishes of a specified menu. It aggregates the quantities of each
-    product across all dishes and creates corresponding ProductShoppingList entries
-    for the shopping list.
+class CheckItemsView(LoginRequiredMixin, View):
+    """This view ticks off items of a shopping list, called by htmx from the detail page.
+
+    The page collects the clicks and sends them together half a second after the last one:
+    the ids to tick off as "checked" and the ids to untick as "unchecked". They are written with
+    one UPDATE, see set_checked(). Only the number of ticked off items is sent back.
     """
 
     login_url = settings.LOGIN_URL
 
-    def get(self, request, *args, **kwargs):
-        user = request.user
-        menu_id = self.kwargs.get("menu_id")
-        menu = get_object_or_404(MenuList, id=menu_id)
-
-        shoppinglist = ShoppingList.objects.create(user=user)
-
-        product_quantities = {}
-
-        dishes = menu.dishmenu_set.all()  # Gets all dishes related to the menu.
-        for dish_menu in dishes:
-            dish = dish_menu.dish
-            product_dishes = ProductDish.objects.filter(dish=dish)
-
-            for product_dish in product_dishes:
-                product_name = product_dish.product.name
-                quantity = product_dish.quantity or 0
-                unit = product_dish.unit
-
-                # Create a unique key based on product name and unit
-                key = (product_name, unit.id if unit else None)
-
-                if key in product_quantities:
-                    product_quantities[key] += Decimal(quantity)
-                else:
-                    product_quantities[key] = Decimal(quantity)
-
-        for (product_name, unit_id), total_quantity in product_quantities.items():
-            # Get the corresponding ProductDish instance
-            product_dish = ProductDish.objects.filter(
-                product__name=product_name,
-                unit__id=unit_id if unit_id else None,
-                dish__in=[dm.dish for dm in dishes]
-            ).first()
+    def post(self, request, *args, **kwargs):
+        shoppinglist = get_object_or_404(ShoppingList.objects.for_user(request.user), pk=self.kwargs["pk"])
+        checked, unchecked = (
+            [int(value) for value in request.POST.getlist(name) if value.isdigit()]
+            for name in ("checked", "unchecked")
+        )
+        set_checked(shoppinglist, checked, unchecked)
+        return render(
+            request, "shoplist/partials/check_progress.html", {"progress": checked_progress(shoppinglist)}
+        )
 
-            if product_dish:
-                ProductShoppingList.objects.create(
-                    product_dish=product_dish,
-                    shoppinglist=shoppinglist,
-                    quantity=total_quantity,
-                )
 
-        return redirect("shoppinglist_detail", pk=shoppinglist.pk)
+class CreateShoppingListFromMenuView(LoginRequiredMixin, View):
+    """View to create a new shopping list from a selected menu for the logged-in user.
 
+    This view handles the process of creating a shopping list based on the products
+    contained in the dishes of a specified menu. It aggregates the quantities of each
+    product across all dishes and creates corresponding ProductShoppingList entries
+    for the shopping list. The work is done by create_shoppinglist_from_menu, which uses
+    a fixed number of queries regardless of the size of the menu.
+    With linked=1 the list follows the menu: dishes that are added or removed later are
+    added to or taken off the list, see update_linked_shoppinglists.
+    Only POST creates a list, so prefetching or crawling the link does nothing. A recent list with
+    the same content is shown instead of making it again, see get_or_create_shoppinglist.
+    A new list is made by a background job (the create_shoppinglist task), a big menu can't make the
+    request time out. While a worker runs it, the user sees the progress of the job.
+    """
 
+    login_url = settings.LOGIN_URL
 
-class UpdateItemFromShoppingListView(LoginRequiredMixin, UpdateView):
-    """View to update an item in a shopping list for a specified product related to the user."""
+    def post(self, request, *args, **kwargs):
+        menu = get_object_or_404(
+            MenuList.objects.for_user(request.user), id=self.kwargs.get("menu_id")
+        )
+        linked = request.POST.get("linked") == "1"
+        shoppinglist, content_hash = recent_shoppinglist(menu, request.user, linked)
+        if shoppinglist is not None:
+            return redirect("shoppinglist_detail", pk=shoppinglist.pk)
+
+        # The job gets the hash, it doesn't read the menu again to find a list to reuse.
+        job = enqueue(
+            "create_shoppinglist", user=request.user, menu_id=menu.pk, linked=linked, content_hash=content_hash
+        )
+        if job.status == Job.DONE:
+            return redirect(job.result["url"])
+        return redirect("job_detail", pk=job.pk)
+
+
+class UpdateItemFromShoppingListView(LoginRequiredMixin, HtmxFormMixin, UpdateView):
+    """View to update an item in a shopping list for a specified product related to the user.
+    With htmx the form replaces the row of the item and the saved row comes back.
+    The item is marked as manual, so a list that follows a menu keeps the quantity given here."""
 
     login_url = settings.LOGIN_URL
     model = ProductShoppingList
     context_object_name = "product_shoppinglist_product"
     form_class = ProductShoppingListForm
     template_name = "shoplist/update.html"
+    htmx_template_name = "shoplist/partials/item_form_row.html"
+    htmx_success_template_name = "shoplist/partials/item_row.html"
 
     def get_queryset(self):
-        return ProductShoppingList.objects.filter(shoppinglist__user=self.request.user)
+        return ProductShoppingList.objects.for_user(self.request.user)
+
+    def form_valid(self, form):
+        form.instance.manual = True
+        return super().form_valid(form)
 
     def get_success_url(self):
-        # Haal de shoppinglist op van het item dat is bijgewerkt
-        shoppinglist = self.object.shoppinglist
-        # Ga terug naar de detailpagina van deze shoppinglist
-        return reverse("shoppinglist_detail", kwargs={"pk": shoppinglist.pk})
+        # Ga terug naar de detailpagina van de shoppinglist van het item dat is bijgewerkt
+        return reverse("shoppinglist_detail", kwargs={"pk": self.object.shoppinglist_id})
+
+    def get_htmx_success_context(self):
+        return {"item": self.object}
 
 
-class DeleteItemFromShoppingListView(LoginRequiredMixin, DeleteView):
-    """View to delete an item in a shopping list for a specified product related to the user."""
+class DeleteItemFromShoppingListView(LoginRequiredMixin, HtmxFormMixin, DeleteView):
+    """View to delete an item in a shopping list for a specified product related to the user.
+    With htmx the row is removed and only the ticked off counter is sent along (out of band)."""
 
     login_url = settings.LOGIN_URL
     model = ProductShoppingList
     context_object_name = "product_shoppinglist_product"
     template_name = "shoplist/delete_item.html"
+    htmx_success_template_name = "shoplist/partials/item_deleted.html"
+
+    def get_queryset(self):
+        return ProductShoppingList.objects.for_user(self.request.user)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        obj = self.get_object()
-        context['shoppinglist'] = obj.shoppinglist
+        context['shoppinglist'] = self.object.shoppinglist
         return context
 
     def get_success_url(self):
-        shoppinglist = self.object.shoppinglist
-        return reverse("shoppinglist_detail", kwargs={"pk": shoppinglist.pk})
+        return reverse("shoppinglist_detail", kwargs={"pk": self.object.shoppinglist_id})
+
+    def get_htmx_success_context(self):
+        return {"progress": checked_progress(self.object.shoppinglist_id)}
 
 
 class AddItemToShoppingListView(LoginRequiredMixin, CreateView):
@@ -138,4 +163,4 @@ class AddItemToShoppingListView(LoginRequiredMixin, CreateView):
     form_class = ProductShoppingListForm
 
     def get_queryset(self):
-        return ProductShoppingList.objects.filter(user=self.request.user)
\ No newline at end of file
+        return ProductShoppingList.objects.for_user(self.request.user)
\ No newline at end of file
@@ -8,6 +8,7 @@ from django.views.generic import CreateView, UpdateView, ListView, DeleteView
 from django.conf import settings
 from ..models import ShoppingList, ProductShoppingList
 from ..forms import ShoppingListForm
+from ..custom_mixins import AsyncKeysetListMixin, AsyncLoginRequiredMixin
 
 
 # This code snippet is redundant now, should be deleted after testing.
@@ -26,15 +27,17 @@ class ShoppingListCreateView(LoginRequiredMixin, CreateView):
         return redirect(reverse("shoppinglist"))
 
 
-class ShoppingListListView(LoginRequiredMixin, ListView):
-    """This view will show you a list of all the users shopping lists."""
+class ShoppingListListView(AsyncLoginRequiredMixin, AsyncKeysetListMixin, ListView):
+    """This view will show you a list of all the users shopping lists, newest first and per page.
+    The user is selected along, because the title of a list shows it."""
 
     login_url = settings.LOGIN_URL
     model = ShoppingList
     template_name = "shoppinglist/list.html"
+    partial_template_name = "shoppinglist/partials/shoppinglist_cards.html"
 
     def get_queryset(self):
-        return ShoppingList.objects.filter(user=self.request.user)
+        return ShoppingList.objects.for_user(self.request.user).select_related("user")
 
 
 class ShoppingListDeleteView(LoginRequiredMixin, DeleteView):
@@ -45,7 +48,7 @@ class ShoppingListDeleteView(LoginRequiredMixin, DeleteView):
     success_url = reverse_lazy("shoppinglist")
 
     def get_queryset(self):
-        return ShoppingList.objects.filter(user=self.request.user)
+        return ShoppingList.objects.for_user(self.request.user)
 
     def delete(self, request, *args, **kwargs):
         ProductShoppingList.objects.filter(shoppinglist=self.object).delete()
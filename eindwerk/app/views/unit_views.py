@@ -8,29 +8,39 @@ from django.views.generic import CreateView, ListView, UpdateView, DeleteView
 from django.conf import settings
 from ..models import Unit
 from ..forms import UnitForm
+from ..custom_mixins import AsyncKeysetListMixin, AsyncLoginRequiredMixin, HtmxFormMixin
 
 
-class UnitCreateView(LoginRequiredMixin, CreateView):
-    """This view will make it possible to create a new unit."""
+class UnitCreateView(LoginRequiredMixin, HtmxFormMixin, CreateView):
+    """This view will make it possible to create a new unit.
+    With htmx an empty form comes back and the new unit is added to the list below it (out of band),
+    the list of all units is not read again."""
 
     login_url = settings.LOGIN_URL
     model = Unit
     form_class = UnitForm
     template_name = "unit/create.html"
     success_url = reverse_lazy("unit_create")
+    htmx_template_name = "unit/partials/unit_form.html"
+    htmx_success_template_name = "unit/partials/unit_created.html"
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context["unit_list"] = Unit.objects.all()
+        if not self.request.htmx:
+            context["unit_list"] = Unit.objects.all()
         return context
 
+    def get_htmx_success_context(self):
+        return {"form": self.get_form_class()(), "unit": self.object}
 
-class UnitListView(LoginRequiredMixin, ListView):
-    """This view will show a list of ALL units."""
+
+class UnitListView(AsyncLoginRequiredMixin, AsyncKeysetListMixin, ListView):
+    """This view will show a list of ALL units, per page in the order they were created."""
 
     login_url = settings.LOGIN_URL
     model = Unit
     template_name = "unit/list.html"
+    partial_template_name = "unit/partials/unit_rows.html"
 
 
 class UnitUpdateView(LoginRequiredMixin, UpdateView):
@@ -7,4 +7,28 @@ python manage.py collectstatic
 
 
 python manage.py migrate
-python manage.py runserver 0.0.0.0:8000
\ No newline at end of file
+python manage.py createcachetable
+
+# JOB_WORKERS > 0 starts that many worker processes for the background jobs next to the web server,
+# the requests then only queue the jobs. Without it every job runs inside the request that queues it.
+if [ "${JOB_WORKERS:-0}" -gt 0 ]; then
+  export JOBS_RUN_INLINE=0
+  python manage.py run_worker --processes "$JOB_WORKERS" --threads "${JOB_THREADS:-2}" &
+fi
+
+# SERVER chooses how the app is served:
+#   asgi: uvicorn, every worker process serves many (slow) clients at once with the async views.
+#   wsgi: gunicorn, a thread per request that is in progress.
+#   anything else: the development server.
+# WEB_CONCURRENCY is the number of worker processes. Compare them with: python manage.py benchmark_servers
+case "$SERVER" in
+  asgi)
+    exec uvicorn eindwerk.asgi:application --host 0.0.0.0 --port 8000 --workers "${WEB_CONCURRENCY:-2}"
+    ;;
+  wsgi)
+    exec gunicorn eindwerk.wsgi:application --bind 0.0.0.0:8000 --workers "${WEB_CONCURRENCY:-2}" --threads 8
+    ;;
+  *)
+    python manage.py runserver 0.0.0.0:8000
+    ;;
+esac
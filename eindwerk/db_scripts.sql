@@ -1,13 +1,13 @@
-INSERT INTO app_unit (name, abbreviation) VALUES
-  ('Gram', 'g'),
-  ('Milliliter', 'ml'),
-  ('Deciliter', 'dl'),
-  ('Liter', 'l'),
-  ('Kilogram', 'kg'),  -- Added kilogram
-  ('Centiliter', 'cl'),  -- Added centiliter
-  ('Eetlepel', 'el'),
-  ('Theelepel', 'tl'),
-  ('Mespunt', 'mpt'),
-  ('Kop', 'kop'),
-  ('Stuk', 'st'),
-  ('Teentje', 'tn');  -- Added teentje
+INSERT INTO app_unit (name, abbreviation, dimension, factor) VALUES
+  ('Gram', 'g', 'mass', 1),
+  ('Milliliter', 'ml', 'volume', 1),
+  ('Deciliter', 'dl', 'volume', 100),
+  ('Liter', 'l', 'volume', 1000),
+  ('Kilogram', 'kg', 'mass', 1000),  -- Added kilogram
+  ('Centiliter', 'cl', 'volume', 10),  -- Added centiliter
+  ('Eetlepel', 'el', 'volume', 15),
+  ('Theelepel', 'tl', 'volume', 5),
+  ('Mespunt', 'mpt', '', NULL),
+  ('Kop', 'kop', '', NULL),
+  ('Stuk', 'st', 'count', 1),
+  ('Teentje', 'tn', '', NULL);  -- Added teentje
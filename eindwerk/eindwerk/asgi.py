@@ -3,6 +3,15 @@ ASGI config for eindwerk project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serve it with uvicorn (SERVER=asgi in boot.sh):
+
+    uvicorn eindwerk.asgi:application --host 0.0.0.0 --port 8000 --workers 2
+
+The read-heavy pages (the lists and the dish, menu and shopping list details) have async views,
+and the middleware works async, so a worker waits for the database and for slow clients without
+holding a thread. The other views are sync, Django runs them in a thread. Keep CONN_MAX_AGE at 0
+(the default), under ASGI the connections are not reused between requests.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.0/howto/deployment/asgi/
 """
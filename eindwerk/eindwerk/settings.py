@@ -1,6 +1,7 @@
 import logging
 import os
 from pathlib import Path
+from urllib.parse import parse_qsl, urlsplit
 import dj_database_url
 from dotenv import find_dotenv, load_dotenv
 
@@ -49,7 +50,11 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
-    "whitenoise.middleware.WhiteNoiseMiddleware",
+    # WhiteNoise that also works async, see app/middleware.py.
+    "app.middleware.AsyncWhiteNoiseMiddleware",
+    # After WhiteNoise, static files are not timed.
+    "app.middleware.ServerTimingMiddleware",
+    "app.middleware.NPlusOneMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -96,6 +101,88 @@ DATABASES = {
 
 DATABASES["default"] = dj_database_url.parse(os.environ.get("DATABASE_DEFAULT"))
 
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+# Two tiers: every process keeps the entries it used last in memory (L1), in front of a cache shared by all
+# workers (L2). CACHE_URL chooses the L2, it is parsed like DATABASE_DEFAULT:
+#   locmem://                       per process, nothing is shared (the default)
+#   db://app_cache                  the table app_cache, it needs: python manage.py createcachetable
+#   file:///var/cache/shopmydish    a directory
+# Options go in the query string, e.g. db://app_cache?max_entries=50000&cull_frequency=4.
+# Without CACHE_URL the older CACHE_BACKEND ("locmem", "file" or "db") and CACHE_LOCATION are used.
+#
+# "default" is the L2 itself: versions and counters must be seen by all workers right away.
+# "tiered" adds the L1, for the entries that never change under their key, see app/cache.py and
+# app/services/cache_services.py. CACHE_L1_MAX_ENTRIES and CACHE_L1_TIMEOUT (seconds) bound the L1.
+
+CACHE_BACKENDS = {
+    "locmem": ("django.core.cache.backends.locmem.LocMemCache", "shopmydish"),
+    "file": ("django.core.cache.backends.filebased.FileBasedCache", BASE_DIR / "cache"),
+    "db": ("django.core.cache.backends.db.DatabaseCache", "app_cache"),
+}
+CACHE_URL = urlsplit(os.environ.get("CACHE_URL") or f"{os.environ.get('CACHE_BACKEND', 'locmem')}://")
+CACHE_BACKEND, CACHE_LOCATION = CACHE_BACKENDS[CACHE_URL.scheme]
+CACHE_LOCATION = CACHE_URL.netloc + CACHE_URL.path or os.environ.get("CACHE_LOCATION", CACHE_LOCATION)
+CACHE_OPTIONS = {"MAX_ENTRIES": 10000} | {name.upper(): int(value) for name, value in parse_qsl(CACHE_URL.query)}
+
+CACHES = {
+    "default": {
+        "BACKEND": CACHE_BACKEND,
+        "LOCATION": CACHE_LOCATION,
+        "OPTIONS": CACHE_OPTIONS,
+    },
+    "tiered": {
+        "BACKEND": "app.cache.TieredCache",
+        "LOCATION": "default",
+        "OPTIONS": {
+            "MAX_ENTRIES": int(os.environ.get("CACHE_L1_MAX_ENTRIES", "1000")),
+            "L1_TIMEOUT": int(os.environ.get("CACHE_L1_TIMEOUT", "300")),
+        },
+    },
+}
+
+# Shopping lists
+# Generating a shopping list from a menu returns the list made earlier from the same menu content, as long
+# as it is at most SHOPPINGLIST_REUSE_DAYS days old and nothing on it is ticked off yet.
+
+SHOPPINGLIST_REUSE_DAYS = int(os.environ.get("SHOPPINGLIST_REUSE_DAYS", "7"))
+
+# Server-Timing
+# Every response gets a Server-Timing header (see app/middleware.py). SERVER_TIMING_SAMPLE_RATE is the share
+# of the requests (0 to 1) that is also logged as a JSON record by the "app.timing" logger, 0 logs nothing.
+
+SERVER_TIMING_SAMPLE_RATE = float(os.environ.get("SERVER_TIMING_SAMPLE_RATE", "0"))
+
+# N+1 detection
+# With NPLUSONE_THRESHOLD > 0 a SQL statement that runs that many times in one request is logged as a
+# warning by the "app.nplusone" logger, with the template and Python line that ran it. The tests run in
+# strict mode, see app/tests/runner.py: lazily loading a relation of an object from a list raises.
+
+NPLUSONE_THRESHOLD = int(os.environ.get("NPLUSONE_THRESHOLD", "0"))
+
+# Background jobs
+# Heavy work runs as a Job (see app/services/job_services.py and app/tasks.py), started by the workers of
+# python manage.py run_worker. Without workers, JOBS_RUN_INLINE=1 (default) runs every job right away in
+# the request that queues it. A job that fails is tried again after JOB_RETRY_DELAY seconds, doubled for
+# every attempt. A running job without a heartbeat for JOB_TIMEOUT seconds is taken over by another worker.
+
+JOBS_RUN_INLINE = os.environ.get("JOBS_RUN_INLINE", "1") == "1"
+JOB_RETRY_DELAY = int(os.environ.get("JOB_RETRY_DELAY", "10"))
+JOB_TIMEOUT = int(os.environ.get("JOB_TIMEOUT", "600"))
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "app.timing": {"handlers": ["console"], "level": "INFO", "propagate": False},
+        "app.nplusone": {"handlers": ["console"], "level": "WARNING", "propagate": False},
+        "app.jobs": {"handlers": ["console"], "level": "INFO", "propagate": False},
+    },
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
@@ -162,6 +249,8 @@ AUTHENTICATION_BACKENDS = {
     "django.contrib.auth.backends.ModelBackend",
 }
 
+TEST_RUNNER = "app.tests.runner.StrictLazyLoadingTestRunner"
+
 LOGIN_URL = "/login/auth0"
 LOGIN_REDIRECT_URL = "/"
 LOGOUT_REDIRECT_URL = "/"